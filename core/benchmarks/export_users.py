@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+'''
+Memory and latency benchmark for exporting every user.
+
+Fills a fresh store in a temporary directory with N users, then compares the
+old way of listing users (all() serialized with one json.dumps) against the
+streaming export_chunks(), in full and projected to username/usage/expiry.
+Reports peak traced memory, time to the first byte and total time for each.
+
+Usage: python3 core/benchmarks/export_users.py [--backend json|sqlite|both] [--users N]
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from storage import JsonUserStore, SqliteUserStore, export_chunks, parse_export_fields  # noqa: E402
+
+
+def fill(store, users: int) -> None:
+    store.put_many({f'user{i}': {
+        'password': f'{i:032d}',
+        'max_download_bytes': 30 * 1024 ** 3,
+        'expiration_days': 30,
+        'account_creation_date': '2024-01-01',
+        'blocked': False,
+        'upload_bytes': i * 1000,
+        'download_bytes': i * 5000,
+        'status': 'Offline',
+    } for i in range(users)})
+
+
+def measure(name: str, produce) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in produce():
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {name:<24}{size / 1e6:8.1f} MB out  peak {peak / 1e6:7.1f} MB  "
+          f"first byte {first * 1000:8.1f} ms  total {total * 1000:8.1f} ms")
+
+
+def bench(backend: str, users: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        if backend == 'json':
+            store = JsonUserStore(os.path.join(directory, 'users.json'))
+        else:
+            store = SqliteUserStore(os.path.join(directory, 'users.db'))
+        fill(store, users)
+        print(f"{backend} ({users} users)")
+        measure('all() + json.dumps', lambda: [json.dumps(store.all()).encode()])
+        measure('export ndjson', lambda: export_chunks(store, 'ndjson', parse_export_fields(None)))
+        measure('export username/usage', lambda: export_chunks(
+            store, 'ndjson', parse_export_fields('username,usage_bytes,expires_at')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='User export memory and latency benchmark')
+    parser.add_argument('--backend', choices=('json', 'sqlite', 'both'), default='both')
+    parser.add_argument('--users', type=int, default=50000)
+    args = parser.parse_args()
+
+    for backend in ('json', 'sqlite') if args.backend == 'both' else (args.backend,):
+        bench(backend, args.users)
+
+
+if __name__ == '__main__':
+    main()
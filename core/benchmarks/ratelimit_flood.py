@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+'''
+Memory benchmark for the subscription servers' rate limiter.
+
+Sends one request from each of N distinct synthetic client IPs through the
+old unbounded per-IP dict limiter and through ratelimit.RateLimiter, and
+reports traced memory and per-check cost at a few checkpoints. The bounded
+limiter should level off at its max_entries while the old one keeps growing.
+
+Usage: python3 core/benchmarks/ratelimit_flood.py [--ips N] [--max-entries N] [--checkpoints N]
+'''
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from ratelimit import RateLimiter  # noqa: E402
+
+
+class UnboundedLimiter:
+    '''The fixed-window limiter normalsub used before, which kept every IP forever.'''
+
+    def __init__(self, limit: int, window: int):
+        self.limit = limit
+        self.window = window
+        self.store = {}
+
+    def check_limit(self, client_ip: str) -> bool:
+        current_time = time.monotonic()
+        requests, last_request_time = self.store.get(client_ip, (0, 0))
+        if current_time - last_request_time < self.window:
+            if requests >= self.limit:
+                return False
+        else:
+            requests = 0
+        self.store[client_ip] = (requests + 1, current_time)
+        return True
+
+
+def synthetic_ip(n: int) -> str:
+    return f'{10 + (n >> 24) % 240}.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}'
+
+
+def flood(limiter, ips: int, checkpoints: int) -> list[tuple[int, float, float]]:
+    '''Returns (requests so far, traced MB, ns per check) at each checkpoint.'''
+    results = []
+    every = max(1, ips // checkpoints)
+    tracemalloc.start()
+    started = time.perf_counter()
+    for n in range(1, ips + 1):
+        limiter.check_limit(synthetic_ip(n))
+        if n % every == 0 or n == ips:
+            elapsed = time.perf_counter() - started
+            current, _ = tracemalloc.get_traced_memory()
+            results.append((n, current / 1024 / 1024, elapsed / n * 1e9))
+    tracemalloc.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rate limiter distinct-IP flood benchmark')
+    parser.add_argument('--ips', type=int, default=1_000_000, help='Distinct client IPs to send')
+    parser.add_argument('--max-entries', type=int, default=65536, help='Cap for the bounded limiter')
+    parser.add_argument('--checkpoints', type=int, default=5, help='Rows to print per limiter')
+    args = parser.parse_args()
+
+    # tracemalloc slows every allocation down, so the ns/check column is only good for comparison
+    print(f'{args.ips} distinct IPs, 100 requests / 60 s per IP')
+    print(f"{'limiter':<12}{'requests':>12}{'entries':>10}{'traced MB':>12}{'ns/check':>10}")
+    for name, limiter in (('unbounded', UnboundedLimiter(100, 60)),
+                          ('bounded', RateLimiter(100, 60, max_entries=args.max_entries))):
+        for requests, megabytes, ns_per_check in flood(limiter, args.ips, args.checkpoints):
+            entries = len(limiter.store) if isinstance(limiter, UnboundedLimiter) else len(limiter)
+            print(f'{name:<12}{requests:>12}{entries if requests == args.ips else "":>10}'
+                  f'{megabytes:>12.1f}{ns_per_check:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+'''
+Concurrency stress test for the user store backends.
+
+Starts several writer processes, each with a few threads, against a fresh
+store in a temporary directory. Every writer adds traffic to users shared by
+all of them and edits a field of a user of its own, while reader processes
+keep listing all users. Afterwards the traffic counters must equal the sum of
+everything added and every edit must be present; a torn or failed read counts
+as an error. Exits non-zero if any update was lost.
+
+Usage: python3 core/benchmarks/store_stress.py [--backend json|sqlite|both] [--processes N]
+       [--threads N] [--ops N] [--users N] [--readers N]
+'''
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from storage import JsonUserStore, SqliteUserStore, UserStoreError  # noqa: E402
+
+UPLOAD, DOWNLOAD = 3, 5
+
+
+def open_store(backend: str, directory: str):
+    if backend == 'json':
+        return JsonUserStore(os.path.join(directory, 'users.json'))
+    return SqliteUserStore(os.path.join(directory, 'users.db'))
+
+
+def writer(backend: str, directory: str, worker: int, threads: int, ops: int, users: int) -> None:
+    store = open_store(backend, directory)
+
+    def run(thread: int) -> None:
+        own_user = f'w{worker}t{thread}'
+        for op in range(ops):
+            store.add_usage(f'shared{op % users}', UPLOAD, DOWNLOAD)
+            # An edit of one field next to the traffic writes; it must survive them and vice versa
+            with store.transaction():
+                store.patch(own_user, {'password': f'p{op}'})
+
+    workers = [threading.Thread(target=run, args=(thread,)) for thread in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+
+def reader(backend: str, directory: str, stop, errors) -> None:
+    store = open_store(backend, directory)
+    while not stop.is_set():
+        try:
+            store.all()
+        except UserStoreError:
+            with errors.get_lock():
+                errors.value += 1
+
+
+def stress(backend: str, processes: int, threads: int, ops: int, users: int, readers: int) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        store = open_store(backend, directory)
+        store.put_many({f'shared{i}': {'password': 'x', 'upload_bytes': 0, 'download_bytes': 0} for i in range(users)})
+        store.put_many({f'w{worker}t{thread}': {'password': 'initial'}
+                        for worker in range(processes) for thread in range(threads)})
+
+        stop, errors = multiprocessing.Event(), multiprocessing.Value('i', 0)
+        reader_procs = [multiprocessing.Process(target=reader, args=(backend, directory, stop, errors))
+                        for _ in range(readers)]
+        writer_procs = [multiprocessing.Process(target=writer, args=(backend, directory, worker, threads, ops, users))
+                        for worker in range(processes)]
+        started = time.perf_counter()
+        for proc in reader_procs + writer_procs:
+            proc.start()
+        for proc in writer_procs:
+            proc.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for proc in reader_procs:
+            proc.join()
+
+        data = open_store(backend, directory).all()
+        writes = processes * threads * ops
+        upload = sum(data[f'shared{i}'].get('upload_bytes', 0) for i in range(users))
+        download = sum(data[f'shared{i}'].get('download_bytes', 0) for i in range(users))
+        lost_edits = [name for name, record in data.items()
+                      if name.startswith('w') and record.get('password') != f'p{ops - 1}']
+        lost_traffic = writes - upload // UPLOAD
+
+        ok = upload == writes * UPLOAD and download == writes * DOWNLOAD and not lost_edits and not errors.value
+        print(f"{backend:<8}{writes:>8} writes in {elapsed:6.2f}s  lost traffic updates: {lost_traffic}  "
+              f"lost edits: {len(lost_edits)}  read errors: {errors.value}  {'OK' if ok else 'FAIL'}")
+        return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='User store parallel writer stress test')
+    parser.add_argument('--backend', choices=('json', 'sqlite', 'both'), default='both')
+    parser.add_argument('--processes', type=int, default=4, help='Writer processes')
+    parser.add_argument('--threads', type=int, default=2, help='Writer threads per process')
+    parser.add_argument('--ops', type=int, default=100, help='Traffic updates and edits per thread')
+    parser.add_argument('--users', type=int, default=20, help='Users that share the traffic updates')
+    parser.add_argument('--readers', type=int, default=2, help='Processes listing users meanwhile')
+    args = parser.parse_args()
+
+    backends = ('json', 'sqlite') if args.backend == 'both' else (args.backend,)
+    results = [stress(backend, args.processes, args.threads, args.ops, args.users, args.readers)
+               for backend in backends]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
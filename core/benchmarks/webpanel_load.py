@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+'''
+Load benchmark for the web panel's blocking-call handling.
+
+Fires a burst of slow /server/status style requests together with quick user
+lookups against two in-process apps: one that calls blocking code directly in
+its async handlers (the old behaviour) and one that goes through
+executor.run_blocking with a ConcurrencyLimit on the status route. It reports
+the latency users see while the status burst is in flight.
+
+Usage: python3 core/benchmarks/webpanel_load.py [--status N] [--users N] [--status-delay S] [--user-interval S]
+'''
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+WEBPANEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts', 'webpanel')
+sys.path.insert(0, WEBPANEL_DIR)
+
+# executor reads its pool size from the web panel settings; provide placeholders for the required ones
+for key, value in {'PORT': '0', 'DOMAIN': 'localhost', 'DEBUG': 'false', 'ADMIN_USERNAME': 'bench',
+                   'ADMIN_PASSWORD': 'bench', 'API_TOKEN': 'bench', 'EXPIRATION_MINUTES': '60',
+                   'ROOT_PATH': 'bench'}.items():
+    os.environ.setdefault(key, value)
+
+import httpx  # noqa: E402
+from fastapi import APIRouter, Depends, FastAPI  # noqa: E402
+
+from config import CONFIGS  # noqa: E402
+from executor import run_blocking, ConcurrencyLimit  # noqa: E402
+
+
+def build_app(status_delay: float, user_delay: float, offload: bool) -> FastAPI:
+    def server_info() -> str:
+        time.sleep(status_delay)  # server_info samples /proc/stat across a sleep
+        return 'ok'
+
+    def get_user() -> dict[str, str]:
+        time.sleep(user_delay)  # a store lookup
+        return {'username': 'bench'}
+
+    app = FastAPI()
+    users = APIRouter()
+    if offload:
+        server = APIRouter(dependencies=[Depends(ConcurrencyLimit('server', CONFIGS.SERVER_CONCURRENCY, timeout=60))])
+
+        @server.get('/status')
+        async def status_offloaded():
+            return await run_blocking(server_info)
+
+        @users.get('/{username}')
+        async def user_offloaded(username: str):
+            return await run_blocking(get_user)
+    else:
+        server = APIRouter()
+
+        @server.get('/status')
+        async def status_inline():
+            return server_info()
+
+        @users.get('/{username}')
+        async def user_inline(username: str):
+            return get_user()
+
+    app.include_router(server, prefix='/server')
+    app.include_router(users, prefix='/users')
+    return app
+
+
+async def run_load(app: FastAPI, status_requests: int, user_requests: int, user_interval: float) -> dict[str, float]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def timed(path: str, arrival: float) -> float:
+            await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+            response = await client.get(path)
+            response.raise_for_status()
+            # Measured from the planned arrival, so time spent waiting on a blocked loop counts
+            return time.perf_counter() - arrival
+
+        started = time.perf_counter()
+        status_tasks = [asyncio.create_task(timed('/server/status', started)) for _ in range(status_requests)]
+        # Users trickle in while the status burst is being served, as they would from other panel tabs
+        user_latencies = await asyncio.gather(*(timed('/users/bench', started + (i + 1) * user_interval)
+                                                for i in range(user_requests)))
+        await asyncio.gather(*status_tasks)
+        elapsed = time.perf_counter() - started
+
+    user_latencies = sorted(user_latencies)
+    return {
+        'user_p50_ms': statistics.median(user_latencies) * 1000,
+        'user_p95_ms': user_latencies[int(len(user_latencies) * 0.95) - 1] * 1000,
+        'user_max_ms': user_latencies[-1] * 1000,
+        'total_s': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web panel blocking-call load benchmark')
+    parser.add_argument('--status', type=int, default=20, help='Concurrent /server/status requests')
+    parser.add_argument('--users', type=int, default=50, help='Concurrent user lookups')
+    parser.add_argument('--status-delay', type=float, default=0.1, help='Seconds each status call blocks')
+    parser.add_argument('--user-delay', type=float, default=0.002, help='Seconds each user lookup blocks')
+    parser.add_argument('--user-interval', type=float, default=0.01, help='Seconds between user lookup arrivals')
+    args = parser.parse_args()
+
+    print(f'{args.status} status requests ({args.status_delay * 1000:.0f} ms each) + {args.users} user lookups, '
+          f'{CONFIGS.BLOCKING_WORKERS} workers, server limit {CONFIGS.SERVER_CONCURRENCY}')
+    print(f"{'mode':<10}{'user p50 ms':>14}{'user p95 ms':>14}{'user max ms':>14}{'total s':>10}")
+    for name, offload in (('inline', False), ('executor', True)):
+        app = build_app(args.status_delay, args.user_delay, offload)
+        result = asyncio.run(run_load(app, args.status, args.users, args.user_interval))
+        print(f"{name:<10}{result['user_p50_ms']:>14.1f}{result['user_p95_ms']:>14.1f}"
+              f"{result['user_max_ms']:>14.1f}{result['total_s']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import time
 import typing
 import click
 import cli_api
@@ -114,6 +115,22 @@ def list_users():
         click.echo(f'{e}', err=True)
 
 
+@cli.command('export-users')
+@click.option('--format', '-f', 'fmt', default='ndjson', help='ndjson (one user per line) or json (one array)',
+              type=click.Choice(['ndjson', 'json'], case_sensitive=False))
+@click.option('--fields', required=False, type=str,
+              help='Comma-separated fields to export, e.g. username,usage_bytes,expires_at (default: all)')
+@click.option('--output', '-o', required=False, help='File to write to instead of stdout', type=click.Path(dir_okay=False))
+def export_users(fmt: str, fields: str | None, output: str | None):
+    try:
+        chunks = cli_api.export_users(fmt.lower(), fields)
+        with click.open_file(output or '-', 'wb') as out:
+            for chunk in chunks:
+                out.write(chunk)
+    except Exception as e:
+        click.echo(f'{e}', err=True)
+
+
 @cli.command('get-user')
 @click.option('--username', '-u', required=True, help='Username for the user to get', type=str)
 def get_user(username: str):
@@ -124,6 +141,20 @@ def get_user(username: str):
         click.echo(f'{e}', err=True)
 
 
+@cli.command('user-traffic')
+@click.option('--username', '-u', required=True, help='Username for the user', type=str)
+@click.option('--from', 'start', required=False, help='Start of the range as a unix timestamp (default: one hour before --to)', type=int)
+@click.option('--to', 'end', required=False, help='End of the range as a unix timestamp (default: now)', type=int)
+@click.option('--step', '-s', required=False, help='Bucket size in seconds', type=int)
+def user_traffic(username: str, start: int | None, end: int | None, step: int | None):
+    try:
+        end = end if end is not None else int(time.time())
+        start = start if start is not None else end - 3600
+        pretty_print(cli_api.get_user_traffic(username, start, end, step))
+    except Exception as e:
+        click.echo(f'{e}', err=True)
+
+
 @cli.command('add-user')
 @click.option('--username', '-u', required=True, help='Username for the new user', type=str)
 @click.option('--traffic-limit', '-t', required=True, help='Traffic limit for the new user in GB', type=int)
@@ -138,6 +169,85 @@ def add_user(username: str, traffic_limit: int, expiration_days: int, password:
         click.echo(f'{e}', err=True)
 
 
+@cli.command('add-users')
+@click.option('--from-file', '-f', 'from_file', required=True, help='CSV (with a header row) or JSONL file of users to add',
+              type=click.Path(exists=True, dir_okay=False))
+@click.option('--atomic', is_flag=True, help='Add no user at all if any row is invalid')
+def add_users(from_file: str, atomic: bool):
+    try:
+        results = cli_api.add_users(cli_api.read_users_file(from_file), atomic)
+        for result in results:
+            if result['added']:
+                click.echo(f"Row {result['row']}: user '{result['username']}' added.")
+            else:
+                click.echo(f"Row {result['row']}: user '{result['username']}' not added: {result['error']}", err=True)
+        added = sum(1 for result in results if result['added'])
+        click.echo(f'Added {added} of {len(results)} users.')
+    except Exception as e:
+        click.echo(f'{e}', err=True)
+
+
+def user_selector_options(command):
+    '''Adds the options that select the users of a bulk command.'''
+    options = [
+        click.option('--usernames', '-u', required=False, help='Comma-separated usernames', type=str),
+        click.option('--all', 'all_users', is_flag=True, help='Select all users (the filters still apply)'),
+        click.option('--match-blocked/--match-unblocked', 'blocked', default=None, help='Only blocked or only unblocked users'),
+        click.option('--status', '-s', required=False, help='Only users with this status',
+                     type=click.Choice(['online', 'offline', 'inactive'], case_sensitive=False)),
+        click.option('--expiring-within', 'expiring_within_days', required=False, type=int,
+                     help='Only users whose plan ends within this many days'),
+        click.option('--prefix', required=False, help='Only usernames starting with this prefix', type=str),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def user_selector(usernames: str | None, all_users: bool, blocked: bool | None, status: str | None,
+                  expiring_within_days: int | None, prefix: str | None) -> dict[str, typing.Any]:
+    return {
+        'usernames': [name.strip() for name in usernames.split(',') if name.strip()] if usernames else None,
+        'all_users': all_users,
+        'blocked': blocked,
+        'status': status.lower() if status else None,
+        'expiring_within_days': expiring_within_days,
+        'prefix': prefix,
+    }
+
+
+def echo_bulk_result(res: dict[str, typing.Any], action: str):
+    for result in res['results']:
+        if not result['applied']:
+            click.echo(f"User '{result['username']}' not {action}: {result['error']}", err=True)
+        elif result.get('warning'):
+            click.echo(f"User '{result['username']}' {action}, but: {result['warning']}", err=True)
+    if res['kick_failed']:
+        click.echo(f"Could not kick: {', '.join(res['kick_failed'])}", err=True)
+    click.echo(f"{action.capitalize()} {res['applied']} of {res['matched']} selected users.")
+
+
+@cli.command('edit-users')
+@user_selector_options
+@click.option('--reset-traffic', is_flag=True, help='Reset upload and download counters')
+@click.option('--renew-creation-date', '-rc', is_flag=True, help='Set the creation date to today')
+@click.option('--extend-days', required=False, help='Add days to the current expiration days; users that never expire are left unchanged', type=int)
+@click.option('--new-traffic-limit', '-nt', required=False, help='New traffic limit in GB', type=int)
+@click.option('--new-expiration-days', '-ne', required=False, help='New expiration days', type=int)
+@click.option('--block/--unblock', 'set_blocked', default=None, help='Block or unblock the users')
+def edit_users(usernames: str | None, all_users: bool, blocked: bool | None, status: str | None,
+               expiring_within_days: int | None, prefix: str | None, reset_traffic: bool, renew_creation_date: bool,
+               extend_days: int | None, new_traffic_limit: int | None, new_expiration_days: int | None,
+               set_blocked: bool | None):
+    try:
+        selector = user_selector(usernames, all_users, blocked, status, expiring_within_days, prefix)
+        res = cli_api.edit_users(selector, reset_traffic, renew_creation_date, extend_days, new_traffic_limit,
+                                 new_expiration_days, set_blocked)
+        echo_bulk_result(res, 'updated')
+    except Exception as e:
+        click.echo(f'{e}', err=True)
+
+
 @cli.command('edit-user')
 @click.option('--username', '-u', required=True, help='Username for the user to edit', type=str)
 @click.option('--new-username', '-nu', required=False, help='New username for the user', type=str)
@@ -178,6 +288,17 @@ def remove_user(username: str):
     except Exception as e:
         click.echo(f'{e}', err=True)
 
+@cli.command('remove-users')
+@user_selector_options
+def remove_users(usernames: str | None, all_users: bool, blocked: bool | None, status: str | None,
+                 expiring_within_days: int | None, prefix: str | None):
+    try:
+        res = cli_api.remove_users(user_selector(usernames, all_users, blocked, status, expiring_within_days, prefix))
+        echo_bulk_result(res, 'removed')
+    except Exception as e:
+        click.echo(f'{e}', err=True)
+
+
 @cli.command('kick-user')
 @click.option('--username', '-u', required=True, help='Username of the user to kick')
 def kick_user(username: str):
@@ -207,13 +328,13 @@ def show_user_uri(username: str, qrcode: bool, ipv: int, all: bool, singbox: boo
         click.echo(f'{e}', err=True)
 
 @cli.command('show-user-uri-json')
-@click.argument('usernames', nargs=-1, required=True)
+@click.argument('usernames', nargs=-1)
 def show_user_uri_json(usernames: list[str]):
     """
-    Displays URI information in JSON format for a list of users.
+    Displays URI information in JSON format for a list of users (all users if none are given).
     """
     try:
-        res = cli_api.show_user_uri_json(usernames)
+        res = cli_api.show_user_uri_json(list(usernames))
         if res:
             pretty_print(res)
         else:
@@ -1,9 +1,11 @@
 import os
+import sys
+import csv
 import subprocess
 from enum import Enum
 from datetime import datetime
 import json
-from typing import Any
+from typing import Any, Iterator
 from dotenv import dotenv_values
 
 import traffic
@@ -15,6 +17,27 @@ CONFIG_ENV_FILE = '/etc/hysteria/.configs.env'
 WEBPANEL_ENV_FILE = '/etc/hysteria/core/scripts/webpanel/.env'
 NORMALSUB_ENV_FILE = '/etc/hysteria/core/scripts/normalsub/.env'
 
+# User and server scripts are imported and called in-process; their CLIs are thin wrappers
+sys.path.append(SCRIPT_DIR)
+sys.path.append(os.path.join(SCRIPT_DIR, 'hysteria2'))
+
+import services_status  # noqa: E402
+import traffic_api  # noqa: E402
+from storage import (  # noqa: E402
+    get_user_store, get_traffic_series, get_user_list_index, export_chunks, parse_export_fields,
+    UserStoreError, TrafficSeriesError
+)
+import add_user as add_user_script  # noqa: E402
+import bulk_edit as bulk_edit_script  # noqa: E402
+import edit_user as edit_user_script  # noqa: E402
+import get_user as get_user_script  # noqa: E402
+import kickuser as kick_user_script  # noqa: E402
+import limit as limit_script  # noqa: E402
+import remove_user as remove_user_script  # noqa: E402
+import reset_user as reset_user_script  # noqa: E402
+import server_info as server_info_script  # noqa: E402
+import show_user_uri as show_user_uri_script  # noqa: E402
+
 
 class Command(Enum):
     '''Contains path to command's script'''
@@ -26,11 +49,10 @@ class Command(Enum):
     CHANGE_SNI_HYSTERIA2 = os.path.join(SCRIPT_DIR, 'hysteria2', 'change_sni.py')
     GET_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'get_user.py')
     ADD_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'add_user.py')
-    EDIT_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'edit_user.sh')
+    EDIT_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'edit_user.py')
     RESET_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'reset_user.py')
     REMOVE_USER = os.path.join(SCRIPT_DIR, 'hysteria2', 'remove_user.py')
     SHOW_USER_URI = os.path.join(SCRIPT_DIR, 'hysteria2', 'show_user_uri.py')
-    WRAPPER_URI = os.path.join(SCRIPT_DIR, 'hysteria2', 'wrapper_uri.py')
     IP_ADD = os.path.join(SCRIPT_DIR, 'hysteria2', 'ip.py')
     MANAGE_OBFS = os.path.join(SCRIPT_DIR, 'hysteria2', 'manage_obfs.py')
     MASQUERADE_SCRIPT = os.path.join(SCRIPT_DIR, 'hysteria2', 'masquerade.py')
@@ -49,9 +71,8 @@ class Command(Enum):
     UNINSTALL_WARP = os.path.join(SCRIPT_DIR, 'warp', 'uninstall.py')
     CONFIGURE_WARP = os.path.join(SCRIPT_DIR, 'warp', 'configure.py')
     STATUS_WARP = os.path.join(SCRIPT_DIR, 'warp', 'status.py')
-    SERVICES_STATUS = os.path.join(SCRIPT_DIR, 'services_status.sh')
     VERSION = os.path.join(SCRIPT_DIR, 'hysteria2', 'version.py')
-    LIMIT_SCRIPT = os.path.join(SCRIPT_DIR, 'hysteria2', 'limit.sh')
+    LIMIT_SCRIPT = os.path.join(SCRIPT_DIR, 'hysteria2', 'limit.py')
     KICK_USER_SCRIPT = os.path.join(SCRIPT_DIR, 'hysteria2', 'kickuser.py')
 
 
@@ -94,6 +115,8 @@ def run_cmd(command: list[str]) -> str:
         print(f"Executing command: {' '.join(command)}")
     try:
         process = subprocess.run(command, capture_output=True, text=True, shell=False, check=False)
+        # Most scripts start or stop some unit; don't serve a cached state from before the change
+        services_status.invalidate()
 
         if process.returncode != 0:
             error_output = process.stderr.strip() if process.stderr.strip() else process.stdout.strip()
@@ -113,18 +136,22 @@ def run_cmd(command: list[str]) -> str:
         raise CommandExecutionError(f"OS error while trying to run command '{' '.join(command)}': {e}")
 
 
+def check_script_result(result: tuple[int, str]) -> str:
+    '''
+    Unpacks the (exit_code, message) pair returned by an in-process script function.
+    Raises CommandExecutionError with the script's message if the exit code is non-zero.
+    '''
+    exit_code, message = result
+    if exit_code != 0:
+        raise CommandExecutionError(message)
+    return message
+
+
 def generate_password() -> str:
     '''
-    Generates a random password using pwgen for user.
-    Could raise subprocess.CalledProcessError
+    Generates a random 32 character alphanumeric password for a user.
     '''
-    try:
-        return subprocess.check_output(['pwgen', '-s', '32', '1'], shell=False).decode().strip()
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        try:
-            return subprocess.check_output(['cat', '/proc/sys/kernel/random/uuid'], shell=False).decode().strip()
-        except Exception as e:
-            raise PasswordGenerationError(f"Failed to generate password: {e}")
+    return add_user_script.generate_password()
 
 # endregion
 
@@ -252,16 +279,71 @@ def list_users() -> dict[str, dict[str, Any]] | None:
     '''
     Lists all users.
     '''
-    if res := run_cmd(['bash', Command.LIST_USERS.value]):
-        return json.loads(res)
+    try:
+        return get_user_store().all()
+    except UserStoreError as e:
+        raise CommandExecutionError(f'Failed to list users: {e}')
+
+
+def export_users(fmt: str = 'ndjson', fields: str | list[str] | None = None) -> Iterator[bytes]:
+    '''
+    Streams all users as NDJSON lines or one JSON array, in encoded chunks of a few hundred users.
+    fields projects each user to the given fields (see storage.EXPORT_FIELDS), all of them by default.
+    The format and fields are checked before anything is read; InvalidInputError if either is unknown.
+    '''
+    try:
+        chunks = export_chunks(get_user_store(), fmt, parse_export_fields(fields))
+    except ValueError as e:
+        raise InvalidInputError(str(e))
+    except UserStoreError as e:
+        raise CommandExecutionError(f'Failed to export users: {e}')
+
+    def guarded() -> Iterator[bytes]:
+        try:
+            yield from chunks
+        except UserStoreError as e:
+            raise CommandExecutionError(f'Failed to export users: {e}')
+    return guarded()
+
+
+def list_users_page(offset: int = 0, limit: int = 50, sort: str = 'username', descending: bool = False,
+                    blocked: bool | None = None, status: str | None = None,
+                    expiring_within_days: int | None = None, prefix: str | None = None) -> dict[str, Any]:
+    '''
+    Returns one page of users, sorted and filtered, as {'total', 'offset', 'limit', 'users'}.
+    'users' is a list of user records with their 'username' added; 'total' counts every matching user.
+    Raises InvalidInputError for an unknown sort key or status filter.
+    '''
+    if expiring_within_days is not None and expiring_within_days < 0:
+        raise InvalidInputError('expiring_within_days must not be negative.')
+    try:
+        total, page = get_user_list_index().query(
+            get_user_store(), offset=offset, limit=limit, sort=sort, descending=descending, blocked=blocked,
+            status=status, expiring_within_days=expiring_within_days, prefix=prefix)
+    except ValueError as e:
+        raise InvalidInputError(str(e))
+    except UserStoreError as e:
+        raise CommandExecutionError(f'Failed to list users: {e}')
+    return {
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'users': [{'username': username, **record} for username, record in page],
+    }
 
 
 def get_user(username: str) -> dict[str, Any] | None:
     '''
     Retrieves information about a specific user.
+    Raises CommandExecutionError if the user does not exist.
     '''
-    if res := run_cmd(['python3', Command.GET_USER.value, '-u', str(username)]):
-        return json.loads(res)
+    try:
+        user = get_user_script.get_user(str(username))
+    except UserStoreError as e:
+        raise CommandExecutionError(f"Failed to get user '{username}': {e}")
+    if user is None:
+        raise CommandExecutionError(f"User '{username}' not found.")
+    return user
 
 
 def add_user(username: str, traffic_limit: int, expiration_days: int, password: str | None, creation_date: str | None):
@@ -272,7 +354,55 @@ def add_user(username: str, traffic_limit: int, expiration_days: int, password:
         password = generate_password()
     if not creation_date:
         creation_date = datetime.now().strftime('%Y-%m-%d')
-    run_cmd(['python3', Command.ADD_USER.value, username, str(traffic_limit), str(expiration_days), password, creation_date])
+    check_script_result(add_user_script.create_user(username, str(traffic_limit), str(expiration_days), password, creation_date))
+
+
+def add_users(rows: list[dict[str, Any]], atomic: bool = False) -> list[dict[str, Any]]:
+    '''
+    Adds many users in one user store transaction and returns one result per row.
+
+    Rows carry the add_user() fields (username, traffic_limit in GB, expiration_days,
+    optional password and creation_date). All rows are validated before anything is
+    written; with atomic set, one invalid row means no user is added.
+    '''
+    if not rows:
+        raise InvalidInputError('Error: no users to add')
+    try:
+        return add_user_script.create_users(rows, atomic=atomic)
+    except UserStoreError as e:
+        raise CommandExecutionError(f'Failed to add users: {e}')
+
+
+def read_users_file(path: str) -> list[dict[str, Any]]:
+    '''
+    Reads users to add from a .csv file (with a header row) or a .jsonl file (one object per line).
+    Columns and keys are the add_user() fields. Raises InvalidInputError for unreadable input.
+    '''
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            if extension == '.csv':
+                reader = csv.DictReader(f)
+                missing = {'username', 'traffic_limit', 'expiration_days'} - set(reader.fieldnames or ())
+                if missing:
+                    raise InvalidInputError(f"Error: {path} is missing the column(s): {', '.join(sorted(missing))}")
+                return [{key.strip(): (value or '').strip() for key, value in row.items() if key} for row in reader]
+            if extension in ('.jsonl', '.ndjson'):
+                rows = []
+                for line_number, line in enumerate(f, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise InvalidInputError(f'Error: line {line_number} of {path} is not valid JSON: {e}')
+                    if not isinstance(row, dict):
+                        raise InvalidInputError(f'Error: line {line_number} of {path} is not a JSON object')
+                    rows.append(row)
+                return rows
+    except OSError as e:
+        raise InvalidInputError(f'Error: could not read {path}: {e}')
+    raise InvalidInputError('Error: the users file must be a .csv or .jsonl file')
 
 
 def edit_user(username: str, new_username: str | None, new_traffic_limit: int | None, new_expiration_days: int | None, renew_password: bool, renew_creation_date: bool, blocked: bool):
@@ -295,9 +425,7 @@ def edit_user(username: str, new_username: str | None, new_traffic_limit: int |
         creation_date = datetime.now().strftime('%Y-%m-%d')
     else:
         creation_date = ''
-    command_args = [
-        'bash',
-        Command.EDIT_USER.value,
+    check_script_result(edit_user_script.update_user(
         username,
         new_username or '',
         str(new_traffic_limit) if new_traffic_limit is not None else '',
@@ -305,34 +433,133 @@ def edit_user(username: str, new_username: str | None, new_traffic_limit: int |
         password,
         creation_date,
         'true' if blocked else 'false'
-    ]
-    run_cmd(command_args)
+    ))
 
 
 def reset_user(username: str):
     '''
     Resets a user's configuration.
     '''
-    run_cmd(['python3', Command.RESET_USER.value, username])
+    check_script_result(reset_user_script.reset_user_data(username))
 
 
 def remove_user(username: str):
     '''
     Removes a user by username.
     '''
-    run_cmd(['python3', Command.REMOVE_USER.value, username])
+    check_script_result(remove_user_script.sync_remove_user(username))
+
+def select_users(usernames: list[str] | None = None, all_users: bool = False, blocked: bool | None = None,
+                 status: str | None = None, expiring_within_days: int | None = None,
+                 prefix: str | None = None) -> list[str]:
+    '''
+    Resolves a selector for the bulk user operations to usernames.
+    The filters are those of list_users_page() and narrow down the given usernames, or all users with all_users.
+    Raises InvalidInputError if nothing selects users or for an unknown filter value.
+    '''
+    if expiring_within_days is not None and expiring_within_days < 0:
+        raise InvalidInputError('expiring_within_days must not be negative.')
+    try:
+        return bulk_edit_script.select_users(usernames, all_users, blocked, status, expiring_within_days, prefix)
+    except ValueError as e:
+        raise InvalidInputError(f'Error: {e}')
+    except UserStoreError as e:
+        raise CommandExecutionError(f'Failed to select users: {e}')
+
+
+def _bulk_result(results: list[dict[str, Any]], kick: list[str] | None = None) -> dict[str, Any]:
+    '''Counts bulk operation results and kicks the given users, all in one batched call.'''
+    applied = [result['username'] for result in results if result['applied']]
+    kick_failed: list[str] = []
+    if kick:
+        try:
+            traffic_api.get_client().kick_clients(kick)
+        except traffic_api.KickError as e:
+            kick_failed = e.failed
+        except Exception:
+            kick_failed = list(kick)
+    return {
+        'matched': len(results),
+        'applied': len(applied),
+        'failed': len(results) - len(applied),
+        'kick_failed': kick_failed,
+        'results': results,
+    }
+
+
+def edit_users(selector: dict[str, Any], reset_traffic: bool = False, renew_creation_date: bool = False,
+               extend_days: int | None = None, new_traffic_limit: int | None = None,
+               new_expiration_days: int | None = None, blocked: bool | None = None) -> dict[str, Any]:
+    '''
+    Applies the same edit to every user matched by selector (the select_users() arguments).
+
+    Traffic is collected once before the edit so a traffic reset does not lose usage, the edit is one
+    store transaction, and newly blocked users are kicked afterwards in one batched call.
+    Returns {'matched', 'applied', 'failed', 'kick_failed', 'results'} with one result per matched user.
+    '''
+    if not any([reset_traffic, renew_creation_date, extend_days, new_traffic_limit, new_expiration_days, blocked is not None]):
+        raise InvalidInputError('Error: at least one change is required')
+    if extend_days is not None and new_expiration_days is not None:
+        raise InvalidInputError('Error: extend days and new expiration days cannot be combined')
+    if new_traffic_limit is not None and new_traffic_limit <= 0:
+        raise InvalidInputError('Error: traffic limit must be greater than 0')
+    if new_expiration_days is not None and new_expiration_days <= 0:
+        raise InvalidInputError('Error: expiration days must be greater than 0')
+    if extend_days is not None and extend_days <= 0:
+        raise InvalidInputError('Error: extend days must be greater than 0')
+
+    usernames = select_users(**selector)
+    if not usernames:
+        return _bulk_result([])
+    traffic_status(display_output=False)
+    try:
+        results, newly_blocked = bulk_edit_script.update_users(usernames, reset_traffic, renew_creation_date,
+                                                               extend_days, new_traffic_limit, new_expiration_days,
+                                                               blocked)
+    except UserStoreError as e:
+        raise CommandExecutionError(f'Failed to edit users: {e}')
+    return _bulk_result(results, kick=newly_blocked)
+
+
+def remove_users(selector: dict[str, Any]) -> dict[str, Any]:
+    '''
+    Removes every user matched by selector (the select_users() arguments).
+
+    Traffic is collected once, the users are deleted in one store transaction and then kicked in one
+    batched call, so they cannot reconnect in between.
+    Returns {'matched', 'applied', 'failed', 'kick_failed', 'results'} with one result per matched user.
+    '''
+    usernames = select_users(**selector)
+    if not usernames:
+        return _bulk_result([])
+    traffic_status(display_output=False)
+    try:
+        results = bulk_edit_script.remove_users(usernames)
+    except UserStoreError as e:
+        raise CommandExecutionError(f'Failed to remove users: {e}')
+    return _bulk_result(results, kick=[result['username'] for result in results if result['applied']])
+
+
+def get_user_traffic(username: str, start: int, end: int, step: int | None = None) -> dict[str, Any]:
+    '''
+    Returns a user's traffic history between two unix timestamps, bucketed by step seconds.
+    Raises InvalidInputError for an unusable range.
+    '''
+    get_user(username)
+    try:
+        return get_traffic_series().query(username, int(start), int(end), step)
+    except TrafficSeriesError as e:
+        raise InvalidInputError(str(e))
+
 
 def kick_user_by_name(username: str):
     '''Kicks a specific user by username.'''
     if not username:
         raise InvalidInputError('Username must be provided to kick a specific user.')
-    script_path = Command.KICK_USER_SCRIPT.value
-    if not os.path.exists(script_path):
-        raise ScriptNotFoundError(f"Kick user script not found at: {script_path}")
     try:
-        subprocess.run(['python3', script_path, username], check=True)
-    except subprocess.CalledProcessError as e:
-        raise CommandExecutionError(f"Failed to execute kick user script: {e}")
+        kick_user_script.kick_user(username)
+    except Exception as e:
+        raise CommandExecutionError(f"Failed to kick user '{username}': {e}")
 
 # TODO: it's better to return json
 def show_user_uri(username: str, qrcode: bool, ipv: int, all: bool, singbox: bool, normalsub: bool) -> str | None:
@@ -352,28 +579,27 @@ def show_user_uri(username: str, qrcode: bool, ipv: int, all: bool, singbox: boo
         command_args.append('-n')
     return run_cmd(command_args)
 
-def show_user_uri_json(usernames: list[str]) -> list[dict[str, Any]] | None:
+def show_user_uri_json(usernames: list[str] | None = None) -> list[dict[str, Any]]:
     '''
-    Displays the URI for a list of users in JSON format.
+    Returns the IPv4, IPv6 and Normal-SUB links of the given users (all users if none are given).
+    Unknown users get an entry with an "error" key instead of links.
     '''
-    script_path = Command.WRAPPER_URI.value
-    if not os.path.exists(script_path):
-        raise ScriptNotFoundError(f"Wrapper URI script not found at: {script_path}")
     try:
-        process = subprocess.run(['python3', script_path, *usernames], capture_output=True, text=True, check=True)
-        return json.loads(process.stdout)
-    except subprocess.CalledProcessError as e:
-        raise CommandExecutionError(f"Failed to execute wrapper URI script: {e}\nError: {e.stderr}")
-    except FileNotFoundError:
-        raise ScriptNotFoundError(f'Script not found: {script_path}')
-    except json.JSONDecodeError:
-        raise CommandExecutionError(f"Failed to decode JSON output from script: {script_path}\nOutput: {process.stdout if 'process' in locals() else 'No output'}") # Add process check
-    except Exception as e:
-        raise HysteriaError(f'An unexpected error occurred: {e}')
-        
-# endregion
+        server_ctx = show_user_uri_script.load_server_context()
+    except (OSError, KeyError, json.JSONDecodeError) as e:
+        raise CommandExecutionError(f'Failed to load server settings: {e}')
+    if not server_ctx['hysteria_active']:
+        raise CommandExecutionError('Hysteria2 is not active.')
 
-# region Server
+    try:
+        store = get_user_store()
+        if usernames:
+            users = [(username, store.get(username)) for username in usernames]
+        else:
+            users = list(store.iterate())
+    except UserStoreError as e:
+        raise CommandExecutionError(f'Failed to read users: {e}')
+    return show_user_uri_script.build_uris(users, server_ctx)
 
 
 def traffic_status(no_gui=False, display_output=True):
@@ -391,7 +617,32 @@ def traffic_status(no_gui=False, display_output=True):
 # TODO: After json todo need fix Telegram Bot and WebPanel
 def server_info() -> str | None:
     '''Retrieves server information.'''
-    return run_cmd(['python3', Command.SERVER_INFO.value])
+    try:
+        return server_info_script.format_server_info(server_info_script.get_server_info())
+    except (OSError, ValueError) as e:
+        raise CommandExecutionError(f'Failed to get server info: {e}')
+
+
+def server_metrics() -> dict[str, int | float]:
+    '''
+    Returns the latest server figures as numbers (CPU percent, RAM in MB, traffic in bytes).
+    They come from a background sampler that is started on first use and refreshes every few seconds.
+    '''
+    return server_info_script.get_metrics_sampler().snapshot()
+
+
+def get_online_usernames() -> list[str]:
+    '''Returns the users that were online at the metrics sampler's latest sample.'''
+    sampler = server_info_script.get_metrics_sampler()
+    sampler.snapshot()  # takes the first sample if there is none yet
+    return sorted(sampler.online_users())
+
+
+def traffic_api_metrics() -> dict[str, dict[str, Any]]:
+    '''
+    Returns this process's latency histograms for calls to the Hysteria2 traffic stats API, keyed by endpoint.
+    '''
+    return traffic_api.api_metrics()
 
 
 def get_ip_address() -> tuple[str | None, str | None]:
@@ -613,9 +864,8 @@ def reset_webpanel_credentials(new_username: str | None = None, new_password: st
     run_cmd(cmd_args)
 
 def get_services_status() -> dict[str, bool] | None:
-    '''Gets the status of all project services.'''
-    if res := run_cmd(['bash', Command.SERVICES_STATUS.value]):
-        return json.loads(res)
+    '''Gets the status of all project services (cached for a few seconds).'''
+    return services_status.get_services_status()
 
 def show_version() -> str | None:
     """Displays the currently installed version of the panel."""
@@ -628,11 +878,13 @@ def check_version() -> str | None:
 
 def start_ip_limiter():
     '''Starts the IP limiter service.'''
-    run_cmd(['bash', Command.LIMIT_SCRIPT.value, 'start'])
+    check_script_result(limit_script.install_service())
+    services_status.invalidate()
 
 def stop_ip_limiter():
     '''Stops the IP limiter service.'''
-    run_cmd(['bash', Command.LIMIT_SCRIPT.value, 'stop'])
+    check_script_result(limit_script.uninstall_service())
+    services_status.invalidate()
 
 def config_ip_limiter(block_duration: int = None, max_ips: int = None):
     '''Configures the IP limiter service.'''
@@ -641,18 +893,7 @@ def config_ip_limiter(block_duration: int = None, max_ips: int = None):
     if max_ips is not None and max_ips <= 0:
         raise InvalidInputError("Max IPs must be greater than 0.")
 
-    cmd_args = ['bash', Command.LIMIT_SCRIPT.value, 'config']
-    if block_duration is not None:
-        cmd_args.append(str(block_duration))
-    else:
-        cmd_args.append('')
-
-    if max_ips is not None:
-        cmd_args.append(str(max_ips))
-    else:
-        cmd_args.append('')
-
-    run_cmd(cmd_args)
+    check_script_result(limit_script.change_config(block_duration, max_ips))
 
 def get_ip_limiter_config() -> dict[str, int | None]:
     '''Retrieves the current IP Limiter configuration from .configs.env.'''
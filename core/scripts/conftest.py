@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+for path in (SCRIPTS_DIR, os.path.join(SCRIPTS_DIR, 'hysteria2')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from storage import JsonUserStore, SqliteUserStore  # noqa: E402
+
+
+@pytest.fixture(params=('json', 'sqlite'))
+def store(request, tmp_path):
+    """A fresh user store of each backend in a temporary directory."""
+    if request.param == 'json':
+        return JsonUserStore(str(tmp_path / 'users.json'))
+    return SqliteUserStore(str(tmp_path / 'users.db'))
@@ -1,106 +1,162 @@
 #!/usr/bin/env python3
 
-import json
 import sys
-import os
-import subprocess
 import re
+import string
+import secrets
 from datetime import datetime
+from typing import Any
 from init_paths import *
 from paths import *
+from storage import get_user_store, UserStoreError, MAX_USERNAME_BYTES
 
-def add_user(username, traffic_gb, expiration_days, password=None, creation_date=None):
-    """
-    Adds a new user to the USERS_FILE.
+PASSWORD_LENGTH = 32
+PASSWORD_ALPHABET = string.ascii_letters + string.digits
 
-    Args:
-        username (str): The username to add.
-        traffic_gb (str): The traffic limit in GB.
-        expiration_days (str): The number of days until the account expires.
-        password (str, optional): The user's password. If None, a random one is generated.
-        creation_date (str, optional): The account creation date in YYYY-MM-DD format. If None, the current date is used.
 
-    Returns:
-        int: 0 on success, 1 on failure.
+def generate_password():
+    """Generates a random alphanumeric password, like `pwgen -s 32 1` did, without spawning a process."""
+    return ''.join(secrets.choice(PASSWORD_ALPHABET) for _ in range(PASSWORD_LENGTH))
+
+
+def build_user_record(username, traffic_gb, expiration_days, password=None, creation_date=None) -> tuple[str, dict[str, Any]]:
     """
-    if not username or not traffic_gb or not expiration_days:
-        print(f"Usage: {sys.argv[0]} <username> <traffic_limit_GB> <expiration_days> [password] [creation_date]")
-        return 1
+    Validates the fields of a new user and returns (lowercased username, record).
+
+    Raises:
+        ValueError: With a message naming the first problem found.
+    """
+    # 0 is a valid limit and expiry (unlimited), so only None and '' count as missing
+    if not username or traffic_gb in (None, '') or expiration_days in (None, ''):
+        raise ValueError("Username, traffic limit and expiration days are required.")
 
     try:
         traffic_bytes = int(float(traffic_gb) * 1073741824)
         expiration_days = int(expiration_days)
-    except ValueError:
-        print("Error: Traffic limit and expiration days must be numeric.")
-        return 1
-
-    username_lower = username.lower()
-
-    if not password:
-        try:
-            password_process = subprocess.run(['pwgen', '-s', '32', '1'], capture_output=True, text=True, check=True)
-            password = password_process.stdout.strip()
-        except FileNotFoundError:
-            try:
-                password = subprocess.check_output(['cat', '/proc/sys/kernel/random/uuid'], text=True).strip()
-            except Exception:
-                print("Error: Failed to generate password. Please install 'pwgen' or ensure /proc access.")
+    except (TypeError, ValueError):
+        raise ValueError("Error: Traffic limit and expiration days must be numeric.")
 
     if not creation_date:
         creation_date = datetime.now().strftime("%Y-%m-%d")
     else:
         if not re.match(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$", creation_date):
-            print("Invalid date format. Expected YYYY-MM-DD.")
-            return 1
+            raise ValueError("Invalid date format. Expected YYYY-MM-DD.")
         try:
             datetime.strptime(creation_date, "%Y-%m-%d")
         except ValueError:
-            print("Invalid date. Please provide a valid date in YYYY-MM-DD format.")
-            return 1
+            raise ValueError("Invalid date. Please provide a valid date in YYYY-MM-DD format.")
 
     if not re.match(r"^[a-zA-Z0-9]+$", username):
-        print("Error: Username can only contain letters and numbers.")
-        return 1
+        raise ValueError("Error: Username can only contain letters and numbers.")
+    if len(username) > MAX_USERNAME_BYTES:
+        raise ValueError(f"Error: Username can be at most {MAX_USERNAME_BYTES} characters long.")
 
-    if not os.path.isfile(USERS_FILE):
-        try:
-            with open(USERS_FILE, 'w') as f:
-                json.dump({}, f)
-        except IOError:
-            print(f"Error: Could not create {USERS_FILE}.")
-            return 1
+    return username.lower(), {
+        "password": password or generate_password(),
+        "max_download_bytes": traffic_bytes,
+        "expiration_days": expiration_days,
+        "account_creation_date": creation_date,
+        "blocked": False
+    }
+
+
+def create_user(username, traffic_gb, expiration_days, password=None, creation_date=None):
+    """
+    Adds a new user to the user store.
+
+    Args:
+        username (str): The username to add.
+        traffic_gb (str): The traffic limit in GB.
+        expiration_days (str): The number of days until the account expires.
+        password (str, optional): The user's password. If None, a random one is generated.
+        creation_date (str, optional): The account creation date in YYYY-MM-DD format. If None, the current date is used.
+
+    Returns:
+        tuple[int, str]: The exit code (0 on success, 1 on failure) and a message.
+    """
+    if not username or traffic_gb in (None, '') or expiration_days in (None, ''):
+        return 1, f"Usage: {sys.argv[0]} <username> <traffic_limit_GB> <expiration_days> [password] [creation_date]"
+
+    try:
+        username_lower, record = build_user_record(username, traffic_gb, expiration_days, password, creation_date)
+    except ValueError as e:
+        return 1, str(e)
 
     try:
-        with open(USERS_FILE, 'r+') as f:
+        store = get_user_store()
+        with store.transaction():
+            if store.exists(username_lower, ignore_case=True):
+                return 1, "User already exists."
+
+            store.put(username_lower, record)
+
+        return 0, f"User {username} added successfully."
+
+    except UserStoreError as e:
+        return 1, f"Error: Could not add user to the user store: {e}"
+
+
+def create_users(rows: list[dict[str, Any]], atomic: bool = False) -> list[dict[str, Any]]:
+    """
+    Adds many users in a single user store transaction.
+
+    Each row has the create_user() fields as keys (username, traffic_limit in
+    GB, expiration_days, and optionally password and creation_date). Every row
+    is validated before anything is written, including duplicates within the
+    batch and against existing users, which are looked up once for the whole
+    batch. Valid rows are then written together; with atomic=True a single
+    invalid row cancels the whole batch.
+
+    Returns:
+        list[dict]: One {'row', 'username', 'added', 'error'} result per input row, in order.
+
+    Raises:
+        UserStoreError: If the store cannot be read or written; nothing is added then.
+    """
+    store = get_user_store()
+    with store.transaction():
+        existing = {name.lower() for name, _ in store.iterate()}
+        results, records = [], {}
+        for row_number, row in enumerate(rows, start=1):
+            username = str(row.get("username") or "")
+            password, creation_date = (str(row[key]) if row.get(key) else None for key in ("password", "creation_date"))
+            result = {"row": row_number, "username": username, "added": False, "error": None}
             try:
-                users_data = json.load(f)
-            except json.JSONDecodeError:
-                print(f"Error: {USERS_FILE} contains invalid JSON.")
-                return 1
-
-            for existing_username in users_data:
-                if existing_username.lower() == username_lower:
-                    print("User already exists.")
-                    return 1
-
-            users_data[username_lower] = {
-                "password": password,
-                "max_download_bytes": traffic_bytes,
-                "expiration_days": expiration_days,
-                "account_creation_date": creation_date,
-                "blocked": False
-            }
-
-            f.seek(0)
-            json.dump(users_data, f, indent=4)
-            f.truncate()
-
-        print(f"User {username} added successfully.")
-        return 0
-
-    except IOError:
-        print(f"Error: Could not write to {USERS_FILE}.")
-        return 1
+                username_lower, record = build_user_record(
+                    username, row.get("traffic_limit"), row.get("expiration_days"), password, creation_date)
+                if username_lower in existing:
+                    raise ValueError("User already exists.")
+                if username_lower in records:
+                    raise ValueError("Duplicate username in this batch.")
+            except ValueError as e:
+                result["error"] = str(e)
+            else:
+                records[username_lower] = record
+            results.append(result)
+
+        if atomic and any(result["error"] for result in results):
+            for result in results:
+                if not result["error"]:
+                    result["error"] = "Not added: another row in the batch is invalid."
+            return results
+
+        store.put_many(records)
+
+    for result in results:
+        result["added"] = result["error"] is None
+    return results
+
+
+def add_user(username, traffic_gb, expiration_days, password=None, creation_date=None):
+    """
+    Adds a new user to the user store and prints the outcome.
+
+    Returns:
+        int: 0 on success, 1 on failure.
+    """
+    exit_code, message = create_user(username, traffic_gb, expiration_days, password, creation_date)
+    print(message)
+    return exit_code
 
 if __name__ == "__main__":
     if len(sys.argv) not in [4, 6]:
@@ -114,4 +170,4 @@ if __name__ == "__main__":
     creation_date = sys.argv[5] if len(sys.argv) > 5 else None
 
     exit_code = add_user(username, traffic_gb, expiration_days, password, creation_date)
-    sys.exit(exit_code)
\ No newline at end of file
+    sys.exit(exit_code)
@@ -1,27 +1,47 @@
 #!/usr/bin/env python3
 
 import zipfile
+import tempfile
 from pathlib import Path
 from datetime import datetime
+from init_paths import *
+from paths import *
+from storage import get_user_store
 
 backup_dir = Path("/opt/hysbackup")
-backup_file = backup_dir / f"hysteria_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
 
 files_to_backup = [
     Path("/etc/hysteria/ca.key"),
     Path("/etc/hysteria/ca.crt"),
-    Path("/etc/hysteria/users.json"),
     Path("/etc/hysteria/config.json"),
     Path("/etc/hysteria/.configs.env"),
 ]
 
-backup_dir.mkdir(parents=True, exist_ok=True)
 
-try:
-    with zipfile.ZipFile(backup_file, 'w') as zipf:
+def create_backup() -> Path:
+    """Writes a timestamped zip of the config files and users to backup_dir and returns its path."""
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    backup_file = backup_dir / f"hysteria_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+
+    with zipfile.ZipFile(backup_file, 'w') as zipf, tempfile.TemporaryDirectory() as tmp_dir:
+        # Users are exported from the user store so backups keep the users.json layout
+        users_export = Path(tmp_dir) / "users.json"
+        get_user_store().export_json(str(users_export))
+        zipf.write(users_export, arcname="users.json")
+
         for file_path in files_to_backup:
             if file_path.exists():
                 zipf.write(file_path, arcname=file_path.name)
-    print("Backup successfully created")
-except Exception as e:
-    print("Backup failed!", str(e))
+    return backup_file
+
+
+def main():
+    try:
+        create_backup()
+        print("Backup successfully created")
+    except Exception as e:
+        print("Backup failed!", str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import sys
+from datetime import date
+from typing import Any
+from init_paths import *
+from paths import *
+from storage import get_user_store, get_traffic_series, get_user_list_index, TrafficSeriesError
+
+GB_TO_BYTES = 1024 * 1024 * 1024
+
+
+def select_users(usernames=None, all_users=False, blocked=None, status=None,
+                 expiring_within_days=None, prefix=None) -> list[str]:
+    """
+    Resolves a user selector to a list of usernames.
+
+    The filters are the ones of the paged user list (blocked, status,
+    expiring_within_days, prefix) and narrow down either the given usernames
+    or, with all_users, every user. Given usernames are kept in their order
+    even if they do not exist, so the caller can report them as not found.
+
+    Raises:
+        ValueError: If nothing selects users, or for an unknown status filter.
+        UserStoreError: If the store cannot be read.
+    """
+    filtered = any(value is not None for value in (blocked, status, expiring_within_days)) or bool(prefix)
+    if not usernames and not all_users and not filtered:
+        raise ValueError("Select users by name, with a filter, or all users.")
+
+    names = list(dict.fromkeys(usernames)) if usernames else None
+    if not filtered:
+        return names if names is not None else [username for username, _ in get_user_store().iterate()]
+
+    _, page = get_user_list_index().query(
+        get_user_store(), limit=sys.maxsize, blocked=blocked, status=status,
+        expiring_within_days=expiring_within_days, prefix=prefix)
+    matching = [username for username, _ in page]
+    if names is None:
+        return matching
+    matching = set(matching)
+    return [username for username in names if username in matching]
+
+
+def update_users(usernames, reset_traffic=False, renew_creation_date=False, extend_days=None,
+                 new_traffic_limit=None, new_expiration_days=None, blocked=None) -> tuple[list[dict[str, Any]], list[str]]:
+    """
+    Applies the same changes to many users in a single user store transaction.
+
+    extend_days leaves users that never expire (expiration_days 0) as they are:
+    adding days would make them expire counted from their old creation date.
+    Such a user is reported with a warning, or as not applied if extending was
+    the only change.
+
+    Args:
+        usernames (list[str]): The users to change.
+        reset_traffic (bool): Sets upload and download counters to 0.
+        renew_creation_date (bool): Sets the creation date to today, restarting the plan.
+        extend_days (int, optional): Adds days to each user's current expiration days.
+        new_traffic_limit (int, optional): New traffic limit in GB.
+        new_expiration_days (int, optional): New number of days until expiry.
+        blocked (bool, optional): Blocks or unblocks the users.
+
+    Returns:
+        tuple[list[dict], list[str]]: One {'username', 'applied', 'error'} result per user, in order,
+        and the users that went from unblocked to blocked.
+
+    Raises:
+        UserStoreError: If the store cannot be written; no user is changed then.
+    """
+    fields: dict[str, Any] = {}
+    if reset_traffic:
+        fields["upload_bytes"] = 0
+        fields["download_bytes"] = 0
+    if renew_creation_date:
+        fields["account_creation_date"] = date.today().strftime("%Y-%m-%d")
+    if new_traffic_limit is not None:
+        fields["max_download_bytes"] = int(new_traffic_limit) * GB_TO_BYTES
+    if new_expiration_days is not None:
+        fields["expiration_days"] = int(new_expiration_days)
+    if blocked is not None:
+        fields["blocked"] = bool(blocked)
+
+    results, newly_blocked = [], []
+    store = get_user_store()
+    with store.transaction():
+        for username in usernames:
+            user = store.get(username)
+            if user is None:
+                results.append({"username": username, "applied": False, "error": "User not found."})
+                continue
+            user_fields = dict(fields)
+            result = {"username": username, "applied": True, "error": None}
+            if extend_days is not None:
+                if user.get("expiration_days"):
+                    user_fields["expiration_days"] = user["expiration_days"] + int(extend_days)
+                elif user_fields:
+                    result["warning"] = "Never expires; expiration days left unchanged."
+                else:
+                    results.append({"username": username, "applied": False,
+                                    "error": "Never expires; there is nothing to extend."})
+                    continue
+            if blocked and not user.get("blocked"):
+                newly_blocked.append(username)
+            store.patch(username, user_fields)
+            results.append(result)
+    return results, newly_blocked
+
+
+def remove_users(usernames) -> list[dict[str, Any]]:
+    """
+    Removes many users in a single user store transaction and frees their traffic history.
+
+    Returns:
+        list[dict]: One {'username', 'applied', 'error'} result per user, in order; a removed
+        user whose traffic history could not be freed also carries a 'warning'.
+
+    Raises:
+        UserStoreError: If the store cannot be written; no user is removed then.
+    """
+    results = []
+    store = get_user_store()
+    with store.transaction():
+        for username in usernames:
+            removed = store.delete(username)
+            results.append({"username": username, "applied": removed, "error": None if removed else "User not found."})
+
+    # The users are gone either way; a history slot that could not be freed is reported, not fatal
+    series = get_traffic_series(writable=True)
+    for result in results:
+        if not result["applied"]:
+            continue
+        try:
+            series.remove(result["username"])
+        except (OSError, TrafficSeriesError) as e:
+            result["warning"] = f"Traffic history could not be freed: {e}"
+    return results
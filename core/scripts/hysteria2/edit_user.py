@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import sys
+import re
+from datetime import datetime
+from init_paths import *
+from paths import *
+from storage import get_user_store, get_traffic_series, UserStoreError, TrafficSeriesError, MAX_USERNAME_BYTES
+
+GB_TO_BYTES = 1024 * 1024 * 1024
+
+
+def validate_username(username):
+    if username and not re.match(r"^[a-zA-Z0-9]+$", username):
+        return "Username can only contain letters and numbers."
+    if username and len(username) > MAX_USERNAME_BYTES:
+        return f"Username can be at most {MAX_USERNAME_BYTES} characters long."
+    return None
+
+
+def validate_number(value, name):
+    if value and not re.match(r"^[0-9]+$", value):
+        return f"{name} must be a valid integer."
+    return None
+
+
+def validate_date(date_str):
+    if not date_str:
+        return None
+    if not re.match(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$", date_str):
+        return "Invalid date format. Expected YYYY-MM-DD."
+    try:
+        datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError:
+        return "Invalid date. Please provide a valid date in YYYY-MM-DD format."
+    return None
+
+
+def convert_blocked_status(status, default=False):
+    if status in ("true", "y", "Y"):
+        return True
+    if status in ("false", "n", "N"):
+        return False
+    return default
+
+
+def update_user(username, new_username=None, new_traffic_limit=None, new_expiration_days=None,
+                new_password=None, new_creation_date=None, new_blocked=None):
+    """
+    Edits an existing user in the user store. Empty values keep the current setting.
+
+    Args:
+        username (str): The user to edit.
+        new_username (str, optional): Renames the user.
+        new_traffic_limit (str, optional): New traffic limit in GB.
+        new_expiration_days (str, optional): New number of days until expiry.
+        new_password (str, optional): New password.
+        new_creation_date (str, optional): New creation date in YYYY-MM-DD format.
+        new_blocked (str, optional): 'true' or 'false'.
+
+    Returns:
+        tuple[int, str]: The exit code (0 on success, 1 on failure) and a message.
+    """
+    errors = [
+        validate_username(new_username),
+        validate_number(new_traffic_limit, "Traffic limit"),
+        validate_number(new_expiration_days, "Expiration days"),
+        validate_date(new_creation_date),
+    ]
+    if new_blocked and new_blocked not in ("true", "false"):
+        errors.append("Blocked status must be 'true' or 'false'.")
+    errors = [error for error in errors if error]
+    if errors:
+        return 1, "\n".join(errors)
+
+    try:
+        store = get_user_store()
+        with store.transaction():
+            user = store.get(username)
+            if user is None:
+                return 1, f"User '{username}' not found."
+
+            fields = {
+                "blocked": convert_blocked_status(new_blocked, user.get("blocked", False)),
+            }
+            if new_password:
+                fields["password"] = new_password
+            if new_traffic_limit:
+                fields["max_download_bytes"] = int(new_traffic_limit) * GB_TO_BYTES
+            if new_expiration_days:
+                fields["expiration_days"] = int(new_expiration_days)
+            if new_creation_date:
+                fields["account_creation_date"] = new_creation_date
+
+            store.patch(username, fields)
+            if new_username and new_username != username:
+                store.rename(username, new_username)
+
+    except UserStoreError as e:
+        return 1, f"Failed to update user '{username}': {e}"
+
+    if new_username and new_username != username:
+        try:
+            get_traffic_series(writable=True).rename(username, new_username)
+        except (OSError, TrafficSeriesError):
+            pass
+
+    return 0, "User updated successfully."
+
+
+def edit_user(username, new_username=None, new_traffic_limit=None, new_expiration_days=None,
+              new_password=None, new_creation_date=None, new_blocked=None):
+    """
+    Prints the requested changes, applies them with update_user() and prints the outcome.
+
+    Returns:
+        int: 0 on success, 1 on failure.
+    """
+    print("Updating user:")
+    print(f"Username: {new_username or username}")
+    print(f"Password: {new_password or '(not changed)'}")
+    print(f"Traffic Limit (GB): {new_traffic_limit or '(not changed)'}")
+    print(f"Expiration Days: {new_expiration_days or '(not changed)'}")
+    print(f"Creation Date: {new_creation_date or '(not changed)'}")
+    print(f"Blocked: {new_blocked or '(not changed)'}")
+
+    exit_code, message = update_user(username, new_username, new_traffic_limit, new_expiration_days,
+                                      new_password, new_creation_date, new_blocked)
+    print(message)
+    return exit_code
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <username> [new_username] [new_traffic_limit_GB] [new_expiration_days] [new_password] [new_creation_date] [blocked]")
+        sys.exit(1)
+
+    args = sys.argv[1:] + [""] * (8 - len(sys.argv))
+    exit_code = edit_user(*args[:7])
+    sys.exit(exit_code)
@@ -2,14 +2,26 @@
 
 import json
 import sys
-import os
 import getopt
 from init_paths import *
 from paths import *
+from storage import get_user_store, UserStoreError
+
+def get_user(username):
+    """
+    Returns the record of a specific user from the user store.
+
+    Args:
+        username (str): The username to look up.
+
+    Returns:
+        dict | None: The user's details, or None if the user does not exist.
+    """
+    return get_user_store().get(username)
 
 def get_user_info(username):
     """
-    Retrieves and prints information for a specific user from the USERS_FILE.
+    Retrieves and prints information for a specific user from the user store.
 
     Args:
         username (str): The username to look up.
@@ -17,19 +29,13 @@ def get_user_info(username):
     Returns:
         int: 0 on success, 1 on failure.
     """
-    if not os.path.isfile(USERS_FILE):
-        print(f"users.json file not found at {USERS_FILE}!")
-        return 1
-
     try:
-        with open(USERS_FILE, 'r') as f:
-            users_data = json.load(f)
-    except json.JSONDecodeError:
-        print(f"Error: {USERS_FILE} contains invalid JSON.")
+        user_info = get_user(username)
+    except UserStoreError as e:
+        print(f"Error: {e}")
         return 1
 
-    if username in users_data:
-        user_info = users_data[username]
+    if user_info is not None:
         print(json.dumps(user_info, indent=4))  # Print with indentation for readability
         # upload_bytes = user_info.get('upload_bytes', "No upload data available")
         # download_bytes = user_info.get('download_bytes', "No download data available")
@@ -40,7 +46,7 @@ def get_user_info(username):
         # print(f"Status: {status}")
         return 0
     else:
-        print(f"User '{username}' not found in {USERS_FILE}.")
+        print(f"User '{username}' not found.")
         return 1
 
 if __name__ == "__main__":
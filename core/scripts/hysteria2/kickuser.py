@@ -3,35 +3,22 @@
 import argparse
 import json
 import sys
-import os
-from hysteria2_api import Hysteria2Client, Hysteria2Error
+from hysteria2_api import Hysteria2Error
 
 from init_paths import *
 from paths import *
+from traffic_api import get_client
 
 
-def get_api_secret(config_path: str) -> str:
-    if not os.path.exists(config_path):
-        raise FileNotFoundError(f"Configuration file not found: {config_path}")
+def kick_user(username: str):
+    """
+    Disconnects a user through the Hysteria2 traffic stats API.
 
-    try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config_data = json.load(f)
-
-        traffic_stats = config_data.get('trafficStats')
-        if not isinstance(traffic_stats, dict):
-             raise KeyError("Key 'trafficStats' not found or is not a dictionary in config")
-
-        secret = traffic_stats.get('secret')
-        if not secret:
-            raise ValueError("Value for 'trafficStats.secret' not found or is empty in config")
-
-        return secret
-
-    except json.JSONDecodeError as e:
-        raise json.JSONDecodeError(f"Error parsing JSON file: {config_path} - {e.msg}", e.doc, e.pos)
-    except KeyError as e:
-         raise KeyError(f"Missing expected key {e} in {config_path}")
+    Raises:
+        FileNotFoundError, ValueError: If config.json is unusable.
+        Hysteria2Error: If the API call fails.
+    """
+    get_client().kick_clients([username])
 
 
 def main():
@@ -47,18 +34,7 @@ def main():
     username_to_kick = args.username
 
     try:
-        api_secret = get_api_secret(CONFIG_FILE)
-        # print(api_secret)
-        # print(f"Kicking user: {username_to_kick}")
-
-        client = Hysteria2Client(
-            base_url=API_BASE_URL,
-            secret=api_secret
-        )
-
-        client.kick_clients([username_to_kick])
-
-        # print(f"User '{username_to_kick}' kicked successfully.")
+        kick_user(username_to_kick)
         sys.exit(0)
 
     except (FileNotFoundError, KeyError, ValueError, json.JSONDecodeError) as e:
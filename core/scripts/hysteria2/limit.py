@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import time
+import queue
+import shutil
+import signal
+import argparse
+import threading
+from abc import ABC, abstractmethod
+import subprocess
+from datetime import datetime
+from init_paths import *
+from paths import *
+from dotenv import dotenv_values
+
+SERVICE_NAME = "hysteria-ip-limit.service"
+SERVICE_FILE = f"/etc/systemd/system/{SERVICE_NAME}"
+VENV_PYTHON = BASE_DIR / "hysteria2_venv/bin/python3"
+
+DEFAULT_BLOCK_DURATION = 60
+DEFAULT_MAX_IPS = 1
+# Used when .configs.env does not exist at all, as the shell version did
+NEW_ENV_BLOCK_DURATION = 240
+NEW_ENV_MAX_IPS = 5
+
+EXPIRY_CHECK_INTERVAL = 10
+SNAPSHOT_INTERVAL = 5
+# Lines handled before queued blocks are pushed to the firewall in one call
+MAX_BATCH_LINES = 1000
+
+# Hysteria logs connects/disconnects as: ... client connected {"addr": "1.2.3.4:5678", "id": "user", ...}
+EVENT_RE = re.compile(r'client (connected|disconnected)')
+ADDR_RE = re.compile(r'"addr":\s*"([^"]+)"')
+ID_RE = re.compile(r'"id":\s*"([^">]+)"')
+
+
+def log_message(level, message):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [{level}] {message}", flush=True)
+
+
+def update_env(key, value):
+    content = []
+    if CONFIG_ENV.exists():
+        with CONFIG_ENV.open("r") as f:
+            content = [line for line in f if not line.startswith(f"{key}=")]
+    if content and not content[-1].endswith("\n"):
+        content[-1] += "\n"
+    content.append(f"{key}={value}\n")
+    with CONFIG_ENV.open("w") as f:
+        f.writelines(content)
+
+
+def load_config():
+    """Reads BLOCK_DURATION and MAX_IPS from .configs.env, writing the defaults if they are missing."""
+    if not CONFIG_ENV.exists():
+        update_env("BLOCK_DURATION", NEW_ENV_BLOCK_DURATION)
+        update_env("MAX_IPS", NEW_ENV_MAX_IPS)
+    env = dotenv_values(CONFIG_ENV)
+
+    values = {}
+    for key, default in (("BLOCK_DURATION", DEFAULT_BLOCK_DURATION), ("MAX_IPS", DEFAULT_MAX_IPS)):
+        value = (env.get(key) or "").strip()
+        if key not in env:
+            update_env(key, default)
+        values[key] = int(value) if value.isdigit() else default
+    return values["BLOCK_DURATION"], values["MAX_IPS"]
+
+
+def parse_log_line(line):
+    """Returns (event, username, ip) for a connect/disconnect line, or None for anything else."""
+    event = EVENT_RE.search(line)
+    if not event:
+        return None
+    addr = ADDR_RE.search(line)
+    user = ID_RE.search(line)
+    if not addr or not user:
+        return None
+    # Addresses are host:port, with IPv6 hosts in brackets
+    return event.group(1), user.group(1), addr.group(1).rsplit(":", 1)[0].strip("[]")
+
+
+def run_tool(args, stdin=None):
+    """Runs a firewall tool and returns (ok, stderr)."""
+    try:
+        result = subprocess.run(args, input=stdin, capture_output=True, text=True)
+    except FileNotFoundError:
+        return False, f"{args[0]} not found"
+    return result.returncode == 0, result.stderr.strip()
+
+
+def ip_family(ip):
+    return 6 if ":" in ip else 4
+
+
+class Firewall(ABC):
+    """
+    Where blocked IPs go. Entries carry their own timeout, so the kernel lifts
+    blocks without the limiter having to come back for them.
+
+    Backends must implement block(); the other methods default to doing nothing.
+    """
+
+    name = "none"
+
+    def setup(self):
+        """Creates the sets and the rules that drop traffic from them; safe to call repeatedly."""
+
+    @abstractmethod
+    def block(self, entries):
+        """Blocks every (ip, timeout_seconds) pair in one batch."""
+
+    def teardown(self):
+        """Removes the rules and sets, lifting all blocks."""
+
+    def remove_legacy_rule(self, ip):
+        """Drops a per-IP rule left behind by the old shell limiter."""
+        while run_tool(["iptables", "-C", "INPUT", "-s", ip, "-j", "DROP"])[0]:
+            run_tool(["iptables", "-D", "INPUT", "-s", ip, "-j", "DROP"])
+
+
+class IpsetFirewall(Firewall):
+    """One hash:ip set per address family, matched by a single iptables/ip6tables rule each."""
+
+    name = "ipset"
+    SETS = {4: ("hysteria_ip_limit", "inet", "iptables"), 6: ("hysteria_ip_limit6", "inet6", "ip6tables")}
+
+    def setup(self):
+        for set_name, family, tables in self.SETS.values():
+            ok, error = run_tool(["ipset", "create", set_name, "hash:ip", "family", family, "timeout", "0", "-exist"])
+            if not ok:
+                raise RuntimeError(f"Failed to create ipset {set_name}: {error}")
+            rule = ["INPUT", "-m", "set", "--match-set", set_name, "src", "-j", "DROP"]
+            if not run_tool([tables, "-C", *rule])[0]:
+                ok, error = run_tool([tables, "-I", *rule])
+                if not ok and family == "inet":
+                    raise RuntimeError(f"Failed to add the {tables} rule for {set_name}: {error}")
+
+    def block(self, entries):
+        if not entries:
+            return
+        batch = "".join(f"add {self.SETS[ip_family(ip)][0]} {ip} timeout {timeout}\n" for ip, timeout in entries)
+        ok, error = run_tool(["ipset", "restore", "-exist"], stdin=batch)
+        if not ok:
+            raise RuntimeError(f"ipset restore failed: {error}")
+
+    def teardown(self):
+        for set_name, _, tables in self.SETS.values():
+            rule = ["INPUT", "-m", "set", "--match-set", set_name, "src", "-j", "DROP"]
+            while run_tool([tables, "-C", *rule])[0]:
+                run_tool([tables, "-D", *rule])
+            run_tool(["ipset", "destroy", set_name])
+
+
+class NftablesFirewall(Firewall):
+    """A dedicated inet table with one timeout set per address family."""
+
+    name = "nftables"
+    TABLE = "hysteria_ip_limit"
+    SETS = {4: ("blocked4", "ipv4_addr", "ip"), 6: ("blocked6", "ipv6_addr", "ip6")}
+
+    def setup(self):
+        # "add" is idempotent for tables, sets and chains; the rules are only added with the chain
+        script = [f"add table inet {self.TABLE}"]
+        for set_name, addr_type, _ in self.SETS.values():
+            script.append(f"add set inet {self.TABLE} {set_name} {{ type {addr_type}; flags timeout; }}")
+        ok, _ = run_tool(["nft", "list", "chain", "inet", self.TABLE, "input"])
+        if not ok:
+            script.append(f"add chain inet {self.TABLE} input {{ type filter hook input priority -10; policy accept; }}")
+            for set_name, _, protocol in self.SETS.values():
+                script.append(f"add rule inet {self.TABLE} input {protocol} saddr @{set_name} drop")
+        ok, error = run_tool(["nft", "-f", "-"], stdin="\n".join(script) + "\n")
+        if not ok:
+            raise RuntimeError(f"Failed to set up nftables table {self.TABLE}: {error}")
+
+    def block(self, entries):
+        if not entries:
+            return
+        elements = {4: [], 6: []}
+        for ip, timeout in entries:
+            elements[ip_family(ip)].append(f"{ip} timeout {timeout}s")
+        script = "".join(
+            f"add element inet {self.TABLE} {self.SETS[family][0]} {{ {', '.join(items)} }}\n"
+            for family, items in elements.items() if items
+        )
+        ok, error = run_tool(["nft", "-f", "-"], stdin=script)
+        if not ok:
+            raise RuntimeError(f"nft failed: {error}")
+
+    def teardown(self):
+        run_tool(["nft", "delete", "table", "inet", self.TABLE])
+
+
+class FakeFirewall(Firewall):
+    """In-memory stand-in for dry runs and tests; mimics kernel timeouts against a clock."""
+
+    name = "fake"
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.entries: dict[str, float] = {}
+        self.batches: list[list[tuple[str, int]]] = []
+
+    def block(self, entries):
+        if not entries:
+            return
+        self.batches.append(list(entries))
+        for ip, timeout in entries:
+            self.entries[ip] = self.clock() + timeout
+
+    def is_blocked(self, ip):
+        return self.entries.get(ip, 0) > self.clock()
+
+    def teardown(self):
+        self.entries.clear()
+
+    def remove_legacy_rule(self, ip):
+        pass
+
+
+FIREWALLS = {cls.name: cls for cls in (IpsetFirewall, NftablesFirewall, FakeFirewall)}
+
+
+def get_firewall(name=None):
+    """Returns the requested backend, or ipset when it is installed and nftables otherwise."""
+    name = name or (dotenv_values(CONFIG_ENV).get("IP_LIMIT_FIREWALL") if CONFIG_ENV.exists() else None)
+    if not name:
+        name = "ipset" if shutil.which("ipset") else "nftables"
+    if name not in FIREWALLS:
+        raise ValueError(f"Unknown firewall backend '{name}'. Expected one of: {', '.join(FIREWALLS)}")
+    return FIREWALLS[name]()
+
+
+def write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class IPLimiter:
+    """
+    Tracks the IPs each user is connected from and blocks users that exceed MAX_IPS.
+
+    All state lives in memory: the connection map is written to
+    CONNECTIONS_FILE every few seconds when it changed, and the block list
+    (ip,username,unblock_time lines, as before) whenever blocks are added,
+    so blocks survive a restart. Blocks are queued and sent to the firewall
+    in one batch per flush(); the firewall expires them by itself, the
+    limiter only forgets its own record of them.
+    """
+
+    def __init__(self, block_duration, max_ips, firewall):
+        self.block_duration = block_duration
+        self.max_ips = max_ips
+        self.firewall = firewall
+        self.connections: dict[str, set[str]] = {}
+        self.blocked: dict[str, tuple[str, int]] = {}
+        self.pending: list[tuple[str, int]] = []
+        self.connections_dirty = True
+
+    def load_block_list(self):
+        if not BLOCK_LIST.exists():
+            return
+        with BLOCK_LIST.open("r") as f:
+            for line in f:
+                parts = line.strip().split(",")
+                if len(parts) == 3 and parts[2].isdigit():
+                    self.blocked[parts[0]] = (parts[1], int(parts[2]))
+
+    def restore_blocks(self, now=None):
+        """Re-applies unexpired blocks from the block list, e.g. after a reboot emptied the sets."""
+        now = int(now if now is not None else time.time())
+        self.forget_expired(now)
+        for ip, (_, unblock_time) in self.blocked.items():
+            self.firewall.remove_legacy_rule(ip)
+            self.pending.append((ip, unblock_time - now))
+        self.flush()
+
+    def save_block_list(self):
+        write_atomic(BLOCK_LIST, "".join(
+            f"{ip},{username},{unblock_time}\n" for ip, (username, unblock_time) in self.blocked.items()
+        ))
+
+    def save_connections(self):
+        if not self.connections_dirty:
+            return
+        write_atomic(CONNECTIONS_FILE, json.dumps(
+            {username: sorted(ips) for username, ips in self.connections.items()}, indent=2
+        ))
+        self.connections_dirty = False
+
+    def block_ip(self, ip, username, now):
+        if ip in self.blocked:
+            log_message("INFO", f"IP {ip} is already blocked")
+            return
+        self.blocked[ip] = (username, now + self.block_duration)
+        self.pending.append((ip, self.block_duration))
+        log_message("WARN", f"Blocked IP {ip} for user {username} for {self.block_duration} seconds")
+
+    def flush(self):
+        """Sends the queued blocks to the firewall in one call and saves the block list."""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        try:
+            self.firewall.block(pending)
+        except RuntimeError as e:
+            log_message("ERROR", str(e))
+        self.save_block_list()
+
+    def handle(self, event, username, ip, now=None):
+        now = int(now if now is not None else time.time())
+        if event == "connected":
+            if ip in self.blocked:
+                if now < self.blocked[ip][1]:
+                    log_message("WARN", f"Rejected connection from blocked IP {ip} for user {username}")
+                    return
+                # The firewall already let it go; the periodic cleanup just has not caught up yet
+                del self.blocked[ip]
+            ips = self.connections.setdefault(username, set())
+            if ip not in ips:
+                ips.add(ip)
+                self.connections_dirty = True
+            if len(ips) > self.max_ips:
+                log_message("WARN", f"User {username} has {len(ips)} IPs (max: {self.max_ips}) - blocking all IPs")
+                for user_ip in sorted(ips):
+                    self.block_ip(user_ip, username, now)
+                log_message("WARN", f"User {username} has been completely blocked for {self.block_duration} seconds")
+        else:
+            ips = self.connections.get(username)
+            if ips and ip in ips:
+                ips.discard(ip)
+                if not ips:
+                    del self.connections[username]
+                self.connections_dirty = True
+            # Blocks are only lifted when they expire, not on disconnect
+
+    def forget_expired(self, now=None):
+        """Drops blocks the firewall has already timed out from the in-memory list and the block list."""
+        now = int(now if now is not None else time.time())
+        expired = [ip for ip, (_, unblock_time) in self.blocked.items() if now >= unblock_time]
+        for ip in expired:
+            username = self.blocked.pop(ip)[0]
+            log_message("INFO", f"Auto-unblocked IP {ip} for user {username} (block expired)")
+        if expired:
+            self.save_block_list()
+
+
+def follow_journal(lines, stop):
+    """Streams hysteria-server log lines into the lines queue until stop is set."""
+    process = subprocess.Popen(
+        ["journalctl", "-u", "hysteria-server.service", "-f", "-n", "0", "-o", "cat"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1,
+    )
+    try:
+        for line in process.stdout:
+            if stop.is_set():
+                break
+            lines.put(line)
+    finally:
+        process.terminate()
+        lines.put(None)
+
+
+def follow_file(path, lines, stop):
+    """Tails a server log file into the lines queue, reopening it when it is rotated."""
+    f = open(path, "r")
+    f.seek(0, os.SEEK_END)
+    try:
+        while not stop.is_set():
+            line = f.readline()
+            if line:
+                lines.put(line)
+                continue
+            try:
+                if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                    f.close()
+                    f = open(path, "r")
+                    continue
+            except FileNotFoundError:
+                pass
+            time.sleep(0.2)
+    finally:
+        f.close()
+        lines.put(None)
+
+
+def run(log_file=None, firewall_name=None):
+    block_duration, max_ips = load_config()
+    firewall = get_firewall(firewall_name)
+    firewall.setup()
+    limiter = IPLimiter(block_duration, max_ips, firewall)
+    limiter.load_block_list()
+    limiter.restore_blocks()
+
+    log_message("INFO", f"Monitoring Hysteria server connections. Max IPs per user: {max_ips}")
+    log_message("INFO", f"Block duration: {block_duration} seconds")
+    log_message("INFO", f"Firewall backend: {firewall.name}")
+    log_message("INFO", f"Connection data saved to: {CONNECTIONS_FILE}")
+    log_message("INFO", "--------------------------------------------------------")
+
+    stop = threading.Event()
+    lines = queue.Queue(maxsize=10000)
+
+    def shutdown(signum, frame):
+        log_message("INFO", "Stopping IP limiter...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    # The reader only moves raw lines; all parsing and state stays on this thread
+    reader = threading.Thread(
+        target=follow_file if log_file else follow_journal,
+        args=(log_file, lines, stop) if log_file else (lines, stop),
+        daemon=True,
+    )
+    reader.start()
+
+    exit_code = 0
+    next_expiry_check = next_snapshot = 0.0
+    while not stop.is_set():
+        try:
+            batch = [lines.get(timeout=1)]
+        except queue.Empty:
+            batch = []
+        # Drain whatever else is already queued so a burst costs one firewall call
+        while batch and batch[-1] is not None and len(batch) < MAX_BATCH_LINES:
+            try:
+                batch.append(lines.get_nowait())
+            except queue.Empty:
+                break
+
+        for line in batch:
+            if line is None:
+                break
+            parsed = parse_log_line(line)
+            if parsed:
+                limiter.handle(*parsed)
+        limiter.flush()
+
+        if batch and batch[-1] is None:
+            if not stop.is_set():
+                log_message("ERROR", "Log source ended")
+                exit_code = 1
+            break
+
+        now = time.monotonic()
+        if now >= next_expiry_check:
+            limiter.forget_expired()
+            next_expiry_check = now + EXPIRY_CHECK_INTERVAL
+        if now >= next_snapshot:
+            limiter.save_connections()
+            next_snapshot = now + SNAPSHOT_INTERVAL
+
+    stop.set()
+    limiter.save_connections()
+    limiter.save_block_list()
+    return exit_code
+
+
+def install_service():
+    """Installs and starts the systemd unit that runs the limiter."""
+    with open(SERVICE_FILE, "w") as f:
+        f.write(f"""[Unit]
+Description=Hysteria2 IP Limiter
+After=network.target hysteria-server.service
+Requires=hysteria-server.service
+
+[Service]
+Type=simple
+ExecStart={VENV_PYTHON} {SCRIPT_PATH} run
+Restart=always
+RestartSec=5
+User=root
+
+[Install]
+WantedBy=multi-user.target
+""")
+    subprocess.run(["systemctl", "daemon-reload"], check=False)
+    subprocess.run(["systemctl", "enable", SERVICE_NAME], check=False)
+    result = subprocess.run(["systemctl", "restart", SERVICE_NAME], capture_output=True, text=True)
+    if result.returncode != 0:
+        return 1, f"Failed to start {SERVICE_NAME}: {result.stderr.strip()}"
+    return 0, "IP Limiter service started"
+
+
+def uninstall_service():
+    """Stops the limiter, removes its systemd unit and lifts its blocks."""
+    subprocess.run(["systemctl", "stop", SERVICE_NAME], capture_output=True)
+    subprocess.run(["systemctl", "disable", SERVICE_NAME], capture_output=True)
+    if os.path.exists(SERVICE_FILE):
+        os.remove(SERVICE_FILE)
+    subprocess.run(["systemctl", "daemon-reload"], check=False)
+    for firewall in (IpsetFirewall(), NftablesFirewall()):
+        firewall.teardown()
+    return 0, "IP Limiter service stopped and removed"
+
+
+def change_config(block_duration=None, max_ips=None):
+    """
+    Updates BLOCK_DURATION and/or MAX_IPS in .configs.env and restarts a running limiter.
+
+    Returns:
+        tuple[int, str]: The exit code (0 on success, 1 on failure) and a message.
+    """
+    for name, value in (("block duration", block_duration), ("max IPs", max_ips)):
+        if value not in (None, "") and not str(value).isdigit():
+            return 1, f"Invalid {name}: '{value}'. Must be a number."
+
+    messages = []
+    if block_duration not in (None, ""):
+        update_env("BLOCK_DURATION", block_duration)
+        messages.append(f"Block duration updated to {block_duration} seconds")
+    if max_ips not in (None, ""):
+        update_env("MAX_IPS", max_ips)
+        messages.append(f"Max IPs per user updated to {max_ips}")
+
+    if subprocess.run(["systemctl", "is-active", "--quiet", SERVICE_NAME]).returncode == 0:
+        subprocess.run(["systemctl", "restart", SERVICE_NAME], check=False)
+        messages.append("IP Limiter service restarted to apply new configuration")
+    return 0, "\n".join(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Limit the number of IPs per Hysteria2 user")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("start", help="Install and start the limiter service")
+    subparsers.add_parser("stop", help="Stop and remove the limiter service")
+    config_parser = subparsers.add_parser("config", help="Change the block duration and/or max IPs")
+    config_parser.add_argument("block_duration", nargs="?", default="")
+    config_parser.add_argument("max_ips", nargs="?", default="")
+    run_parser = subparsers.add_parser("run", help="Monitor connections in the foreground")
+    run_parser.add_argument("--log-file", help="Follow this server log file instead of the systemd journal")
+    run_parser.add_argument("--firewall", choices=sorted(FIREWALLS),
+                            help="Firewall backend (default: IP_LIMIT_FIREWALL in .configs.env, else ipset if installed, else nftables)")
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        print("Error: This script must be run as root for iptables functionality.")
+        return 1
+
+    if args.command == "run":
+        return run(args.log_file, args.firewall)
+    if args.command == "start":
+        exit_code, message = install_service()
+    elif args.command == "stop":
+        exit_code, message = uninstall_service()
+    else:
+        exit_code, message = change_config(args.block_duration, args.max_ips)
+    log_message("INFO" if exit_code == 0 else "ERROR", message)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,4 +3,4 @@
 source /etc/hysteria/core/scripts/path.sh
 
 
-cat "$USERS_FILE"
\ No newline at end of file
+python3 "$(dirname "$0")/user_store.py" export
@@ -1,32 +1,23 @@
 #!/usr/bin/env python3
 
-import json
 import sys
-import os
 import asyncio
 from init_paths import *
 from paths import *
+from storage import get_user_store, get_traffic_series, UserStoreError, TrafficSeriesError
 
 def sync_remove_user(username):
-    if not os.path.isfile(USERS_FILE):
-        return 1, f"Error: Config file {USERS_FILE} not found."
-
     try:
-        with open(USERS_FILE, 'r') as f:
+        if get_user_store().delete(username):
             try:
-                users_data = json.load(f)
-            except json.JSONDecodeError:
-                return 1, f"Error: {USERS_FILE} contains invalid JSON."
-
-        if username in users_data:
-            del users_data[username]
-            with open(USERS_FILE, 'w') as f:
-                json.dump(users_data, f, indent=4)
+                # Free the history slot so a future user with this name starts empty
+                get_traffic_series(writable=True).remove(username)
+            except (OSError, TrafficSeriesError):
+                pass
             return 0, f"User {username} removed successfully."
-        else:
-            return 1, f"Error: User {username} not found."
+        return 1, f"Error: User {username} not found."
 
-    except Exception as e:
+    except UserStoreError as e:
         return 1, f"Error: {str(e)}"
 
 async def remove_user(username):
@@ -1,52 +1,48 @@
 #!/usr/bin/env python3
 
-import json
 import sys
-import os
 from datetime import date
 from init_paths import *
 from paths import *
+from storage import get_user_store, UserStoreError
 
-def reset_user(username):
+def reset_user_data(username):
     """
-    Resets the data usage, status, and creation date of a user in the USERS_FILE.
+    Resets the data usage, status, and creation date of a user in the user store.
 
     Args:
         username (str): The username to reset.
 
     Returns:
-        int: 0 on success, 1 on failure.
+        tuple[int, str]: The exit code (0 on success, 1 on failure) and a message.
     """
-    if not os.path.isfile(USERS_FILE):
-        print(f"Error: File '{USERS_FILE}' not found.")
-        return 1
-
+    today = date.today().strftime("%Y-%m-%d")
     try:
-        with open(USERS_FILE, 'r') as f:
-            users_data = json.load(f)
-    except json.JSONDecodeError:
-        print(f"Error: {USERS_FILE} contains invalid JSON.")
-        return 1
+        found = get_user_store().patch(username, {
+            'upload_bytes': 0,
+            'download_bytes': 0,
+            'status': "Offline",
+            'account_creation_date': today,
+            'blocked': False,
+        })
+    except UserStoreError as e:
+        return 1, f"Error: Failed to reset user '{username}': {e}"
 
-    if username not in users_data:
-        print(f"Error: User '{username}' not found in '{USERS_FILE}'.")
-        return 1
+    if not found:
+        return 1, f"Error: User '{username}' not found."
 
-    today = date.today().strftime("%Y-%m-%d")
-    users_data[username]['upload_bytes'] = 0
-    users_data[username]['download_bytes'] = 0
-    users_data[username]['status'] = "Offline"
-    users_data[username]['account_creation_date'] = today
-    users_data[username]['blocked'] = False
+    return 0, f"User '{username}' has been reset successfully."
 
-    try:
-        with open(USERS_FILE, 'w') as f:
-            json.dump(users_data, f, indent=4)
-        print(f"User '{username}' has been reset successfully.")
-        return 0
-    except IOError:
-        print(f"Error: Failed to reset user '{username}' in '{USERS_FILE}'.")
-        return 1
+def reset_user(username):
+    """
+    Resets a user and prints the outcome.
+
+    Returns:
+        int: 0 on success, 1 on failure.
+    """
+    exit_code, message = reset_user_data(username)
+    print(message)
+    return exit_code
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
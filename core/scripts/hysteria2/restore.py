@@ -11,6 +11,7 @@ import datetime
 from pathlib import Path
 from init_paths import *
 from paths import *
+from storage import get_user_store, import_json
 
 def run_command(command, capture_output=True, check=False):
     """Run a shell command and return its output"""
@@ -75,10 +76,16 @@ def main():
         existing_backup_dir = f"/opt/hysbackup/restore_pre_backup_{timestamp}"
         os.makedirs(existing_backup_dir, exist_ok=True)
         
+        store = get_user_store()
+        store.export_json(os.path.join(existing_backup_dir, "users.json"))
+
         for file in expected_files:
             source_file = os.path.join(target_dir, file)
             dest_file = os.path.join(existing_backup_dir, file)
             
+            if file == "users.json":
+                continue
+
             if os.path.isfile(source_file):
                 try:
                     shutil.copy2(source_file, dest_file)
@@ -91,6 +98,10 @@ def main():
             dest_file = os.path.join(target_dir, file)
             
             try:
+                if file == "users.json":
+                    # Users live in the user store; the backup keeps them as users.json
+                    import_json(store, source_file, replace=True)
+                    continue
                 shutil.copy2(source_file, dest_file)
             except Exception as e:
                 print(f"Error: replace Configuration Files '{file}': {e}")
@@ -1,27 +1,17 @@
 #!/usr/bin/env python3
 
 import sys
-import json
-from hysteria2_api import Hysteria2Client
 import time
+import threading
+from collections import deque
 from init_paths import *
 from paths import *
+from storage import get_user_store
+from traffic_api import TrafficApiClient, get_client
 
-
-def get_secret() -> str:
-    if not CONFIG_FILE.exists():
-        print("Error: config.json file not found!", file=sys.stderr)
-        sys.exit(1)
-
-    with CONFIG_FILE.open() as f:
-        data = json.load(f)
-
-    secret = data.get("trafficStats", {}).get("secret")
-    if not secret:
-        print("Error: secret not found in config.json!", file=sys.stderr)
-        sys.exit(1)
-
-    return secret
+SAMPLE_INTERVAL = 5.0
+# Ten minutes of samples at the default interval
+HISTORY_SIZE = 120
 
 
 def convert_bytes(bytes_val: int) -> str:
@@ -32,24 +22,27 @@ def convert_bytes(bytes_val: int) -> str:
     return f"{bytes_val} B"
 
 
-def get_cpu_usage(interval: float = 0.1) -> float:
-    def read_cpu_times():
-        with open("/proc/stat") as f:
-            line = f.readline()
-        fields = list(map(int, line.strip().split()[1:]))
-        idle, total = fields[3], sum(fields)
-        return idle, total
-
-    idle1, total1 = read_cpu_times()
-    time.sleep(interval)
-    idle2, total2 = read_cpu_times()
+def read_cpu_times() -> tuple[int, int]:
+    """Returns the idle and total jiffies of all CPUs since boot."""
+    with open("/proc/stat") as f:
+        line = f.readline()
+    fields = list(map(int, line.strip().split()[1:]))
+    return fields[3], sum(fields)
+
 
-    idle_delta = idle2 - idle1
-    total_delta = total2 - total1
+def cpu_usage_between(before: tuple[int, int], after: tuple[int, int]) -> float:
+    idle_delta = after[0] - before[0]
+    total_delta = after[1] - before[1]
     cpu_usage = 100.0 * (1 - idle_delta / total_delta) if total_delta else 0.0
     return round(cpu_usage, 1)
 
 
+def get_cpu_usage(interval: float = 0.1) -> float:
+    before = read_cpu_times()
+    time.sleep(interval)
+    return cpu_usage_between(before, read_cpu_times())
+
+
 
 def get_memory_usage() -> tuple[int, int]:
     mem_info = {}
@@ -88,12 +81,8 @@ def get_memory_usage() -> tuple[int, int]:
 
 
 
-def get_online_user_count(secret: str) -> int:
+def get_online_user_count(client: TrafficApiClient) -> int:
     try:
-        client = Hysteria2Client(
-            base_url=API_BASE_URL,
-            secret=secret
-        )
         online_users = client.get_online_clients()
         return sum(1 for user in online_users.values() if user.is_online)
     except Exception as e:
@@ -102,45 +91,169 @@ def get_online_user_count(secret: str) -> int:
 
 
 def get_total_traffic() -> tuple[int, int]:
-    if not USERS_FILE.exists():
-        return 0, 0
-
     try:
-        with USERS_FILE.open() as f:
-            users = json.load(f)
-
-        total_upload = 0
-        total_download = 0
-
-        for user_data in users.values():
-            total_upload += int(user_data.get("upload_bytes", 0) or 0)
-            total_download += int(user_data.get("download_bytes", 0) or 0)
-
-        return total_upload, total_download
+        return get_user_store().traffic_totals()
     except Exception as e:
         print(f"Error parsing traffic data: {e}", file=sys.stderr)
         return 0, 0
 
 
 
-def main():
-    secret = get_secret()
+def get_server_info() -> dict[str, int | float]:
+    """Collects CPU, memory, online user and traffic figures for the server."""
+    client = get_client()
 
-    cpu_usage = get_cpu_usage()
     mem_total, mem_used = get_memory_usage()
-    online_users = get_online_user_count(secret)
+    total_upload, total_download = get_total_traffic()
 
-    print(f"📈 CPU Usage: {cpu_usage}")
-    print(f"📋 Total RAM: {mem_total}MB")
-    print(f"💻 Used RAM: {mem_used}MB")
-    print(f"👥 Online Users: {online_users}")
-    print()
+    return {
+        "cpu_usage": get_cpu_usage(),
+        "total_ram": mem_total,
+        "ram_usage": mem_used,
+        "online_users": get_online_user_count(client),
+        "uploaded_traffic": total_upload,
+        "downloaded_traffic": total_download,
+        "total_traffic": total_upload + total_download,
+    }
+
+
+class MetricsSampler:
+    """
+    Keeps the latest server figures, and a short history of them, in memory.
+
+    A daemon thread samples every `interval` seconds: CPU usage is the
+    difference between two /proc/stat readings one interval apart, so nothing
+    ever sleeps on behalf of a caller; the online count goes through the
+    process-wide pooled API client; traffic totals are only summed again when
+    the user store has changed.
+    Readers get the last sample from snapshot() without doing any I/O.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, history_size: int = HISTORY_SIZE):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._latest: dict[str, int | float] | None = None
+        self._history: deque = deque(maxlen=history_size)
+        self._cpu_times = read_cpu_times()
+        self._online: frozenset[str] = frozenset()
+        self._traffic_stamp = None
+        self._traffic = (0, 0)
+
+    def _online_user_count(self) -> int:
+        try:
+            online_users = get_client().get_online_clients()
+            self._online = frozenset(name for name, user in online_users.items() if user.is_online)
+        except Exception as e:
+            self._online = frozenset()
+            print(f"Error getting online users: {e}", file=sys.stderr)
+        return len(self._online)
+
+    def _total_traffic(self) -> tuple[int, int]:
+        try:
+            store = get_user_store()
+            stamp = store.change_stamp()
+            if stamp != self._traffic_stamp:
+                self._traffic = store.traffic_totals()
+                self._traffic_stamp = stamp
+        except Exception as e:
+            print(f"Error parsing traffic data: {e}", file=sys.stderr)
+        return self._traffic
+
+    def sample(self) -> dict[str, int | float]:
+        """Takes one sample now and returns it."""
+        cpu_times = read_cpu_times()
+        mem_total, mem_used = get_memory_usage()
+        total_upload, total_download = self._total_traffic()
+        info = {
+            # A sample right after start has no elapsed jiffies yet; report the average since boot then
+            "cpu_usage": cpu_usage_between(self._cpu_times if cpu_times[1] > self._cpu_times[1] else (0, 0), cpu_times),
+            "total_ram": mem_total,
+            "ram_usage": mem_used,
+            "online_users": self._online_user_count(),
+            "uploaded_traffic": total_upload,
+            "downloaded_traffic": total_download,
+            "total_traffic": total_upload + total_download,
+            "sampled_at": time.time(),
+        }
+        with self._lock:
+            self._cpu_times = cpu_times
+            self._latest = info
+            self._history.append(info)
+        return info
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Error sampling server metrics: {e}", file=sys.stderr)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def snapshot(self) -> dict[str, int | float]:
+        """Returns the latest sample, taking the first one if none exists yet."""
+        with self._lock:
+            latest = self._latest
+        return dict(latest) if latest is not None else self.sample()
+
+    def online_users(self) -> frozenset[str]:
+        """Returns the usernames that were online at the latest sample."""
+        with self._lock:
+            return self._online
+
+    def history(self) -> list[dict[str, int | float]]:
+        """Returns the retained samples, oldest first."""
+        with self._lock:
+            return list(self._history)
+
+
+_sampler: MetricsSampler | None = None
+_sampler_lock = threading.Lock()
+
+
+def get_metrics_sampler() -> MetricsSampler:
+    """Returns the process-wide sampler, starting it on first use."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = MetricsSampler()
+            _sampler.start()
+        return _sampler
+
+
+def format_server_info(info: dict[str, int | float]) -> str:
+    """Renders get_server_info() output in the text layout the bot and web panel parse."""
+    return "\n".join([
+        f"📈 CPU Usage: {info['cpu_usage']}",
+        f"📋 Total RAM: {info['total_ram']}MB",
+        f"💻 Used RAM: {info['ram_usage']}MB",
+        f"👥 Online Users: {info['online_users']}",
+        "",
+        f"🔼 Uploaded Traffic: {convert_bytes(info['uploaded_traffic'])}",
+        f"🔽 Downloaded Traffic: {convert_bytes(info['downloaded_traffic'])}",
+        f"📊 Total Traffic: {convert_bytes(info['total_traffic'])}",
+    ])
 
-    total_upload, total_download = get_total_traffic()
 
-    print(f"🔼 Uploaded Traffic: {convert_bytes(total_upload)}")
-    print(f"🔽 Downloaded Traffic: {convert_bytes(total_download)}")
-    print(f"📊 Total Traffic: {convert_bytes(total_upload + total_download)}")
+def main():
+    try:
+        info = get_server_info()
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(format_server_info(info))
 
 
 if __name__ == "__main__":
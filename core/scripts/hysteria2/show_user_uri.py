@@ -3,14 +3,15 @@
 import os
 import sys
 import json
-import subprocess
 import argparse
 import re
 import qrcode
 from io import StringIO
-from typing import Tuple, Optional, Dict, List, Any
+from typing import Tuple, Optional, Dict, List, Any, Iterable
 from init_paths import *
 from paths import *
+from storage import get_user_store
+from services_status import is_service_active
 
 def load_env_file(env_file: str) -> Dict[str, str]:
     """Load environment variables from a file into a dictionary."""
@@ -51,17 +52,6 @@ def get_normalsub_domain_and_port() -> Tuple[str, str, str]:
     subpath = env_vars.get('SUBPATH', '')
     return domain, port, subpath
 
-def is_service_active(service_name: str) -> bool:
-    """Check if a systemd service is active."""
-    try:
-        result = subprocess.run(
-            ['systemctl', 'is-active', '--quiet', service_name],
-            check=False
-        )
-        return result.returncode == 0
-    except Exception:
-        return False
-
 def generate_uri(username: str, auth_password: str, ip: str, port: str, 
                  obfs_password: str, sha256: str, sni: str, ip_version: int, insecure: bool) -> str:
     """Generate Hysteria2 URI for the given parameters."""
@@ -84,6 +74,68 @@ def generate_uri(username: str, auth_password: str, ip: str, port: str,
     params_str = "&".join(params)
     return f"{uri_base}?{params_str}#{username}-IPv{ip_version}"
 
+def load_uri_settings() -> Dict[str, Any]:
+    """Load the server-wide values every user URI is built from."""
+    with open(CONFIG_FILE, 'r') as f:
+        config = json.load(f)
+
+    ip4, ip6, sni = load_hysteria2_ips()
+    return {
+        "port": config["listen"].split(":")[1] if ":" in config["listen"] else config["listen"],
+        "sha256": config.get("tls", {}).get("pinSHA256", ""),
+        "obfs_password": config.get("obfs", {}).get("salamander", {}).get("password", ""),
+        "insecure": config.get("tls", {}).get("insecure", True),
+        "ip4": ip4 if ip4 and ip4 != "None" else None,
+        "ip6": ip6 if ip6 and ip6 != "None" else None,
+        "sni": sni,
+    }
+
+def build_user_uris(username: str, auth_password: str, settings: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """Build the IPv4 and IPv6 URIs of a user; None for an address family the server lacks."""
+    uris = []
+    for ip, ip_version in ((settings["ip4"], 4), (settings["ip6"], 6)):
+        uris.append(generate_uri(username, auth_password, ip, settings["port"], settings["obfs_password"],
+                                 settings["sha256"], settings["sni"], ip_version, settings["insecure"]) if ip else None)
+    return uris[0], uris[1]
+
+def load_server_context() -> Dict[str, Any]:
+    """
+    Load everything build_uris needs once: the URI settings, whether Hysteria2
+    is running and the Normal-SUB address if that service is active.
+    """
+    context = {
+        "hysteria_active": is_service_active("hysteria-server.service"),
+        "uri_settings": load_uri_settings(),
+        "normalsub": None,
+    }
+    if is_service_active("hysteria-normal-sub.service"):
+        domain, port, subpath = get_normalsub_domain_and_port()
+        if domain and port:
+            context["normalsub"] = (domain, port, subpath)
+    return context
+
+def build_uris(users: Iterable[Tuple[str, Optional[Dict[str, Any]]]], server_ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Build the IPv4, IPv6 and Normal-SUB links of many users in one pass.
+
+    users yields (username, record) pairs; a None record produces a
+    "User not found" entry instead of links.
+    """
+    settings = server_ctx["uri_settings"]
+    normalsub = server_ctx["normalsub"]
+    results = []
+    for username, user in users:
+        if user is None:
+            results.append({"username": username, "error": "User not found"})
+            continue
+        ipv4, ipv6 = build_user_uris(username, user["password"], settings)
+        normal_sub = None
+        if normalsub:
+            domain, port, subpath = normalsub
+            normal_sub = f"https://{domain}:{port}/{subpath}/sub/normal/{user['password']}#Hysteria2"
+        results.append({"username": username, "ipv4": ipv4, "ipv6": ipv6, "normal_sub": normal_sub})
+    return results
+
 def generate_qr_code(uri: str) -> List[str]:
     """Generate terminal-friendly ASCII QR code using pure Python."""
     try:
@@ -115,56 +167,37 @@ def get_terminal_width() -> int:
 
 def show_uri(args: argparse.Namespace) -> None:
     """Show URI and optional QR codes for the given username."""
-    if not os.path.exists(USERS_FILE):
-        print(f"\033[0;31mError:\033[0m Config file {USERS_FILE} not found.")
-        return
-    
     if not is_service_active("hysteria-server.service"):
         print("\033[0;31mError:\033[0m Hysteria2 is not active.")
         return
     
-    with open(CONFIG_FILE, 'r') as f:
-        config = json.load(f)
-    
-    with open(USERS_FILE, 'r') as f:
-        users = json.load(f)
-    
-    if args.username not in users:
+    settings = load_uri_settings()
+
+    user = get_user_store().get(args.username)
+    if user is None:
         print("Invalid username. Please try again.")
         return
     
-    auth_password = users[args.username]["password"]
-    port = config["listen"].split(":")[1] if ":" in config["listen"] else config["listen"]
-    sha256 = config.get("tls", {}).get("pinSHA256", "")
-    obfs_password = config.get("obfs", {}).get("salamander", {}).get("password", "")
-    
-    insecure = config.get("tls", {}).get("insecure", True)
-    
-    ip4, ip6, sni = load_hysteria2_ips()
-    available_ip4 = ip4 and ip4 != "None"
-    available_ip6 = ip6 and ip6 != "None"
+    auth_password = user["password"]
+    all_ipv4, all_ipv6 = build_user_uris(args.username, auth_password, settings)
     
     uri_ipv4 = None
     uri_ipv6 = None
     
     if args.all:
-        if available_ip4:
-            uri_ipv4 = generate_uri(args.username, auth_password, ip4, port, 
-                                    obfs_password, sha256, sni, 4, insecure)
+        if all_ipv4:
+            uri_ipv4 = all_ipv4
             print(f"\nIPv4:\n{uri_ipv4}\n")
         
-        if available_ip6:
-            uri_ipv6 = generate_uri(args.username, auth_password, ip6, port, 
-                                    obfs_password, sha256, sni, 6, insecure)
+        if all_ipv6:
+            uri_ipv6 = all_ipv6
             print(f"\nIPv6:\n{uri_ipv6}\n")
     else:
-        if args.ip_version == 4 and available_ip4:
-            uri_ipv4 = generate_uri(args.username, auth_password, ip4, port, 
-                                    obfs_password, sha256, sni, 4, insecure)
+        if args.ip_version == 4 and all_ipv4:
+            uri_ipv4 = all_ipv4
             print(f"\nIPv4:\n{uri_ipv4}\n")
-        elif args.ip_version == 6 and available_ip6:
-            uri_ipv6 = generate_uri(args.username, auth_password, ip6, port, 
-                                    obfs_password, sha256, sni, 6, insecure)
+        elif args.ip_version == 6 and all_ipv6:
+            uri_ipv6 = all_ipv6
             print(f"\nIPv6:\n{uri_ipv6}\n")
         else:
             print("Invalid IP version or no available IP for the requested version.")
@@ -0,0 +1,35 @@
+import pytest
+
+import add_user
+
+
+@pytest.fixture(autouse=True)
+def use_store(store, monkeypatch):
+    monkeypatch.setattr(add_user, 'get_user_store', lambda: store)
+
+
+def test_zero_limit_and_expiry_mean_unlimited(store):
+    results = add_user.create_users([
+        {'username': 'alice', 'traffic_limit': 0, 'expiration_days': 0},
+        {'username': 'bob', 'traffic_limit': '0', 'expiration_days': '0'},
+    ])
+
+    assert [result['error'] for result in results] == [None, None]
+    assert store.get('alice')['max_download_bytes'] == 0
+    assert store.get('alice')['expiration_days'] == 0
+    assert store.get('bob')['expiration_days'] == 0
+
+
+def test_missing_fields_are_rejected(store):
+    results = add_user.create_users([
+        {'username': 'alice', 'traffic_limit': None, 'expiration_days': 30},
+        {'username': 'bob', 'traffic_limit': 10, 'expiration_days': ''},
+    ])
+
+    assert all(result['error'] == "Username, traffic limit and expiration days are required." for result in results)
+    assert store.count() == 0
+
+
+def test_single_add_accepts_zero(store):
+    assert add_user.create_user('carol', 0, 0)[0] == 0
+    assert store.get('carol')['max_download_bytes'] == 0
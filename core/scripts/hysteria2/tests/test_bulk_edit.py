@@ -0,0 +1,36 @@
+import pytest
+
+import bulk_edit
+
+
+@pytest.fixture(autouse=True)
+def use_store(store, monkeypatch):
+    monkeypatch.setattr(bulk_edit, 'get_user_store', lambda: store)
+    store.put_many({
+        'limited': {'expiration_days': 30, 'account_creation_date': '2024-01-01', 'blocked': False},
+        'unlimited': {'expiration_days': 0, 'account_creation_date': '2024-01-01', 'blocked': False},
+        'blocked': {'expiration_days': 30, 'account_creation_date': '2024-01-01', 'blocked': True},
+    })
+
+
+def test_extend_days_leaves_users_that_never_expire(store):
+    results, _ = bulk_edit.update_users(['limited', 'unlimited'], extend_days=10)
+
+    assert store.get('limited')['expiration_days'] == 40
+    assert store.get('unlimited')['expiration_days'] == 0
+    assert [result['applied'] for result in results] == [True, False]
+
+
+def test_extend_days_with_other_changes_warns_for_users_that_never_expire(store):
+    results, _ = bulk_edit.update_users(['unlimited'], extend_days=10, reset_traffic=True)
+
+    assert results[0]['applied'] and results[0]['warning']
+    assert store.get('unlimited')['expiration_days'] == 0
+
+
+def test_only_users_that_were_unblocked_are_reported_as_newly_blocked(store):
+    results, newly_blocked = bulk_edit.update_users(['limited', 'blocked', 'missing'], blocked=True)
+
+    assert newly_blocked == ['limited']
+    assert [result['applied'] for result in results] == [True, True, False]
+    assert store.get('limited')['blocked'] and store.get('blocked')['blocked']
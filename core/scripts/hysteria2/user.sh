@@ -8,22 +8,77 @@ source /etc/hysteria/core/scripts/path.sh
 
 IFS=':' read -r USERNAME PASSWORD <<< "$AUTH"
 
-STORED_PASSWORD=$(jq -r --arg user "$USERNAME" '.[$user].password' "$USERS_FILE")
-MAX_DOWNLOAD_BYTES=$(jq -r --arg user "$USERNAME" '.[$user].max_download_bytes' "$USERS_FILE")
-EXPIRATION_DAYS=$(jq -r --arg user "$USERNAME" '.[$user].expiration_days' "$USERS_FILE")
-ACCOUNT_CREATION_DATE=$(jq -r --arg user "$USERNAME" '.[$user].account_creation_date' "$USERS_FILE")
-BLOCKED=$(jq -r --arg user "$USERNAME" '.[$user].blocked' "$USERS_FILE")
-CURRENT_DOWNLOAD_BYTES=$(jq -r --arg user "$USERNAME" '.[$user].download_bytes' "$USERS_FILE")
-CURRENT_UPLOAD_BYTES=$(jq -r --arg user "$USERNAME" '.[$user].upload_bytes' "$USERS_FILE")
+# Usernames are alphanumeric; rejecting anything else also keeps the SQL below safe
+if ! [[ "$USERNAME" =~ ^[a-zA-Z0-9]+$ ]]; then
+  sleep 20
+  exit 1
+fi
+
+# Reads the user's upload and download bytes from users.json.counters (storage/counters.py) without Python:
+# after a 32-byte header come 96-byte slots of a NUL-padded 64-byte name, then upload and download as
+# little-endian uint64. grep finds the name; only a match at a slot start followed by a NUL counts.
+read_counter_slot() {
+  local counters_file="$USERS_FILE.counters" offset name_end
+  [ -f "$counters_file" ] || return 0
+  for offset in $(LC_ALL=C grep -obaF -- "$USERNAME" "$counters_file" | cut -d: -f1); do
+    (( (offset - 32) % 96 == 0 )) || continue
+    name_end=$((offset + ${#USERNAME}))
+    if (( ${#USERNAME} < 64 )) && [ "$(od -An -tu1 -j "$name_end" -N1 "$counters_file" | tr -d ' ')" != "0" ]; then
+      continue
+    fi
+    read -r CURRENT_UPLOAD_BYTES CURRENT_DOWNLOAD_BYTES < <(od -An -tu8 --endian=little -j $((offset + 64)) -N16 "$counters_file")
+    return 0
+  done
+}
+
+if [ -f "$USERS_DB" ]; then
+  # Password goes last so a '|' inside it is kept intact by read
+  IFS='|' read -r MAX_DOWNLOAD_BYTES EXPIRATION_DAYS ACCOUNT_CREATION_DATE BLOCKED CURRENT_DOWNLOAD_BYTES CURRENT_UPLOAD_BYTES STORED_PASSWORD < <(
+    sqlite3 -readonly -separator '|' -cmd ".timeout 5000" "$USERS_DB" \
+      "SELECT max_download_bytes, expiration_days, account_creation_date,
+              CASE WHEN blocked THEN 'true' ELSE 'false' END,
+              COALESCE(download_bytes, 0), COALESCE(upload_bytes, 0), password
+       FROM users WHERE username = '$USERNAME';"
+  )
+else
+  # Shared lock: the store writes users.json and users.json.counters under an exclusive one
+  exec {LOCK_FD}>>"$USERS_FILE.lock"
+  flock -s -w 5 "$LOCK_FD"
+  # Counters still in users.json (not yet moved to the counter file) are the fallback
+  IFS='|' read -r MAX_DOWNLOAD_BYTES EXPIRATION_DAYS ACCOUNT_CREATION_DATE BLOCKED CURRENT_DOWNLOAD_BYTES CURRENT_UPLOAD_BYTES STORED_PASSWORD < <(
+    jq -r --arg user "$USERNAME" '.[$user] // {} | [.max_download_bytes, .expiration_days, .account_creation_date, .blocked,
+            (.download_bytes // 0), (.upload_bytes // 0), .password] | map(tostring) | join("|")' "$USERS_FILE"
+  )
+  read_counter_slot
+  exec {LOCK_FD}>&-
+fi
+
+block_user() {
+  if [ -f "$USERS_DB" ]; then
+    sqlite3 -cmd ".timeout 5000" "$USERS_DB" "UPDATE users SET blocked = 1 WHERE username = '$USERNAME';"
+  else
+    # Same exclusive lock and write-beside-then-rename as the store's own transactions
+    (
+      flock -w 5 9 || exit 1
+      TMP_FILE=$(mktemp "$USERS_FILE.XXXXXX") || exit 1
+      if jq --arg user "$USERNAME" '.[$user].blocked = true' "$USERS_FILE" > "$TMP_FILE" \
+          && chmod --reference="$USERS_FILE" "$TMP_FILE" && sync "$TMP_FILE"; then
+        mv "$TMP_FILE" "$USERS_FILE"
+      else
+        rm -f "$TMP_FILE"
+      fi
+    ) 9>>"$USERS_FILE.lock"
+  fi
+}
 
 TOTAL_BYTES=$((CURRENT_DOWNLOAD_BYTES + CURRENT_UPLOAD_BYTES))
 
 if [ "$BLOCKED" == "true" ]; then
-  sleep 20 
+  sleep 20
   exit 1
 fi
 
-if [ "$STORED_PASSWORD" != "$PASSWORD" ]; then
+if [ -z "$STORED_PASSWORD" ] || [ "$STORED_PASSWORD" != "$PASSWORD" ]; then
   sleep 20
   exit 1
 fi
@@ -32,7 +87,7 @@ CURRENT_DATE=$(date +%s)
 EXPIRATION_DATE=$(date -d "$ACCOUNT_CREATION_DATE + $EXPIRATION_DAYS days" +%s)
 
 if [ "$CURRENT_DATE" -ge "$EXPIRATION_DATE" ]; then
-  jq --arg user "$USERNAME" '.[$user].blocked = true' "$USERS_FILE" > temp.json && mv temp.json "$USERS_FILE"
+  block_user
   exit 1
 fi
 
@@ -41,7 +96,7 @@ if [ "$TOTAL_BYTES" -ge "$MAX_DOWNLOAD_BYTES" ]; then
   KICK_ENDPOINT="http://127.0.0.1:25413/kick"
   curl -s -H "Authorization: $SECRET" -X POST -d "[\"$USERNAME\"]" "$KICK_ENDPOINT"
 
-  jq --arg user "$USERNAME" '.[$user].blocked = true' "$USERS_FILE" > temp.json && mv temp.json "$USERS_FILE"
+  block_user
   exit 1
 fi
 
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import argparse
+from init_paths import *
+from paths import *
+from storage import get_user_store, get_backend_name, import_json, migrate_json_to_store, UserStoreError
+
+
+def export_users(output=None):
+    """Prints all users as users.json, or writes them to output if given."""
+    store = get_user_store()
+    if output:
+        count = store.export_json(output)
+        print(f"Exported {count} users to {output}.")
+    else:
+        print(json.dumps(store.all(), indent=4))
+    return 0
+
+
+def import_users(path, replace=False):
+    """Loads users from a users.json file into the configured store."""
+    count = import_json(get_user_store(), path, replace=replace)
+    print(f"Imported {count} users from {path}.")
+    return 0
+
+
+def migrate_users():
+    """Moves a leftover users.json into the configured store."""
+    if get_backend_name() == 'json':
+        print("The JSON backend is active; nothing to migrate.")
+        return 0
+    count = migrate_json_to_store(str(USERS_FILE), get_user_store())
+    print(f"Migrated {count} users into {USERS_DB}.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the Hysteria2 user store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export users in users.json format")
+    export_parser.add_argument("-o", "--output", help="File to write instead of stdout")
+
+    import_parser = subparsers.add_parser("import", help="Import users from a users.json file")
+    import_parser.add_argument("path", help="users.json file to import")
+    import_parser.add_argument("--replace", action="store_true", help="Remove users that are not in the file")
+
+    subparsers.add_parser("migrate", help="Migrate users.json into the SQLite store")
+
+    args = parser.parse_args()
+    try:
+        if args.command == "export":
+            return export_users(args.output)
+        if args.command == "import":
+            return import_users(args.path, args.replace)
+        return migrate_users()
+    except (UserStoreError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,40 @@
 import os
+import sys
 import json
-import subprocess
 import re
 import time
 import shlex
 import base64
-from typing import Dict, List, Optional, Tuple, Any, Union
+import hashlib
+import functools
+import copy
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Any, Union
 from dataclasses import dataclass
 from io import BytesIO
 
 from aiohttp import web
 from aiohttp.web_middlewares import middleware
-from urllib.parse import unquote, parse_qs, urlparse, urljoin
+from urllib.parse import urlparse, urljoin
 from dotenv import load_dotenv
 import qrcode
 from jinja2 import Environment, FileSystemLoader
 
 load_dotenv()
 
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SCRIPTS_DIR)
+sys.path.append(os.path.join(SCRIPTS_DIR, 'hysteria2'))
+from paths import CONFIG_FILE, CONFIG_ENV  # noqa: E402
+from storage import get_user_store, file_stamp, UserStore, UserStoreError  # noqa: E402
+from show_user_uri import load_uri_settings, build_user_uris  # noqa: E402
+from ratelimit import RateLimiter  # noqa: E402
+
+
+# Rendered QR PNGs kept in memory, one per distinct payload (a few KB each)
+QR_CACHE_SIZE = 1024
+QR_KINDS = ('sub', 'ipv4', 'ipv6')
+
 
 @dataclass
 class AppConfig:
@@ -27,40 +44,67 @@ class AppConfig:
     aiohttp_listen_port: int
     sni_file: str
     singbox_template_path: str
-    hysteria_cli_path: str
-    users_json_path: str
     rate_limit: int
     rate_limit_window: int
+    token_rate_limit: int
     sni: str
     template_dir: str
     subpath: str
 
 
-class RateLimiter:
-    def __init__(self, limit: int, window: int):
-        self.limit = limit
-        self.window = window
-        self.store: Dict[str, Tuple[int, float]] = {}
-
-    def check_limit(self, client_ip: str) -> bool:
-        current_time = time.monotonic()
-        requests, last_request_time = self.store.get(client_ip, (0, 0))
-        if current_time - last_request_time < self.window:
-            if requests >= self.limit:
-                return False
-        else:
-            requests = 0
-        self.store[client_ip] = (requests + 1, current_time)
-        return True
-
-
 @dataclass
-class UriComponents:
-    username: Optional[str]
-    password: Optional[str]
-    ip: Optional[str]
-    port: Optional[int]
-    obfs_password: str
+class CachedResponse:
+    body: bytes
+    content_type: str
+    charset: Optional[str]
+    etag: str
+    validator: Tuple
+
+
+class ResponseCache:
+    """
+    Finished subscription responses, keyed on (username, client kind, fragment).
+
+    Each entry remembers the validator it was built for (the user's record
+    and the URI settings stamp); a lookup with a different validator is a
+    miss, so edits, traffic updates and config changes show up on the next
+    request without any explicit invalidation. The oldest entries are
+    dropped beyond max_entries.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Tuple, CachedResponse] = OrderedDict()
+
+    def get(self, key: Tuple, validator: Tuple) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.validator != validator:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Tuple, validator: Tuple, response: web.Response) -> CachedResponse:
+        body = response.body
+        entry = CachedResponse(
+            body=body,
+            content_type=response.content_type,
+            charset=response.charset,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            validator=validator,
+        )
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def etag_matches(if_none_match: str, etag: str) -> bool:
+        """Weak comparison as required for If-None-Match."""
+        if if_none_match.strip() == '*':
+            return True
+        tags = (tag.strip() for tag in if_none_match.split(','))
+        return any(tag.removeprefix('W/') == etag for tag in tags)
 
 
 @dataclass
@@ -128,16 +172,16 @@ class Utils:
         return shlex.quote(value)
 
     @staticmethod
-    def generate_qrcode_base64(data: str) -> str:
-        if not data:
-            return None
+    @functools.lru_cache(maxsize=QR_CACHE_SIZE)
+    def generate_qrcode_png(data: str) -> bytes:
+        """Renders data as a PNG QR code; repeated payloads come from an LRU cache."""
         qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
         qr.add_data(data)
         qr.make(fit=True)
         img = qr.make_image(fill_color="black", back_color="white")
         buffered = BytesIO()
         img.save(buffered, format="PNG")
-        return "data:image/png;base64," + base64.b64encode(buffered.getvalue()).decode()
+        return buffered.getvalue()
 
     @staticmethod
     def human_readable_bytes(bytes_value: int) -> str:
@@ -162,130 +206,124 @@ class Utils:
             return False
 
 
-class HysteriaCLI:
-    def __init__(self, cli_path: str, users_json_path: str):
-        self.cli_path = cli_path
-        self.users_json_path = users_json_path
+class UserProvider:
+    """
+    Serves user records and URIs from memory.
 
-    def _run_command(self, args: List[str]) -> str:
-        try:
-            command = ['python3', self.cli_path] + args
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            stdout, stderr = process.communicate()
-            if process.returncode != 0:
-                if "User not found" in stderr:
-                    return None
-                else:
-                    print(f"Hysteria CLI error: {stderr}")
-                    raise subprocess.CalledProcessError(process.returncode, command, output=stdout, stderr=stderr)
-            return stdout.strip()
-        except subprocess.CalledProcessError as e:
-            print(f"Hysteria CLI error: {e}")
-            raise
+    Profiles and a password token -> username index are reloaded only when the
+    store's profile revision moves, which traffic ticks leave alone. The
+    traffic counters a response shows are read per request for that one user,
+    so a subscription hit is a dict lookup plus a single-user read instead of
+    a scan of every user and two cli.py subprocesses.
+    """
 
-    def get_user_password(self, username: str) -> Optional[str]:
+    def __init__(self, user_store: UserStore):
+        self.user_store = user_store
+        self._users_loaded = False
+        self._users_revision: Any = None
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._usernames_by_token: Dict[str, str] = {}
+        self._uri_settings_stamp: Optional[tuple] = None
+        self._uri_settings: Optional[Dict[str, Any]] = None
+
+    def _refresh_users(self) -> None:
         try:
-            with open(self.users_json_path, 'r') as f:
-                users_data = json.load(f)
-            user_details = users_data.get(username)
-            if user_details and 'password' in user_details:
-                return user_details['password']
-            return None
-        except FileNotFoundError:
-            print(f"Error: Users file not found at {self.users_json_path}")
-            return None
-        except json.JSONDecodeError:
-            print(f"Error: Could not decode JSON from {self.users_json_path}")
+            revision = self.user_store.profile_revision()
+            if self._users_loaded and revision == self._users_revision:
+                return
+            users = self.user_store.all()
+        except UserStoreError as e:
+            print(f"Error: Could not read users from the user store: {e}")
+            return
+
+        usernames_by_token: Dict[str, str] = {}
+        for username, details in users.items():
+            password = details.get('password')
+            if password:
+                usernames_by_token.setdefault(password, username)
+
+        self._users = users
+        self._usernames_by_token = usernames_by_token
+        self._users_revision = revision
+        self._users_loaded = True
+
+    def _current_record(self, username: str) -> Optional[Dict[str, Any]]:
+        """The user's record with up-to-date traffic counters; None if the user is unknown."""
+        self._refresh_users()
+        if username not in self._users:
             return None
-        except Exception as e:
-            print(f"An unexpected error occurred while reading users file for password: {e}")
+        try:
+            return self.user_store.get(username)
+        except UserStoreError as e:
+            print(f"Error: Could not read user '{username}' from the user store: {e}")
+            return self._users[username]
+
+    def get_uri_settings(self) -> Dict[str, Any]:
+        stamp = file_stamp(str(CONFIG_FILE), str(CONFIG_ENV))
+        if self._uri_settings is None or stamp != self._uri_settings_stamp:
+            self._uri_settings = load_uri_settings()
+            self._uri_settings_stamp = stamp
+        return self._uri_settings
+
+    def get_record_validator(self, username: str) -> Optional[Tuple]:
+        """Everything a subscription response depends on, in a comparable form; None if the user is unknown."""
+        record = self._current_record(username)
+        if record is None:
             return None
+        self.get_uri_settings()
+        # The online status is not part of any response
+        fields = tuple(sorted((key, value) for key, value in record.items() if key != 'status'))
+        return fields, self._uri_settings_stamp
+
+    def get_user_password(self, username: str) -> Optional[str]:
+        self._refresh_users()
+        user_details = self._users.get(username)
+        if user_details and 'password' in user_details:
+            return user_details['password']
+        return None
 
     def get_username_by_password(self, password_token: str) -> Optional[str]:
-        try:
-            with open(self.users_json_path, 'r') as f:
-                users_data = json.load(f)
-            for username, details in users_data.items():
-                if details.get('password') == password_token:
-                    return username
-            return None
-        except FileNotFoundError:
-            print(f"Error: Users file not found at {self.users_json_path}")
-            return None
-        except json.JSONDecodeError:
-            print(f"Error: Could not decode JSON from {self.users_json_path}")
-            return None
-        except Exception as e:
-            print(f"An unexpected error occurred while reading users file: {e}")
-            return None
+        self._refresh_users()
+        return self._usernames_by_token.get(password_token)
 
     def get_user_info(self, username: str) -> Optional[UserInfo]:
-        raw_info_str = self._run_command(['get-user', '-u', username])
-        if raw_info_str is None:
+        raw_info = self._current_record(username)
+        if raw_info is None:
             return None
 
-        user_password = self.get_user_password(username)
+        user_password = raw_info.get('password')
         if user_password is None:
-            print(f"Warning: Password for user '{username}' could not be fetched from {self.users_json_path}. Cannot create UserInfo.")
+            print(f"Warning: Password for user '{username}' could not be fetched from the user store. Cannot create UserInfo.")
             return None
 
-        try:
-            raw_info = json.loads(raw_info_str)
-            return UserInfo(
-                username=username,
-                password=user_password,
-                upload_bytes=raw_info.get('upload_bytes', 0),
-                download_bytes=raw_info.get('download_bytes', 0),
-                max_download_bytes=raw_info.get('max_download_bytes', 0),
-                account_creation_date=raw_info.get('account_creation_date', ''),
-                expiration_days=raw_info.get('expiration_days', 0)
-            )
-        except json.JSONDecodeError as e:
-            print(f"JSONDecodeError: {e}, Raw output: {raw_info_str}")
-            return None
-
-    def get_user_uri(self, username: str, ip_version: Optional[str] = None) -> str:
-        if ip_version:
-            return self._run_command(['show-user-uri', '-u', username, '-ip', ip_version])
-        else:
-            return self._run_command(['show-user-uri', '-u', username, '-a'])
+        return UserInfo(
+            username=username,
+            password=user_password,
+            upload_bytes=raw_info.get('upload_bytes', 0),
+            download_bytes=raw_info.get('download_bytes', 0),
+            max_download_bytes=raw_info.get('max_download_bytes', 0),
+            account_creation_date=raw_info.get('account_creation_date', ''),
+            expiration_days=raw_info.get('expiration_days', 0)
+        )
 
     def get_uris(self, username: str) -> Tuple[Optional[str], Optional[str]]:
-        output = self._run_command(['show-user-uri', '-u', username, '-a'])
-        ipv4_uri = re.search(r'IPv4:\s*(.*)', output)
-        ipv6_uri = re.search(r'IPv6:\s*(.*)', output)
-        return (ipv4_uri.group(1).strip() if ipv4_uri else None, ipv6_uri.group(1).strip() if ipv6_uri else None)
-
-
-class UriParser:
-    @staticmethod
-    def extract_uri_components(uri: Optional[str], prefix: str) -> Optional[UriComponents]:
-        if not uri or not uri.startswith(prefix):
-            return None
-        uri = uri[len(prefix):].strip()
+        password = self.get_user_password(username)
+        if password is None:
+            return None, None
         try:
-            decoded_uri = unquote(uri)
-            parsed_url = urlparse(decoded_uri)
-            query_params = parse_qs(parsed_url.query)
-            hostname = parsed_url.hostname
-            if hostname and hostname.startswith('[') and hostname.endswith(']'):
-                hostname = hostname[1:-1]
-            port = parsed_url.port if parsed_url.port is not None else None
-            return UriComponents(
-                username=parsed_url.username,
-                password=parsed_url.password,
-                ip=hostname,
-                port=port,
-                obfs_password=query_params.get('obfs-password', [''])[0]
-            )
-        except Exception as e:
-            print(f"Error during URI parsing: {e}, URI: {uri}")
-            return None
+            return build_user_uris(username, password, self.get_uri_settings())
+        except (OSError, KeyError, json.JSONDecodeError) as e:
+            print(f"Error: Could not build URIs for user '{username}': {e}")
+            return None, None
+
+    def get_user_uri(self, username: str, ip_version: str) -> Optional[str]:
+        ipv4_uri, ipv6_uri = self.get_uris(username)
+        return ipv4_uri if ip_version == '4' else ipv6_uri
 
 
 class SingboxConfigGenerator:
-    def __init__(self, hysteria_cli: HysteriaCLI, default_sni: str):
-        self.hysteria_cli = hysteria_cli
+    def __init__(self, user_provider: UserProvider, default_sni: str):
+        self.user_provider = user_provider
         self.default_sni = default_sni
         self._template_cache = None
         self.template_path = None
@@ -301,33 +339,36 @@ class SingboxConfigGenerator:
                     self._template_cache = json.load(f)
             except (FileNotFoundError, json.JSONDecodeError, IOError) as e:
                 raise RuntimeError(f"Error loading Singbox template: {e}") from e
-        return self._template_cache.copy()
+        # Callers rewrite the outbounds in place, so each gets its own copy of the nested structure
+        return copy.deepcopy(self._template_cache)
 
     def generate_config(self, username: str, ip_version: str, fragment: str) -> Optional[Dict[str, Any]]:
-        try:
-            uri = self.hysteria_cli.get_user_uri(username, ip_version)
-        except Exception:
-            print(f"Failed to get URI for {username} with IP version {ip_version}. Skipping.")
+        password = self.user_provider.get_user_password(username)
+        if password is None:
+            print(f"No password found for {username}. Skipping.")
             return None
-        if not uri:
-            print(f"No URI found for {username} with IP version {ip_version}. Skipping.")
+        try:
+            settings = self.user_provider.get_uri_settings()
+            server = settings['ip4'] if ip_version == '4' else settings['ip6']
+            port = int(settings['port'])
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Error: Could not load server settings for {username}: {e}")
             return None
-        components = UriParser.extract_uri_components(uri, f'IPv{ip_version}:')
-        if components is None or components.port is None:
-            print(f"Invalid URI components for {username} with IP version {ip_version}. Skipping.")
+        if not server:
+            print(f"No IPv{ip_version} address configured for {username}. Skipping.")
             return None
 
         return {
             "outbounds": [{
                 "type": "hysteria2",
                 "tag": f"{username}-Hysteria2",
-                "server": components.ip,
-                "server_port": components.port,
+                "server": server,
+                "server_port": port,
                 "obfs": {
                     "type": "salamander",
-                    "password": components.obfs_password
+                    "password": settings['obfs_password']
                 },
-                "password": f"{username}:{components.password}",
+                "password": f"{username}:{password}",
                 "tls": {
                     "enabled": True,
                     "server_name": fragment if fragment else self.default_sni,
@@ -375,15 +416,15 @@ class SingboxConfigGenerator:
 
 
 class SubscriptionManager:
-    def __init__(self, hysteria_cli: HysteriaCLI, config: AppConfig):
-        self.hysteria_cli = hysteria_cli
+    def __init__(self, user_provider: UserProvider, config: AppConfig):
+        self.user_provider = user_provider
         self.config = config
 
     def get_normal_subscription(self, username: str, user_agent: str) -> str:
-        user_info = self.hysteria_cli.get_user_info(username)
+        user_info = self.user_provider.get_user_info(username)
         if user_info is None:
             return "User not found"
-        ipv4_uri, ipv6_uri = self.hysteria_cli.get_uris(username)
+        ipv4_uri, ipv6_uri = self.user_provider.get_uris(username)
         output_lines = [uri for uri in [ipv4_uri, ipv6_uri] if uri]
         if not output_lines:
             return "No URI available"
@@ -422,11 +463,15 @@ class HysteriaServer:
     def __init__(self):
         self.config = self._load_config()
         self.rate_limiter = RateLimiter(self.config.rate_limit, self.config.rate_limit_window)
-        self.hysteria_cli = HysteriaCLI(self.config.hysteria_cli_path, self.config.users_json_path)
-        self.singbox_generator = SingboxConfigGenerator(self.hysteria_cli, self.config.sni)
+        # Optional second limit per subscription token, so rotating IPs cannot hammer one subscription
+        self.token_rate_limiter = (RateLimiter(self.config.token_rate_limit, self.config.rate_limit_window)
+                                   if self.config.token_rate_limit > 0 else None)
+        self.user_provider = UserProvider(get_user_store())
+        self.singbox_generator = SingboxConfigGenerator(self.user_provider, self.config.sni)
         self.singbox_generator.set_template_path(self.config.singbox_template_path)
-        self.subscription_manager = SubscriptionManager(self.hysteria_cli, self.config)
+        self.subscription_manager = SubscriptionManager(self.user_provider, self.config)
         self.template_renderer = TemplateRenderer(self.config.template_dir, self.config)
+        self.response_cache = ResponseCache()
         self.app = web.Application(middlewares=[
             self._invalid_endpoint_middleware,
             self._rate_limit_middleware,
@@ -437,6 +482,7 @@ class HysteriaServer:
 
         base_path = f'/{safe_subpath}'
         self.app.router.add_get(f'{base_path}/sub/normal/{{password_token}}', self.handle)
+        self.app.router.add_get(f'{base_path}/qr/{{password_token}}/{{kind}}.png', self.handle_qrcode)
         self.app.router.add_get(f'{base_path}/robots.txt', self.robots_handler)
         self.app.router.add_route('*', f'{base_path}/{{tail:.*}}', self.handle_404_subpath)
 
@@ -453,10 +499,9 @@ class HysteriaServer:
 
         sni_file = '/etc/hysteria/.configs.env'
         singbox_template_path = '/etc/hysteria/core/scripts/normalsub/singbox.json'
-        hysteria_cli_path = '/etc/hysteria/core/cli.py'
-        users_json_path = os.getenv('HYSTERIA_USERS_JSON_PATH', '/etc/hysteria/users.json')
         rate_limit = 100
         rate_limit_window = 60
+        token_rate_limit = int(os.getenv('TOKEN_RATE_LIMIT', '0'))
         template_dir = os.path.dirname(__file__)
 
         sni = self._load_sni_from_env(sni_file)
@@ -465,9 +510,8 @@ class HysteriaServer:
                          aiohttp_listen_port=aiohttp_listen_port,
                          sni_file=sni_file,
                          singbox_template_path=singbox_template_path,
-                         hysteria_cli_path=hysteria_cli_path,
-                         users_json_path=users_json_path,
                          rate_limit=rate_limit, rate_limit_window=rate_limit_window,
+                         token_rate_limit=token_rate_limit,
                          sni=sni, template_dir=template_dir,
                          subpath=subpath)
 
@@ -496,6 +540,11 @@ class HysteriaServer:
         
         if client_ip and not self.rate_limiter.check_limit(client_ip):
             return web.Response(status=429, text="Rate limit exceeded.")
+
+        password_token = request.match_info.get('password_token')
+        if (password_token and self.token_rate_limiter is not None
+                and not self.token_rate_limiter.check_limit(password_token)):
+            return web.Response(status=429, text="Rate limit exceeded.")
         return await handler(request)
 
     @middleware
@@ -522,27 +571,57 @@ class HysteriaServer:
             
             password_token = Utils.sanitize_input(password_token_raw, r'^[a-zA-Z0-9]+$')
 
-            username = self.hysteria_cli.get_username_by_password(password_token)
+            username = self.user_provider.get_username_by_password(password_token)
             if username is None:
                 return web.Response(status=404, text="User not found for the provided token.")
 
             user_agent = request.headers.get('User-Agent', '').lower()
-            user_info = self.hysteria_cli.get_user_info(username)
+            user_info = self.user_provider.get_user_info(username)
             if user_info is None:
                 return web.Response(status=404, text=f"User '{username}' details not found.")
 
-            if any(browser in user_agent for browser in ['chrome', 'firefox', 'safari', 'edge', 'opera']):
-                return await self._handle_html(request, username, user_info)
-            fragment = request.query.get('fragment', '')
-            if not user_agent.startswith('hiddifynext') and ('singbox' in user_agent or 'sing' in user_agent):
-                return await self._handle_singbox(username, fragment, user_info)
-            return await self._handle_normalsub(request, username, user_info)
+            client_kind = self._classify_user_agent(user_agent)
+            fragment = request.query.get('fragment', '') if client_kind == 'singbox' else ''
+            cache_key = (username, client_kind, fragment)
+            validator = self.user_provider.get_record_validator(username)
+
+            cached = self.response_cache.get(cache_key, validator)
+            if cached is None:
+                if client_kind == 'html':
+                    response = await self._handle_html(request, username, user_info)
+                elif client_kind == 'singbox':
+                    response = await self._handle_singbox(username, fragment, user_info)
+                else:
+                    response = await self._handle_normalsub(request, username, user_info)
+                if response.status != 200:
+                    return response
+                cached = self.response_cache.put(cache_key, validator, response)
+            return self._cached_response(request, cached)
         except ValueError as e:
             return web.Response(status=400, text=f"Error: {e}")
         except Exception as e:
             print(f"Internal Server Error: {e}")
             return web.Response(status=500, text="Error: Internal server error")
 
+    @staticmethod
+    def _classify_user_agent(user_agent: str) -> str:
+        """Groups clients that receive the same bytes: html, singbox, v2rayng or normal."""
+        if any(browser in user_agent for browser in ['chrome', 'firefox', 'safari', 'edge', 'opera']):
+            return 'html'
+        if not user_agent.startswith('hiddifynext') and ('singbox' in user_agent or 'sing' in user_agent):
+            return 'singbox'
+        if "v2ray" in user_agent and "ng" in user_agent:
+            return 'v2rayng'
+        return 'normal'
+
+    def _cached_response(self, request: web.Request, cached: CachedResponse) -> web.Response:
+        headers = {'ETag': cached.etag, 'Cache-Control': 'no-cache'}
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and ResponseCache.etag_matches(if_none_match, cached.etag):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=cached.body, content_type=cached.content_type,
+                            charset=cached.charset, headers=headers)
+
     async def _handle_html(self, request: web.Request, username: str, user_info: UserInfo) -> web.Response:
         context = await self._get_template_context(username, user_info)
         return web.Response(text=self.template_renderer.render(context), content_type='text/html')
@@ -562,19 +641,52 @@ class HysteriaServer:
             return web.Response(status=404, text=f"User '{username}' not found.")
         return web.Response(text=subscription, content_type='text/plain')
 
-    async def _get_template_context(self, username: str, user_info: UserInfo) -> TemplateContext:
-        ipv4_uri, ipv6_uri = self.hysteria_cli.get_uris(username)
+    def _get_sub_link(self, password: str) -> str:
         port_str = f":{self.config.external_port}" if self.config.external_port not in [80, 443, 0] else ""
         base_url = f"https://{self.config.domain}{port_str}"
 
         if not Utils.is_valid_url(base_url):
             print(f"Warning: Constructed base URL '{base_url}' might be invalid. Check domain and port config.")
-        
-        sub_link = f"{base_url}/{self.config.subpath}/sub/normal/{user_info.password}"
+        return f"{base_url}/{self.config.subpath}/sub/normal/{password}"
 
-        ipv4_qrcode = Utils.generate_qrcode_base64(ipv4_uri)
-        ipv6_qrcode = Utils.generate_qrcode_base64(ipv6_uri)
-        sublink_qrcode = Utils.generate_qrcode_base64(sub_link)
+    async def handle_qrcode(self, request: web.Request) -> web.Response:
+        try:
+            password_token = Utils.sanitize_input(request.match_info.get('password_token', ''), r'^[a-zA-Z0-9]+$')
+        except ValueError as e:
+            return web.Response(status=400, text=f"Error: {e}")
+        kind = request.match_info.get('kind')
+        if kind not in QR_KINDS:
+            return web.Response(status=404, text="Not Found")
+
+        username = self.user_provider.get_username_by_password(password_token)
+        if username is None:
+            return web.Response(status=404, text="User not found for the provided token.")
+
+        if kind == 'sub':
+            payload = self._get_sub_link(password_token)
+        else:
+            ipv4_uri, ipv6_uri = self.user_provider.get_uris(username)
+            payload = ipv4_uri if kind == 'ipv4' else ipv6_uri
+        if not payload:
+            return web.Response(status=404, text=f"No {kind} URI available for this user.")
+
+        # The payload is the only input to the image, so its hash is a strong validator
+        etag = f'"{hashlib.sha256(payload.encode()).hexdigest()[:32]}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, max-age=300'}
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and ResponseCache.etag_matches(if_none_match, etag):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=Utils.generate_qrcode_png(payload), content_type='image/png', headers=headers)
+
+    async def _get_template_context(self, username: str, user_info: UserInfo) -> TemplateContext:
+        ipv4_uri, ipv6_uri = self.user_provider.get_uris(username)
+        sub_link = self._get_sub_link(user_info.password)
+
+        # The images are fetched separately from handle_qrcode, keeping the page small
+        qr_base = f"/{self.config.subpath}/qr/{user_info.password}"
+        ipv4_qrcode = f"{qr_base}/ipv4.png" if ipv4_uri else None
+        ipv6_qrcode = f"{qr_base}/ipv6.png" if ipv6_uri else None
+        sublink_qrcode = f"{qr_base}/sub.png"
 
         return TemplateContext(
             username=username,
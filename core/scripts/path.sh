@@ -1,5 +1,6 @@
 CLI_PATH="/etc/hysteria/core/cli.py"
 USERS_FILE="/etc/hysteria/users.json"
+USERS_DB="/etc/hysteria/users.db"
 TRAFFIC_FILE="/etc/hysteria/traffic_data.json"
 CONFIG_FILE="/etc/hysteria/config.json"
 CONFIG_ENV="/etc/hysteria/.configs.env"
@@ -13,4 +14,4 @@ LATESTVERSION="https://raw.githubusercontent.com/ReturnFI/Blitz/main/VERSION"
 LASTESTCHANGE="https://raw.githubusercontent.com/ReturnFI/Blitz/main/changelog"
 CONNECTIONS_FILE="/etc/hysteria/hysteria_connections.json"
 BLOCK_LIST="/tmp/hysteria_blocked_ips.txt"
-SCRIPT_PATH="/etc/hysteria/core/scripts/hysteria2/limit.sh"
\ No newline at end of file
+SCRIPT_PATH="/etc/hysteria/core/scripts/hysteria2/limit.py"
\ No newline at end of file
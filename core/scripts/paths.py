@@ -4,6 +4,9 @@ BASE_DIR = Path("/etc/hysteria")
 
 CLI_PATH = BASE_DIR / "core/cli.py"
 USERS_FILE = BASE_DIR / "users.json"
+USERS_DB = BASE_DIR / "users.db"
+TRAFFIC_JOURNAL = BASE_DIR / "traffic.journal"
+TRAFFIC_SERIES = BASE_DIR / "traffic_series.bin"
 TRAFFIC_FILE = BASE_DIR / "traffic_data.json"
 CONFIG_FILE = BASE_DIR / "config.json"
 CONFIG_ENV = BASE_DIR / ".configs.env"
@@ -18,4 +21,4 @@ LATESTVERSION = "https://raw.githubusercontent.com/ReturnFI/Blitz/main/VERSION"
 LASTESTCHANGE = "https://raw.githubusercontent.com/ReturnFI/Blitz/main/changelog"
 CONNECTIONS_FILE = BASE_DIR / "hysteria_connections.json"
 BLOCK_LIST = Path("/tmp/hysteria_blocked_ips.txt")
-SCRIPT_PATH = BASE_DIR / "core/scripts/hysteria2/limit.sh"
+SCRIPT_PATH = BASE_DIR / "core/scripts/hysteria2/limit.py"
@@ -0,0 +1,68 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+# Roughly 200 bytes per tracked client, so the default caps a limiter at ~13 MB
+DEFAULT_MAX_ENTRIES = 65536
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter with a hard cap on the number of tracked keys.
+
+    Each key (a client IP, a subscription token, ...) gets a bucket of `limit`
+    tokens that refills at limit/window tokens per second; a request spends
+    one token. Buckets live in an OrderedDict kept in least-recently-seen
+    order, so every check is O(1): the key moves to the end, buckets that have
+    been idle long enough to be full again are dropped from the front (a full
+    bucket is the same as no bucket), and once max_entries is reached the
+    least recently seen key is evicted. A flood of distinct keys can therefore
+    only make the limiter forget the quietest clients, never grow without bound.
+    """
+
+    def __init__(self, limit: int, window: float, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        if limit <= 0 or window <= 0:
+            raise ValueError("Rate limit and window must be positive.")
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive.")
+        self.limit = limit
+        self.window = window
+        self.max_entries = max_entries
+        self._rate = limit / window
+        self._clock = clock
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def check_limit(self, key: Optional[str]) -> bool:
+        """Spends one token for key; False means the request should be rejected."""
+        if not key:
+            return True
+        now = self._clock()
+        buckets = self._buckets
+
+        entry = buckets.get(key)
+        if entry is None:
+            tokens = float(self.limit)
+        else:
+            tokens, last_seen = entry
+            tokens = min(float(self.limit), tokens + (now - last_seen) * self._rate)
+            buckets.move_to_end(key)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        buckets[key] = (tokens, now)
+
+        # Two idle buckets at most per call keeps the cost constant while still
+        # draining faster than one new key per request can add
+        for _ in range(2):
+            oldest_key, (_, oldest_seen) = next(iter(buckets.items()))
+            if oldest_key == key or now - oldest_seen < self.window:
+                break
+            del buckets[oldest_key]
+        while len(buckets) > self.max_entries:
+            buckets.popitem(last=False)
+        return allowed
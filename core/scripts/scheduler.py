@@ -1,15 +1,25 @@
 #!/usr/bin/env python3
 import os
 import sys
+import json
 import time
-import schedule
-import logging
-import subprocess
 import fcntl
-import datetime
+import random
+import signal
+import asyncio
+import logging
 from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from dotenv import dotenv_values
 from paths import *
 
+# Jobs are imported and run in this process instead of through `bash -c "... cli.py ..."`
+sys.path.append(str(Path(__file__).resolve().parent / "hysteria2"))
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import traffic  # noqa: E402
+import backup as backup_script  # noqa: E402
+
 logging.basicConfig(
     level=logging.WARNING,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -22,9 +32,171 @@ logger = logging.getLogger("HysteriaScheduler")
 
 # Constants
 BASE_DIR = Path("/etc/hysteria")
-VENV_ACTIVATE = BASE_DIR / "hysteria2_venv/bin/activate"
-# CLI_PATH = BASE_DIR / "core/cli.py"
 LOCK_FILE = "/tmp/hysteria_scheduler.lock"
+STATUS_FILE = BASE_DIR / "scheduler_status.json"
+
+# Seconds; overridable in .configs.env or the service environment
+DEFAULT_TRAFFIC_INTERVAL = 60.0
+DEFAULT_BACKUP_INTERVAL = 6 * 3600.0
+# Each run starts up to this fraction of its interval late, so processes on one host don't fire together
+DEFAULT_JITTER = 0.05
+MIN_INTERVAL = 5.0
+
+
+class JobStats:
+    """Run counters and durations of one job, as written to the status file."""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0
+        self.last_started: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_error: Optional[str] = None
+
+    def record(self, started: float, duration: float, error: Optional[str]) -> None:
+        self.runs += 1
+        self.last_started = started
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.total_duration += duration
+        self.last_error = error
+        if error is not None:
+            self.failures += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "overruns": self.overruns,
+            "last_started": self.last_started,
+            "last_duration": self.last_duration,
+            "avg_duration": self.total_duration / self.runs if self.runs else None,
+            "max_duration": self.max_duration,
+            "last_error": self.last_error,
+        }
+
+
+class Job:
+    """
+    A function run every `interval` seconds in a worker thread.
+
+    Each job has its own lock: a run that is still going when the next one is
+    due makes that next run count as an overrun and be skipped, and it never
+    holds up other jobs.
+    """
+
+    def __init__(self, name: str, func: Callable[[], Any], interval: float,
+                 jitter: float = DEFAULT_JITTER, run_at_start: bool = False):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.max_delay = interval * jitter
+        self.run_at_start = run_at_start
+        self.lock = asyncio.Lock()
+        self.stats = JobStats()
+
+
+class Scheduler:
+    def __init__(self, jobs: list, status_file: Path = STATUS_FILE):
+        self.jobs = jobs
+        self.status_file = status_file
+        self._running: set = set()
+
+    def write_status(self) -> None:
+        status = {job.name: {"interval": job.interval, **job.stats.to_dict()} for job in self.jobs}
+        tmp_file = self.status_file.with_name(self.status_file.name + ".tmp")
+        try:
+            tmp_file.write_text(json.dumps(status, indent=2))
+            os.replace(tmp_file, self.status_file)
+        except OSError as e:
+            logger.warning(f"Failed to write scheduler status: {e}")
+
+    async def run_job(self, job: Job) -> None:
+        async with job.lock:
+            started, clock = time.time(), time.perf_counter()
+            error = None
+            try:
+                await asyncio.to_thread(job.func)
+            except (Exception, SystemExit) as e:
+                # The CLI-era job code signals some failures with sys.exit()
+                error = f"{type(e).__name__}: {e}"
+                logger.error(f"Job {job.name} failed: {error}")
+            duration = time.perf_counter() - clock
+            job.stats.record(started, duration, error)
+            if duration > job.interval:
+                logger.warning(f"Job {job.name} took {duration:.1f}s, longer than its {job.interval:g}s interval")
+        self.write_status()
+
+    async def job_loop(self, job: Job) -> None:
+        loop = asyncio.get_running_loop()
+        next_run = loop.time() + (0 if job.run_at_start else job.interval)
+        while True:
+            await asyncio.sleep(max(0.0, next_run - loop.time()) + random.uniform(0, job.max_delay))
+            next_run += job.interval
+            # After a stall (e.g. the host was suspended) resume the cadence instead of catching up
+            while next_run <= loop.time():
+                next_run += job.interval
+
+            if job.lock.locked():
+                job.stats.overruns += 1
+                logger.warning(f"Job {job.name} is still running; skipping this run")
+                continue
+            task = asyncio.create_task(self.run_job(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def run(self) -> None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        loops = [asyncio.create_task(self.job_loop(job)) for job in self.jobs]
+        await stop.wait()
+        logger.info("Shutting down scheduler")
+        for task in loops:
+            task.cancel()
+        # Let runs in progress finish; a half-done traffic collection is safe but wasteful
+        if self._running:
+            await asyncio.wait(self._running)
+
+
+def read_interval(settings: Dict[str, Optional[str]], key: str, default: float) -> float:
+    value = settings.get(key)
+    if not value:
+        return default
+    try:
+        interval = float(value)
+    except ValueError:
+        logger.warning(f"Ignoring {key}={value!r}: not a number")
+        return default
+    if interval < MIN_INTERVAL:
+        logger.warning(f"{key}={value} is below the {MIN_INTERVAL:.0f}s minimum; using {MIN_INTERVAL:.0f}s")
+        return MIN_INTERVAL
+    return interval
+
+
+def check_traffic_status():
+    traffic.traffic_status(no_gui=True)
+    traffic.kick_expired_users()
+
+
+def backup_hysteria():
+    backup_script.create_backup()
+
+
+def build_jobs() -> list:
+    settings = {**dotenv_values(CONFIG_ENV), **os.environ}
+    return [
+        Job("traffic", check_traffic_status,
+            read_interval(settings, "TRAFFIC_INTERVAL", DEFAULT_TRAFFIC_INTERVAL)),
+        Job("backup", backup_hysteria,
+            read_interval(settings, "BACKUP_INTERVAL", DEFAULT_BACKUP_INTERVAL), run_at_start=True),
+    ]
+
 
 def acquire_lock():
     try:
@@ -32,80 +204,23 @@ def acquire_lock():
         fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
         return lock_fd
     except IOError:
-        logger.warning("Another process is already running and has the lock")
+        logger.warning("Another scheduler is already running and has the lock")
         return None
 
-def release_lock(lock_fd):
-    if lock_fd:
-        fcntl.flock(lock_fd, fcntl.LOCK_UN)
-        lock_fd.close()
-
-def run_command(command, log_success=False):
-
-    activate_cmd = f"source {VENV_ACTIVATE}"
-    full_cmd = f"{activate_cmd} && {command}"
-    
-    try:
-        result = subprocess.run(
-            full_cmd, 
-            shell=True, 
-            executable="/bin/bash",
-            capture_output=True, 
-            text=True
-        )
-        
-        if result.returncode != 0:
-            logger.error(f"Command failed: {full_cmd}")
-            logger.error(f"Error: {result.stderr}")
-        elif log_success:
-            logger.info(f"Command executed successfully: {full_cmd}")
-            
-        return result.returncode == 0
-    except Exception as e:
-        logger.exception(f"Exception running command: {full_cmd}")
-        return False
 
-def check_traffic_status():
+def main():
+    # Held for the daemon's lifetime; jobs only serialise against themselves
     lock_fd = acquire_lock()
     if not lock_fd:
-        return
-        
-    try:
-        success = run_command(f"python3 {CLI_PATH} traffic-status --no-gui", log_success=False)
-        if not success:
-            pass
-    finally:
-        release_lock(lock_fd)
+        sys.exit(1)
 
-def backup_hysteria():
-    lock_fd = acquire_lock()
-    if not lock_fd:
-        logger.warning("Skipping backup due to lock")
-        return
-        
+    logger.info("Starting Hysteria Scheduler")
     try:
-        run_command(f"python3 {CLI_PATH} backup-hysteria", log_success=True)
+        asyncio.run(Scheduler(build_jobs()).run())
     finally:
-        release_lock(lock_fd)
+        fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        lock_fd.close()
 
-def main():
-    logger.info("Starting Hysteria Scheduler")
-    
-    schedule.every(1).minutes.do(check_traffic_status)
-    schedule.every(6).hours.do(backup_hysteria)
-    
-    backup_hysteria()
-    
-    while True:
-        try:
-            schedule.run_pending()
-            time.sleep(1)
-        except KeyboardInterrupt:
-            logger.info("Shutting down scheduler")
-            break
-        except Exception as e:
-            logger.exception("Error in main loop")
-            time.sleep(60)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,92 @@
+import time
+import threading
+import subprocess
+from typing import Dict, Iterable, Optional
+
+# Units reported by `hys2 services-status` and the web panel; keep in sync with services_status.sh
+SERVICES = (
+    "hysteria-server.service",
+    "hysteria-scheduler.service",
+    "hysteria-webpanel.service",
+    "hysteria-caddy.service",
+    "hysteria-telegram-bot.service",
+    "hysteria-normal-sub.service",
+    "hysteria-caddy-normalsub.service",
+    "hysteria-ip-limit.service",
+    "wg-quick@wgcf.service",
+)
+
+DEFAULT_TTL = 3.0
+
+
+class ServiceStatusProvider:
+    """
+    Active state of systemd units, fetched in batches and cached briefly.
+
+    Every unit whose cached state is older than ttl seconds is refreshed by a
+    single `systemctl show` call, so a status page polled from several tabs
+    costs one subprocess per ttl instead of one per unit per request. The
+    lock makes concurrent callers wait for the refresh in flight rather than
+    start their own.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._states: Dict[str, tuple] = {}
+
+    @staticmethod
+    def _query(units: list) -> Dict[str, bool]:
+        try:
+            result = subprocess.run(
+                ['systemctl', 'show', '--property=Id,ActiveState', '--', *units],
+                capture_output=True, text=True, check=False, timeout=10
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return {unit: False for unit in units}
+
+        # One block of Key=Value lines per unit, in the order the units were given; the Id
+        # is preferred when it names a requested unit (it differs for aliases)
+        states = {unit: False for unit in units}
+        blocks = [block for block in result.stdout.strip().split('\n\n') if block.strip()]
+        for unit, block in zip(units, blocks):
+            properties = dict(line.split('=', 1) for line in block.splitlines() if '=' in line)
+            unit = properties.get('Id') if properties.get('Id') in states else unit
+            states[unit] = properties.get('ActiveState') == 'active'
+        return states
+
+    def get_status(self, units: Iterable[str] = SERVICES, max_age: Optional[float] = None) -> Dict[str, bool]:
+        """Returns {unit: is_active} for the given units, querying systemd for stale ones only."""
+        units = list(units)
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            now = time.monotonic()
+            stale = [unit for unit in units
+                     if unit not in self._states or now - self._states[unit][0] >= max_age]
+            if stale:
+                for unit, active in self._query(stale).items():
+                    self._states[unit] = (now, active)
+            return {unit: self._states[unit][1] for unit in units}
+
+    def is_active(self, unit: str) -> bool:
+        return self.get_status([unit])[unit]
+
+    def invalidate(self) -> None:
+        """Drops cached states, e.g. right after starting or stopping a service."""
+        with self._lock:
+            self._states.clear()
+
+
+_provider = ServiceStatusProvider()
+
+
+def get_services_status(units: Iterable[str] = SERVICES) -> Dict[str, bool]:
+    return _provider.get_status(units)
+
+
+def is_service_active(unit: str) -> bool:
+    return _provider.is_active(unit)
+
+
+def invalidate() -> None:
+    _provider.invalidate()
@@ -1,15 +1,23 @@
 import os
 import ssl
 import json
-import subprocess
+import copy
+import functools
 from aiohttp import web
 from aiohttp.web_middlewares import middleware
-from urllib.parse import unquote, parse_qs
 import re
-import time
+import sys
 import shlex
 from dotenv import load_dotenv
 
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SCRIPTS_DIR)
+sys.path.append(os.path.join(SCRIPTS_DIR, 'hysteria2'))
+from ratelimit import RateLimiter  # noqa: E402
+from paths import CONFIG_FILE, CONFIG_ENV  # noqa: E402
+from storage import get_user_store, file_stamp, UserStoreError  # noqa: E402
+from show_user_uri import load_uri_settings  # noqa: E402
+
 load_dotenv()
 
 # Environment variables
@@ -34,26 +42,20 @@ SNI = load_sni_from_env()
 
 RATE_LIMIT = 100
 RATE_LIMIT_WINDOW = 60
+TOKEN_RATE_LIMIT = int(os.getenv('TOKEN_RATE_LIMIT', '0'))
 
-rate_limit_store = {}
+rate_limiter = RateLimiter(RATE_LIMIT, RATE_LIMIT_WINDOW)
+# Optional per-username limit on top of the per-IP one; 0 disables it
+token_rate_limiter = RateLimiter(TOKEN_RATE_LIMIT, RATE_LIMIT_WINDOW) if TOKEN_RATE_LIMIT > 0 else None
 
 @middleware
 async def rate_limit_middleware(request, handler):
     client_ip = request.headers.get('X-Forwarded-For', request.remote)
-    current_time = time.time()
-
-    if client_ip in rate_limit_store:
-        requests, last_request_time = rate_limit_store[client_ip]
-        if current_time - last_request_time < RATE_LIMIT_WINDOW:
-            if requests >= RATE_LIMIT:
-                return web.Response(status=429, text="Rate limit exceeded.")
-        if current_time - last_request_time >= RATE_LIMIT_WINDOW:
-            rate_limit_store[client_ip] = (1, current_time)
-        else:
-            rate_limit_store[client_ip] = (requests + 1, last_request_time)
-    else:
-        rate_limit_store[client_ip] = (1, current_time)
-    
+    if not rate_limiter.check_limit(client_ip):
+        return web.Response(status=429, text="Rate limit exceeded.")
+    username = request.match_info.get('username')
+    if username and token_rate_limiter is not None and not token_rate_limiter.check_limit(username):
+        return web.Response(status=429, text="Rate limit exceeded.")
     return await handler(request)
 
 def sanitize_input(value, pattern):
@@ -80,6 +82,8 @@ async def handle(request):
         config_json = json.dumps(config, indent=4, sort_keys=True)
         
         return web.Response(text=config_json, content_type='application/json')
+    except LookupError as e:
+        return web.Response(status=404, text=f"Error: {str(e)}")
     except ValueError as e:
         return web.Response(status=400, text=f"Error: {str(e)}")
     except Exception as e:
@@ -87,34 +91,31 @@ async def handle(request):
         return web.Response(status=500, text="Error: Internal server error.")
 
 def generate_singbox_config(username, ip_version, fragment):
+    username = sanitize_input(username, r'^[a-zA-Z0-9_-]+$')
+    ip_version = sanitize_input(ip_version, r'^[46]$')
+
     try:
-        username = sanitize_input(username, r'^[a-zA-Z0-9_-]+$')
-        ip_version = sanitize_input(ip_version, r'^[46]$')
-
-        command = [
-            'python3', 
-            '/etc/hysteria/core/cli.py', 
-            'show-user-uri', 
-            '-u', username, 
-            '-ip', ip_version
-        ]
-        
-        uri = subprocess.check_output(command).decode().strip()
-    except subprocess.CalledProcessError:
-        raise RuntimeError("Failed to get URI.")
-    
-    if ip_version == '4':
-        components = extract_uri_components(uri, 'IPv4:')
-    else:
-        components = extract_uri_components(uri, 'IPv6:')
-    
-    config = load_singbox_template()
+        user = get_user_store().get(username)
+    except UserStoreError as e:
+        raise RuntimeError(f"Failed to read user: {e}")
+    if user is None or not user.get('password'):
+        raise LookupError(f"User '{username}' not found.")
+
+    try:
+        settings = get_uri_settings()
+    except (OSError, KeyError, json.JSONDecodeError) as e:
+        raise RuntimeError(f"Failed to load server settings: {e}")
+    server = settings['ip4'] if ip_version == '4' else settings['ip6']
+    if not server:
+        raise ValueError(f"Server has no IPv{ip_version} address.")
+
+    config = copy.deepcopy(load_singbox_template())
     hysteria_tag = f"{username}-Hysteria2"
     config['outbounds'][2]['tag'] = hysteria_tag
-    config['outbounds'][2]['server'] = components['ip']
-    config['outbounds'][2]['server_port'] = int(components['port'])
-    config['outbounds'][2]['obfs']['password'] = components['obfs_password']
-    config['outbounds'][2]['password'] = f"{username}:{components['password']}"
+    config['outbounds'][2]['server'] = server
+    config['outbounds'][2]['server_port'] = int(settings['port'])
+    config['outbounds'][2]['obfs']['password'] = settings['obfs_password']
+    config['outbounds'][2]['password'] = f"{username}:{user['password']}"
     
     config['outbounds'][2]['tls']['server_name'] = fragment if fragment else SNI
 
@@ -123,41 +124,22 @@ def generate_singbox_config(username, ip_version, fragment):
     
     return config
 
-def extract_uri_components(uri, prefix):
-    if uri.startswith(prefix):
-        uri = uri[len(prefix):].strip()
-    
-    decoded_uri = unquote(uri)
-    pattern = re.compile(
-        r'^hy2://([^:]+):([^@]+)@(\[?[^\]]+?\]?):(\d+)\?([^#]+)(?:#([^/]+))?$'
-    )
-    match = pattern.match(decoded_uri)
-    
-    if not match:
-        raise ValueError("Could not parse URI.")
-
-    username = match.group(1)
-    password = match.group(2)
-    ip = match.group(3)
-    port = match.group(4)
-    query_params = match.group(5)
-    fragment = match.group(6)
-    
-    if ip.startswith('[') and ip.endswith(']'):
-        ip = ip[1:-1]
+# (file stamp of config.json and .configs.env, settings parsed from them)
+_uri_settings_cache = (None, None)
 
-    params = parse_qs(query_params)
-    obfs_password = params.get('obfs-password', [''])[0]
-    
-    return {
-        'username': username,
-        'password': password,
-        'ip': ip,
-        'port': port,
-        'obfs_password': obfs_password,
-    }
+def get_uri_settings():
+    """Server settings for the configs, parsed again only when config.json or .configs.env changes."""
+    global _uri_settings_cache
+    stamp = file_stamp(str(CONFIG_FILE), str(CONFIG_ENV))
+    cached_stamp, settings = _uri_settings_cache
+    if settings is None or stamp != cached_stamp:
+        settings = load_uri_settings()
+        _uri_settings_cache = (stamp, settings)
+    return settings
 
+@functools.lru_cache(maxsize=None)
 def load_singbox_template():
+    """Parses the template once; callers must deep-copy it before changing anything."""
     try:
         with open('/etc/hysteria/core/scripts/singbox/singbox.json', 'r') as f:
             return json.load(f)
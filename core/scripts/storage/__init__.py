@@ -0,0 +1,134 @@
+import os
+import threading
+
+from dotenv import dotenv_values
+
+from paths import CONFIG_ENV, TRAFFIC_JOURNAL, TRAFFIC_SERIES, USERS_DB, USERS_FILE
+
+from .base import COUNTER_FIELDS, MAX_USERNAME_BYTES, USER_FIELDS, UserStore, UserStoreError, file_stamp
+from .counters import CounterFile
+from .fileio import atomic_write_json, file_lock
+from .json_store import JsonUserStore
+from .sqlite_store import SqliteUserStore
+from .migrate import import_json, load_users_json, migrate_json_to_store
+from .journal import APPLIED_SEQ_KEY, TrafficJournal
+from .expiry import ExpiryIndex, expiration_timestamp, should_block
+from .timeseries import TrafficSeries, TrafficSeriesError
+from .listing import UserListIndex, SORT_KEYS, STATUS_FILTERS
+from .export import EXPORT_FIELDS, EXPORT_FORMATS, export_chunks, parse_export_fields, project_user
+
+DEFAULT_BACKEND = 'sqlite'
+BACKENDS = ('sqlite', 'json')
+
+__stores: dict[str, UserStore] = {}
+__stores_lock = threading.Lock()
+__series: dict[bool, TrafficSeries] = {}
+__expiry_index = ExpiryIndex()
+__user_list_index = UserListIndex()
+
+
+def get_backend_name() -> str:
+    '''
+    Returns the configured backend, read from USER_STORE in .configs.env.
+    '''
+    backend = os.getenv('HYSTERIA_USER_STORE')
+    if not backend and os.path.isfile(CONFIG_ENV):
+        backend = dotenv_values(CONFIG_ENV).get('USER_STORE')
+    backend = (backend or DEFAULT_BACKEND).strip().lower()
+    if backend not in BACKENDS:
+        raise UserStoreError(f"Unknown user store backend '{backend}'. Expected one of: {', '.join(BACKENDS)}")
+    return backend
+
+
+def get_user_store(backend: str | None = None) -> UserStore:
+    '''
+    Returns the process-wide user store for the configured backend.
+
+    The first time the SQLite backend is opened on a server that still has a
+    users.json, the users are migrated into the database.
+    '''
+    backend = backend or get_backend_name()
+    with __stores_lock:
+        if backend in __stores:
+            return __stores[backend]
+
+        if backend == 'json':
+            store: UserStore = JsonUserStore(str(USERS_FILE))
+        else:
+            fresh = not os.path.exists(USERS_DB)
+            store = SqliteUserStore(str(USERS_DB))
+            if fresh or (store.count() == 0 and os.path.isfile(USERS_FILE)):
+                migrate_json_to_store(str(USERS_FILE), store)
+
+        __stores[backend] = store
+        return store
+
+
+def get_traffic_journal(store: UserStore | None = None) -> TrafficJournal:
+    '''
+    Returns the traffic delta journal that feeds the given (or configured) user store.
+    '''
+    return TrafficJournal(str(TRAFFIC_JOURNAL), store or get_user_store())
+
+
+def get_traffic_series(writable: bool = False) -> TrafficSeries:
+    '''
+    Returns the process-wide per-user traffic history, opened read-only unless writable is set.
+    '''
+    with __stores_lock:
+        if writable not in __series:
+            __series[writable] = TrafficSeries(str(TRAFFIC_SERIES), writable=writable)
+        return __series[writable]
+
+
+def get_expiry_index() -> ExpiryIndex:
+    '''
+    Returns the process-wide expiry index; it rebuilds itself from the store when it falls behind.
+    '''
+    return __expiry_index
+
+
+def get_user_list_index() -> UserListIndex:
+    '''
+    Returns the process-wide index behind paged user listings; it rebuilds itself when the store changes.
+    '''
+    return __user_list_index
+
+
+__all__ = [
+    'USER_FIELDS',
+    'COUNTER_FIELDS',
+    'MAX_USERNAME_BYTES',
+    'UserStore',
+    'UserStoreError',
+    'file_stamp',
+    'atomic_write_json',
+    'file_lock',
+    'JsonUserStore',
+    'CounterFile',
+    'SqliteUserStore',
+    'APPLIED_SEQ_KEY',
+    'TrafficJournal',
+    'ExpiryIndex',
+    'expiration_timestamp',
+    'should_block',
+    'TrafficSeries',
+    'TrafficSeriesError',
+    'UserListIndex',
+    'SORT_KEYS',
+    'STATUS_FILTERS',
+    'EXPORT_FIELDS',
+    'EXPORT_FORMATS',
+    'export_chunks',
+    'parse_export_fields',
+    'project_user',
+    'get_backend_name',
+    'get_user_store',
+    'get_traffic_journal',
+    'get_traffic_series',
+    'get_expiry_index',
+    'get_user_list_index',
+    'import_json',
+    'load_users_json',
+    'migrate_json_to_store',
+]
@@ -0,0 +1,176 @@
+import os
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from .fileio import atomic_write_json
+
+# Every field a user record can carry, in the order they appear in users.json
+USER_FIELDS = (
+    'password',
+    'max_download_bytes',
+    'expiration_days',
+    'account_creation_date',
+    'blocked',
+    'upload_bytes',
+    'download_bytes',
+    'status',
+)
+# The fields traffic collection rewrites every tick; the rest of a record changes rarely
+COUNTER_FIELDS = ('upload_bytes', 'download_bytes', 'status')
+# Longest username (in bytes) that fits the fixed-width name fields of the counter and traffic history files
+MAX_USERNAME_BYTES = 64
+
+
+def file_stamp(*paths: str) -> tuple:
+    """Returns (mtime_ns, size) for each path, or None for missing files; cheap to compare for changes."""
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            stamp.append(None)
+            continue
+        stamp.append((st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+class UserStoreError(Exception):
+    """Raised when the user store cannot be read or written."""
+    pass
+
+
+class UserStore(ABC):
+    """
+    Key/value view over all Hysteria2 users.
+
+    Records are plain dicts using the same keys as users.json, so callers can
+    switch backends without touching the data they pass around.
+    """
+
+    @abstractmethod
+    def get(self, username: str) -> dict[str, Any] | None:
+        """Returns the record of a user or None if it does not exist."""
+
+    @abstractmethod
+    def put(self, username: str, record: dict[str, Any]) -> None:
+        """Creates or replaces the whole record of a user."""
+
+    @abstractmethod
+    def patch(self, username: str, fields: dict[str, Any]) -> bool:
+        """Updates only the given fields of a user. Returns False if the user does not exist."""
+
+    @abstractmethod
+    def delete(self, username: str) -> bool:
+        """Removes a user. Returns False if the user does not exist."""
+
+    @abstractmethod
+    def rename(self, username: str, new_username: str) -> bool:
+        """Moves a record to a new username. Returns False if the user does not exist."""
+
+    @abstractmethod
+    def iterate(self) -> Iterator[tuple[str, dict[str, Any]]]:
+        """Yields (username, record) pairs for every user."""
+
+    @abstractmethod
+    @contextmanager
+    def transaction(self) -> Iterator['UserStore']:
+        """Groups several operations into one atomic write."""
+
+    @abstractmethod
+    def get_meta(self, key: str) -> str | None:
+        """Returns a bookkeeping value stored alongside the users."""
+
+    @abstractmethod
+    def set_meta(self, key: str, value: str) -> None:
+        """Stores a bookkeeping value; inside a transaction it commits together with the users."""
+
+    def add_usage(self, username: str, upload_bytes: int, download_bytes: int) -> bool:
+        """Adds to a user's traffic counters. Returns False if the user does not exist."""
+        with self.transaction():
+            record = self.get(username)
+            if record is None:
+                return False
+            return self.patch(username, {
+                'upload_bytes': (record.get('upload_bytes') or 0) + upload_bytes,
+                'download_bytes': (record.get('download_bytes') or 0) + download_bytes,
+            })
+
+    def watched_paths(self) -> tuple[str, ...]:
+        """Files that are modified whenever the stored users change."""
+        return ()
+
+    def change_stamp(self) -> tuple:
+        """
+        Returns a value that differs whenever the stored users change.
+
+        Long-running readers that keep users in memory compare it on each
+        request to decide when to reload, without touching the data itself.
+        """
+        return file_stamp(*self.watched_paths())
+
+    def profile_revision(self) -> Any:
+        """
+        Returns a value that differs whenever a user is added, removed or renamed,
+        or their password, limits, dates or blocked flag change; traffic counters
+        and the online status are left out.
+
+        The default falls back to change_stamp(), which also moves on traffic updates.
+        """
+        return self.change_stamp()
+
+    def exists(self, username: str, ignore_case: bool = False) -> bool:
+        if not ignore_case:
+            return self.get(username) is not None
+        username = username.lower()
+        return any(name.lower() == username for name, _ in self.iterate())
+
+    def all(self) -> dict[str, dict[str, Any]]:
+        return dict(self.iterate())
+
+    def iter_batches(self, size: int = 500) -> Iterator[list[tuple[str, dict[str, Any]]]]:
+        """
+        Yields all users as lists of up to size (username, record) pairs.
+
+        Each batch is read completely before it is yielded, so consecutive
+        batches may be pulled from different threads.
+        """
+        batch = []
+        for item in self.iterate():
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def users_not_offline(self) -> set[str]:
+        """
+        Usernames whose status is anything but 'Offline': online, never set, or another value.
+
+        The traffic tick only needs these plus the clients the API reports, so
+        backends that can answer without reading every user should.
+        """
+        return {username for username, record in self.iterate() if record.get('status') != 'Offline'}
+
+    def count(self) -> int:
+        return sum(1 for _ in self.iterate())
+
+    def traffic_totals(self) -> tuple[int, int]:
+        """Returns the upload and download bytes summed over all users."""
+        upload = download = 0
+        for _, record in self.iterate():
+            upload += int(record.get('upload_bytes') or 0)
+            download += int(record.get('download_bytes') or 0)
+        return upload, download
+
+    def put_many(self, records: dict[str, dict[str, Any]]) -> None:
+        with self.transaction():
+            for username, record in records.items():
+                self.put(username, record)
+
+    def export_json(self, path: str) -> int:
+        """Writes all users to path in the users.json layout and returns how many were written."""
+        data = self.all()
+        atomic_write_json(path, data)
+        return len(data)
@@ -0,0 +1,212 @@
+import os
+import mmap
+import struct
+import threading
+from typing import Any
+
+from .base import MAX_USERNAME_BYTES, UserStoreError
+
+MAGIC = b'HYCNT001'
+# magic, slot capacity, slot generation (bumped when a slot is taken or freed), write version
+HEADER = struct.Struct('<8sIIQ')
+# Last traffic journal sequence applied to the counters, in the header's spare bytes (0 in older files)
+APPLIED_SEQ = struct.Struct('<Q')
+APPLIED_SEQ_OFFSET = HEADER.size
+HEADER_SIZE = 32
+NAME_SIZE = MAX_USERNAME_BYTES
+STATUS_SIZE = 16
+# upload bytes, download bytes, status
+COUNTERS = struct.Struct(f'<QQ{STATUS_SIZE}s')
+SLOT_SIZE = NAME_SIZE + COUNTERS.size
+INITIAL_CAPACITY = 64
+
+
+class CounterFile:
+    """
+    Per-user traffic counters and online status in fixed-width slots of one memory-mapped file.
+
+    These are the fields traffic.py changes every tick, so they are updated in
+    place here instead of making the JSON store rewrite every password and
+    date each minute. Each user owns one 96-byte slot (name, upload, download,
+    status); the file doubles when it runs out of slots. Readers cache the
+    name -> slot map and rescan only when the slot generation in the header
+    moves, and the write version lets callers notice counter changes without
+    reading them. The header also keeps the last traffic journal sequence
+    applied to the counters, written by the same write() as the counters.
+
+    Locking across processes is left to the caller (JsonUserStore does every
+    write under its exclusive lock and every read under its shared one).
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._file = None
+        self._map: mmap.mmap | None = None
+        self._capacity = 0
+        self._generation = -1
+        self._slots: dict[str, int] = {}
+
+    def _open(self, create: bool = False) -> bool:
+        """Maps the file (again if another process grew it); False if it does not exist yet."""
+        if self._map is not None:
+            if os.fstat(self._file.fileno()).st_size == len(self._map):
+                return True
+            self.close()
+
+        if not os.path.exists(self.path):
+            if not create:
+                return False
+            with open(self.path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, INITIAL_CAPACITY, 0, 0))
+                f.truncate(HEADER_SIZE + INITIAL_CAPACITY * SLOT_SIZE)
+
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, capacity, _, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) < HEADER_SIZE + capacity * SLOT_SIZE:
+            self.close()
+            raise UserStoreError(f"{self.path} is not a counter file of this version or is truncated.")
+        self._capacity = capacity
+        self._generation = -1
+        return True
+
+    def _refresh_slots(self) -> None:
+        _, _, generation, _ = HEADER.unpack_from(self._map, 0)
+        if generation == self._generation:
+            return
+        self._slots = {}
+        for slot in range(self._capacity):
+            offset = HEADER_SIZE + slot * SLOT_SIZE
+            name = self._map[offset:offset + NAME_SIZE].rstrip(b'\0')
+            if name:
+                self._slots[name.decode()] = slot
+        self._generation = generation
+
+    def _bump(self, slots_changed: bool) -> None:
+        magic, capacity, generation, version = HEADER.unpack_from(self._map, 0)
+        if slots_changed:
+            generation = (generation + 1) & 0xFFFFFFFF
+            self._generation = generation
+        HEADER.pack_into(self._map, 0, magic, capacity, generation, version + 1)
+
+    def _read_slot(self, slot: int) -> dict[str, Any]:
+        upload, download, status = COUNTERS.unpack_from(self._map, HEADER_SIZE + slot * SLOT_SIZE + NAME_SIZE)
+        counters: dict[str, Any] = {'upload_bytes': upload, 'download_bytes': download}
+        status = status.rstrip(b'\0')
+        if status:
+            counters['status'] = status.decode()
+        return counters
+
+    def _free_slots(self) -> list[int]:
+        """Unused slots, lowest last, so pop() fills the file from the front."""
+        used = set(self._slots.values())
+        return [slot for slot in range(self._capacity - 1, -1, -1) if slot not in used]
+
+    def _allocate(self, username: str, free: list[int]) -> int:
+        if not free:
+            old_capacity = self._capacity
+            self._capacity *= 2
+            self._file.truncate(HEADER_SIZE + self._capacity * SLOT_SIZE)
+            self._map.resize(HEADER_SIZE + self._capacity * SLOT_SIZE)
+            magic, _, generation, version = HEADER.unpack_from(self._map, 0)
+            HEADER.pack_into(self._map, 0, magic, self._capacity, generation, version)
+            free.extend(range(self._capacity - 1, old_capacity - 1, -1))
+        slot = free.pop()
+        offset = HEADER_SIZE + slot * SLOT_SIZE
+        self._map[offset:offset + NAME_SIZE] = username.encode().ljust(NAME_SIZE, b'\0')
+        self._slots[username] = slot
+        return slot
+
+    def read(self, username: str) -> dict[str, Any] | None:
+        """Returns a user's counters, or None if they have none here."""
+        with self._lock:
+            if not self._open():
+                return None
+            self._refresh_slots()
+            slot = self._slots.get(username)
+            return self._read_slot(slot) if slot is not None else None
+
+    def read_all(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            if not self._open():
+                return {}
+            self._refresh_slots()
+            return {username: self._read_slot(slot) for username, slot in self._slots.items()}
+
+    def version(self) -> int:
+        """A number that changes with every write; 0 while the file does not exist."""
+        with self._lock:
+            if not self._open():
+                return 0
+            return HEADER.unpack_from(self._map, 0)[3]
+
+    def applied_seq(self) -> int:
+        """The journal sequence passed to the latest write() that set one; 0 if none did."""
+        with self._lock:
+            if not self._open():
+                return 0
+            return APPLIED_SEQ.unpack_from(self._map, APPLIED_SEQ_OFFSET)[0]
+
+    @staticmethod
+    def fits(username: str) -> bool:
+        """True if the username fits a slot; longer names cannot keep their counters here."""
+        return len(username.encode()) <= NAME_SIZE
+
+    def validate(self, updates: dict[str, dict[str, Any] | None]) -> None:
+        """Raises UserStoreError if write() would reject updates, without touching the file."""
+        for username, counters in updates.items():
+            if not self.fits(username):
+                raise UserStoreError(f"Username '{username}' is too long for the counter file.")
+            status = ((counters or {}).get('status') or '').encode()
+            if len(status) > STATUS_SIZE:
+                raise UserStoreError(f"Status '{status.decode()}' is too long for the counter file.")
+
+    def write(self, updates: dict[str, dict[str, Any] | None], applied_seq: int | None = None) -> None:
+        """
+        Applies {username: counters} in place; None frees the user's slot.
+        applied_seq, if given, is stored in the header after the counters.
+
+        Missing or None counter values are stored as 0 (or no status).
+        Everything is validated first, so a rejected update leaves the file untouched.
+        """
+        self.validate(updates)
+
+        with self._lock:
+            self._open(create=True)
+            self._refresh_slots()
+            slots_changed = False
+            # Found once per write; scanning for a free slot per new user made bulk inserts quadratic
+            free: list[int] | None = None
+            for username, counters in updates.items():
+                slot = self._slots.get(username)
+                if counters is None:
+                    if slot is not None:
+                        offset = HEADER_SIZE + slot * SLOT_SIZE
+                        self._map[offset:offset + SLOT_SIZE] = bytes(SLOT_SIZE)
+                        del self._slots[username]
+                        if free is not None:
+                            free.append(slot)
+                        slots_changed = True
+                    continue
+                if slot is None:
+                    if free is None:
+                        free = self._free_slots()
+                    slot = self._allocate(username, free)
+                    slots_changed = True
+                COUNTERS.pack_into(self._map, HEADER_SIZE + slot * SLOT_SIZE + NAME_SIZE,
+                                   int(counters.get('upload_bytes') or 0),
+                                   int(counters.get('download_bytes') or 0),
+                                   (counters.get('status') or '').encode())
+            if applied_seq is not None:
+                APPLIED_SEQ.pack_into(self._map, APPLIED_SEQ_OFFSET, applied_seq)
+            self._bump(slots_changed)
+            self._map.flush()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
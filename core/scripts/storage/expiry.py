@@ -0,0 +1,135 @@
+import heapq
+import datetime
+from typing import Any, Iterable
+
+from .base import UserStore
+from .journal import APPLIED_SEQ_KEY
+
+
+def expiration_timestamp(record: dict[str, Any]) -> float | None:
+    """Unix time at which a user expires, or None if the user is never blocked automatically."""
+    if record.get('blocked', False):
+        return None
+    if (record.get('max_download_bytes') or 0) <= 0 or (record.get('expiration_days') or 0) <= 0:
+        return None
+    creation_date = record.get('account_creation_date')
+    if not creation_date:
+        return None
+    try:
+        created = datetime.datetime.fromisoformat(creation_date.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    return (created + datetime.timedelta(days=record['expiration_days'])).timestamp()
+
+
+def should_block(record: dict[str, Any] | None, now: float) -> bool:
+    """True if a user is past their expiry date or has used up their traffic limit."""
+    if record is None:
+        return False
+    expires_at = expiration_timestamp(record)
+    if expires_at is None:
+        return False
+    used = (record.get('upload_bytes') or 0) + (record.get('download_bytes') or 0)
+    return used >= record['max_download_bytes'] or now >= expires_at
+
+
+class ExpiryIndex:
+    """
+    Which users are due for blocking, kept up to date between checks.
+
+    Expiry times sit in a min-heap and every user's remaining quota in a dict,
+    so a check only looks at users whose expiry has passed or whose quota ran
+    out in the traffic applied since the previous check, instead of all of
+    them. The index is built once from the store and reused for as long as
+    the store's profile revision and applied journal sequence match what it
+    has seen; anything else (edits, renewals, traffic applied by another
+    process) triggers a rebuild.
+
+    Candidates are always re-checked against the store before blocking, so a
+    stale entry can only cause a wasted lookup, never a wrong block.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, str]] = []
+        self._expires: dict[str, float] = {}
+        self._remaining: dict[str, int] = {}
+        self._exhausted: set[str] = set()
+        self._due: set[str] = set()
+        self._revision: Any = None
+        self._applied_seq: str | None = None
+        self._built = False
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def _index(self, username: str, record: dict[str, Any] | None) -> None:
+        self._expires.pop(username, None)
+        self._remaining.pop(username, None)
+        self._exhausted.discard(username)
+        self._due.discard(username)
+        expires_at = expiration_timestamp(record) if record is not None else None
+        if expires_at is None:
+            return
+        self._expires[username] = expires_at
+        heapq.heappush(self._heap, (expires_at, username))
+        used = (record.get('upload_bytes') or 0) + (record.get('download_bytes') or 0)
+        self._remaining[username] = record['max_download_bytes'] - used
+        if self._remaining[username] <= 0:
+            self._exhausted.add(username)
+
+    def rebuild(self, store: UserStore) -> None:
+        """Indexes every user in the store. Call inside a store transaction."""
+        self._heap = []
+        self._expires = {}
+        self._remaining = {}
+        self._exhausted = set()
+        self._due = set()
+        for username, record in store.iterate():
+            self._index(username, record)
+        self.mark_synced(store)
+        self._built = True
+
+    def mark_synced(self, store: UserStore) -> None:
+        """Records the store state the index now reflects."""
+        self._revision = store.profile_revision()
+        self._applied_seq = store.get_meta(APPLIED_SEQ_KEY)
+
+    def invalidate(self) -> None:
+        """Forces a rebuild on next use."""
+        self._built = False
+
+    def is_current(self, store: UserStore) -> bool:
+        return (self._built
+                and self._revision == store.profile_revision()
+                and self._applied_seq == store.get_meta(APPLIED_SEQ_KEY))
+
+    def record_usage(self, totals: dict[str, Iterable[int]], previous_seq: str | None, applied_seq: str | None) -> None:
+        """
+        Subtracts traffic that was just applied to the store from the remaining quotas.
+
+        previous_seq and applied_seq are the store's applied journal sequence
+        before and after the traffic was applied; if the index had not seen
+        previous_seq it has missed some traffic and is rebuilt on next use.
+        """
+        if not self._built or self._applied_seq != previous_seq:
+            self.invalidate()
+            return
+        for username, (upload, download) in totals.items():
+            if username in self._remaining:
+                self._remaining[username] -= upload + download
+                if self._remaining[username] <= 0:
+                    self._exhausted.add(username)
+        self._applied_seq = applied_seq
+
+    def candidates(self, now: float) -> set[str]:
+        """Users whose quota ran out or whose expiry passed; they stay candidates until refreshed."""
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, username = heapq.heappop(self._heap)
+            # Entries left behind by an earlier refresh of the same user are skipped
+            if self._expires.get(username) == expires_at:
+                self._due.add(username)
+        return self._exhausted | self._due
+
+    def refresh(self, username: str, record: dict[str, Any] | None) -> None:
+        """Re-indexes one user from its current record (None removes it)."""
+        self._index(username, record)
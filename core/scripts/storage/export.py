@@ -0,0 +1,79 @@
+import json
+from typing import Any, Iterable, Iterator
+
+from .base import USER_FIELDS, UserStore
+from .listing import expiry_timestamp
+
+# Computed per user on export: total traffic in bytes and the unix time the plan ends
+DERIVED_FIELDS = ('usage_bytes', 'expires_at')
+EXPORT_FIELDS = ('username',) + USER_FIELDS + DERIVED_FIELDS
+EXPORT_FORMATS = ('ndjson', 'json')
+EXPORT_BATCH_SIZE = 500
+
+
+def parse_export_fields(fields: str | Iterable[str] | None) -> tuple[str, ...]:
+    """
+    Turns a comma-separated string or list of field names into a projection; None or empty means every field.
+
+    Raises:
+        ValueError: For a field that is not in EXPORT_FIELDS.
+    """
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    names = tuple(dict.fromkeys(name.strip() for name in fields or () if name.strip()))
+    unknown = [name for name in names if name not in EXPORT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Expected any of: {', '.join(EXPORT_FIELDS)}")
+    return names or EXPORT_FIELDS
+
+
+def project_user(username: str, record: dict[str, Any], fields: tuple[str, ...]) -> dict[str, Any]:
+    """Returns the requested fields of one user; fields the record does not carry are None."""
+    projected = {}
+    for field in fields:
+        if field == 'username':
+            projected[field] = username
+        elif field == 'usage_bytes':
+            projected[field] = (record.get('upload_bytes') or 0) + (record.get('download_bytes') or 0)
+        elif field == 'expires_at':
+            expires_at = expiry_timestamp(record)
+            projected[field] = int(expires_at) if expires_at is not None else None
+        else:
+            projected[field] = record.get(field)
+    return projected
+
+
+def export_chunks(store: UserStore, fmt: str = 'ndjson', fields: tuple[str, ...] = EXPORT_FIELDS,
+                  batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Yields every user as encoded output, one chunk per batch of users read from the store.
+
+    'ndjson' writes one JSON object per line; 'json' writes the same objects as
+    one array. Only one batch is held in memory at a time (the JSON backend
+    still loads users.json as a whole), and the first chunk is ready as soon
+    as the first batch is read.
+
+    Raises:
+        ValueError: For an unknown format.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Expected one of: {', '.join(EXPORT_FORMATS)}")
+    return _ndjson_chunks(store, fields, batch_size) if fmt == 'ndjson' else _json_chunks(store, fields, batch_size)
+
+
+def _encoded_batches(store: UserStore, fields: tuple[str, ...], batch_size: int) -> Iterator[list[str]]:
+    for batch in store.iter_batches(batch_size):
+        yield [json.dumps(project_user(username, record, fields), separators=(',', ':')) for username, record in batch]
+
+
+def _ndjson_chunks(store: UserStore, fields: tuple[str, ...], batch_size: int) -> Iterator[bytes]:
+    for lines in _encoded_batches(store, fields, batch_size):
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def _json_chunks(store: UserStore, fields: tuple[str, ...], batch_size: int) -> Iterator[bytes]:
+    separator = '['
+    for lines in _encoded_batches(store, fields, batch_size):
+        yield (separator + ','.join(lines)).encode()
+        separator = ','
+    yield b']\n' if separator == ',' else b'[]\n'
@@ -0,0 +1,57 @@
+import os
+import json
+import fcntl
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+
+@contextmanager
+def file_lock(lock_path: str, shared: bool = False) -> Iterator[None]:
+    """
+    Reader/writer lock on lock_path that works across processes and threads.
+
+    Any number of shared holders run together; an exclusive holder runs alone.
+    flock() locks belong to the open file, and every call opens its own, so
+    two threads of one process exclude each other just like two processes.
+    """
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def atomic_write_json(path: str, data: Any, indent: int | None = 4) -> None:
+    """
+    Replaces path with data as JSON so that it holds either the old or the new content, even after a crash.
+
+    The JSON goes to a temporary file in the same directory, which is fsync'ed
+    and renamed over path; the directory is fsync'ed too so the rename itself
+    survives a power loss. An existing file's permissions are kept.
+    """
+    path = str(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,274 @@
+import os
+import json
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Iterator
+
+from .base import COUNTER_FIELDS, USER_FIELDS, UserStore, UserStoreError, file_stamp
+from .counters import CounterFile
+from .fileio import atomic_write_json, file_lock
+from .journal import APPLIED_SEQ_KEY
+
+PROFILE_FIELDS = tuple(field for field in USER_FIELDS if field not in COUNTER_FIELDS)
+
+
+class JsonUserStore(UserStore):
+    """
+    The original users.json layout behind the UserStore interface.
+
+    Profile writes rewrite the whole file, so this backend is kept for small
+    installs and for exporting/importing data, not for large user counts.
+    Traffic counters and status live in users.json.counters (see CounterFile)
+    and are updated in place, so the minute-ly traffic tick no longer rewrites
+    users.json; get() and iterate() merge them into each record as it is
+    returned. A users.json that still carries counters (an older install, a
+    hand edit) has them moved over on its next write. Users whose name is
+    too long for a counter slot (only possible before names were limited)
+    keep their counters in users.json.
+
+    A transaction holds an exclusive lock on users.json.lock for its whole
+    read-modify-write and replaces the files atomically; reads outside a
+    transaction take the lock shared, so they never wait for each other and
+    never see users and meta from two different writes.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.lock_path = f"{self.path}.lock"
+        self.meta_path = f"{self.path}.meta"
+        self.counters = CounterFile(f"{self.path}.counters")
+        self._local = threading.local()
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except json.JSONDecodeError as e:
+            raise UserStoreError(f"{self.path} contains invalid JSON: {e}") from e
+
+    def _dump(self, data: dict[str, dict[str, Any]]) -> None:
+        atomic_write_json(self.path, data)
+
+    def _load_meta(self) -> dict[str, str]:
+        if not os.path.isfile(self.meta_path):
+            return {}
+        try:
+            with open(self.meta_path, 'r') as f:
+                return json.load(f)
+        except json.JSONDecodeError as e:
+            raise UserStoreError(f"{self.meta_path} contains invalid JSON: {e}") from e
+
+    def _in_transaction(self) -> bool:
+        return getattr(self._local, 'data', None) is not None
+
+    def _reading(self):
+        # Inside a transaction the exclusive lock is already held
+        return nullcontext() if self._in_transaction() else file_lock(self.lock_path, shared=True)
+
+    @contextmanager
+    def transaction(self) -> Iterator['JsonUserStore']:
+        if self._in_transaction():
+            yield self
+            return
+
+        with file_lock(self.lock_path):
+            self._local.data = self._load()
+            self._local.dirty = False
+            self._local.meta = None
+            self._local.counters = {}
+            self._local.applied_seq = None
+            try:
+                self._move_legacy_counters()
+                yield self
+                # Counters go first and are validated before anything is written: a rejected update
+                # leaves both files untouched, and counters moved out of users.json are never dropped
+                # from it before they are in the counter file
+                if self._local.counters or self._local.applied_seq is not None:
+                    self.counters.write(self._local.counters, applied_seq=self._local.applied_seq)
+                if self._local.dirty:
+                    self._dump(self._local.data)
+                # Written right after the users; the two files are not updated atomically together
+                if self._local.meta is not None:
+                    atomic_write_json(self.meta_path, self._local.meta)
+            finally:
+                self._local.data = None
+                self._local.meta = None
+                self._local.counters = None
+                self._local.applied_seq = None
+
+    def _move_legacy_counters(self) -> None:
+        stored = None
+        for username, record in self._local.data.items():
+            if not self.counters.fits(username):
+                continue
+            legacy = {field: record.pop(field) for field in COUNTER_FIELDS if field in record}
+            if not legacy:
+                continue
+            if stored is None:
+                stored = self.counters.read_all()
+            # Counters already in the counter file are newer than anything left in users.json
+            if username not in stored:
+                self._local.counters[username] = legacy
+            self._mark_dirty()
+
+    def _data(self) -> dict[str, dict[str, Any]]:
+        data = getattr(self._local, 'data', None)
+        return data if data is not None else self._load()
+
+    def _current_counters(self, username: str) -> dict[str, Any] | None:
+        if not self.counters.fits(username):
+            record = self._local.data.get(username) or {}
+            return {field: record[field] for field in COUNTER_FIELDS if field in record} or None
+        pending = self._local.counters
+        return pending[username] if username in pending else self.counters.read(username)
+
+    def _replace_counters(self, username: str, counters: dict[str, Any] | None) -> None:
+        if self.counters.fits(username):
+            self._local.counters[username] = counters or None
+            return
+        record = self._local.data.get(username)
+        if record is None:
+            return
+        for field in COUNTER_FIELDS:
+            record.pop(field, None)
+        record.update({key: value for key, value in (counters or {}).items() if value is not None})
+        self._mark_dirty()
+
+    def _set_counters(self, username: str, fields: dict[str, Any] | None) -> None:
+        if fields is not None:
+            fields = {**(self._current_counters(username) or {}), **fields}
+        self._replace_counters(username, fields)
+
+    def _mark_dirty(self) -> None:
+        self._local.dirty = True
+
+    @staticmethod
+    def _merged(record: dict[str, Any], counters: dict[str, Any] | None) -> dict[str, Any]:
+        record = dict(record)
+        if counters:
+            record.update(counters)
+        return record
+
+    def get(self, username: str) -> dict[str, Any] | None:
+        with self._reading():
+            record = self._data().get(username)
+            if record is None:
+                return None
+            counters = self._current_counters(username) if self._in_transaction() else self.counters.read(username)
+        return self._merged(record, counters)
+
+    def put(self, username: str, record: dict[str, Any]) -> None:
+        with self.transaction():
+            self._local.data[username] = {key: value for key, value in record.items()
+                                          if value is not None and key not in COUNTER_FIELDS}
+            counters = {key: record[key] for key in COUNTER_FIELDS if record.get(key) is not None}
+            self._replace_counters(username, counters)
+            self._mark_dirty()
+
+    def patch(self, username: str, fields: dict[str, Any]) -> bool:
+        with self.transaction():
+            record = self._local.data.get(username)
+            if record is None:
+                return False
+            profile = {key: value for key, value in fields.items() if key in PROFILE_FIELDS}
+            counters = {key: value for key, value in fields.items() if key in COUNTER_FIELDS}
+            if profile:
+                record.update(profile)
+                self._mark_dirty()
+            if counters:
+                self._set_counters(username, counters)
+            return True
+
+    def add_usage(self, username: str, upload_bytes: int, download_bytes: int) -> bool:
+        with self.transaction():
+            if username not in self._local.data:
+                return False
+            current = self._current_counters(username) or {}
+            self._set_counters(username, {
+                'upload_bytes': (current.get('upload_bytes') or 0) + upload_bytes,
+                'download_bytes': (current.get('download_bytes') or 0) + download_bytes,
+            })
+            return True
+
+    def delete(self, username: str) -> bool:
+        with self.transaction():
+            if self._local.data.pop(username, None) is None:
+                return False
+            self._replace_counters(username, None)
+            self._mark_dirty()
+            return True
+
+    def rename(self, username: str, new_username: str) -> bool:
+        with self.transaction():
+            data = self._local.data
+            if username not in data:
+                return False
+            if username != new_username:
+                counters = self._current_counters(username)
+                self._replace_counters(username, None)
+                data[new_username] = data.pop(username)
+                self._replace_counters(new_username, counters)
+                self._mark_dirty()
+            return True
+
+    def get_meta(self, key: str) -> str | None:
+        if key == APPLIED_SEQ_KEY:
+            return self._get_applied_seq()
+        meta = getattr(self._local, 'meta', None)
+        if meta is not None:
+            return meta.get(key)
+        with self._reading():
+            return self._load_meta().get(key)
+
+    def set_meta(self, key: str, value: str) -> None:
+        if key == APPLIED_SEQ_KEY:
+            with self.transaction():
+                self._local.applied_seq = int(value)
+            return
+        with self.transaction():
+            if self._local.meta is None:
+                self._local.meta = self._load_meta()
+            self._local.meta[key] = value
+
+    def _get_applied_seq(self) -> str | None:
+        # Kept in the counter file header so it is written together with the counters it accounts for
+        pending = getattr(self._local, 'applied_seq', None)
+        if pending is not None:
+            return str(pending)
+        with self._reading():
+            applied = self.counters.applied_seq()
+            # Installs from before this lived in the counter file still have it in users.json.meta
+            return str(applied) if applied else self._load_meta().get(APPLIED_SEQ_KEY)
+
+    def users_not_offline(self) -> set[str]:
+        # Statuses live in the counter file, so users.json records are not merged for this
+        with self._reading():
+            data = self._data()
+            counters = self.counters.read_all()
+            if self._in_transaction():
+                counters.update(self._local.counters)
+            return {username for username, record in data.items()
+                    if (counters.get(username) or record).get('status') != 'Offline'}
+
+    def watched_paths(self) -> tuple[str, ...]:
+        return (self.path,)
+
+    def change_stamp(self) -> tuple:
+        # Counter writes go through mmap and may not touch the file's mtime; the header version does move
+        return file_stamp(self.path) + (self.counters.version(),)
+
+    def profile_revision(self) -> tuple:
+        return file_stamp(self.path)
+
+    def iterate(self) -> Iterator[tuple[str, dict[str, Any]]]:
+        # Both files are read under one lock, but records are only merged as they are consumed
+        with self._reading():
+            data = self._data()
+            counters = self.counters.read_all()
+            if self._in_transaction():
+                counters.update(self._local.counters)
+            items = list(data.items())
+        for username, record in items:
+            yield username, self._merged(record, counters.get(username))
@@ -0,0 +1,140 @@
+import bisect
+import datetime
+import threading
+import time
+from typing import Any
+
+from .base import UserStore
+
+SORT_KEYS = ('username', 'usage', 'expiry', 'status')
+STATUS_FILTERS = ('online', 'offline', 'inactive')
+# Online users first, then offline ones, then anything else (Not Active, On-hold, ...)
+STATUS_RANK = {'Online': 0, 'Offline': 1}
+
+
+def expiry_timestamp(record: dict[str, Any]) -> float | None:
+    """Unix time a user's plan ends, or None if it has no end date."""
+    days = record.get('expiration_days') or 0
+    creation_date = record.get('account_creation_date')
+    if days <= 0 or not creation_date:
+        return None
+    try:
+        created = datetime.datetime.fromisoformat(creation_date.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    return (created + datetime.timedelta(days=days)).timestamp()
+
+
+class UserListIndex:
+    """
+    Pre-sorted views of the user list for paging, sorting and filtering.
+
+    On rebuild every user is read once and one username order is kept per
+    sort key, with usage, expiry and status rank computed up front. A page
+    request then walks the order for its sort key, applies the filters and
+    slices, without sorting or touching the store; a name prefix is a
+    bisect into the username order. The index refreshes itself whenever the
+    store's change stamp moves, so it is never staler than the store; the
+    username and expiry orders are only rebuilt when the profile revision
+    moves too, since a traffic tick changes just usage and status.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp: tuple | None = None
+        self._revision: Any = None
+        self._records: dict[str, dict[str, Any]] = {}
+        self._expiry: dict[str, float | None] = {}
+        self._orders: dict[str, list[str]] = {}
+        self._folded: list[str] = []
+
+    def _rebuild(self, store: UserStore) -> None:
+        stamp = store.change_stamp()
+        revision = store.profile_revision()
+        records = store.all()
+        # A rename keeps the revision check honest even if it landed between the two reads
+        if not self._orders or revision != self._revision or records.keys() != self._records.keys():
+            self._expiry = {username: expiry_timestamp(record) for username, record in records.items()}
+            by_name = sorted(records, key=lambda username: (username.lower(), username))
+            self._orders = {
+                'username': by_name,
+                # Users without an end date sort after every dated one
+                'expiry': sorted(by_name, key=lambda username: (self._expiry[username] is None,
+                                                                self._expiry[username] or 0)),
+            }
+            self._folded = [username.lower() for username in by_name]
+            self._revision = revision
+
+        by_name = self._orders['username']
+        usage = {username: (record.get('upload_bytes') or 0) + (record.get('download_bytes') or 0)
+                 for username, record in records.items()}
+        self._orders['usage'] = sorted(by_name, key=usage.__getitem__)
+        ranks: list[list[str]] = [[] for _ in range(len(STATUS_RANK) + 1)]
+        for username in by_name:
+            ranks[STATUS_RANK.get(records[username].get('status'), len(STATUS_RANK))].append(username)
+        self._orders['status'] = [username for rank in ranks for username in rank]
+        self._records = records
+        self._stamp = stamp
+
+    def _matches(self, username: str, blocked: bool | None, status: str | None,
+                 expires_before: float | None, now: float) -> bool:
+        record = self._records[username]
+        if blocked is not None and bool(record.get('blocked', False)) != blocked:
+            return False
+        if status is not None:
+            user_status = record.get('status')
+            if status == 'online' and user_status != 'Online':
+                return False
+            if status == 'offline' and user_status != 'Offline':
+                return False
+            if status == 'inactive' and user_status in STATUS_RANK:
+                return False
+        if expires_before is not None:
+            expires_at = self._expiry[username]
+            if expires_at is None or not now <= expires_at <= expires_before:
+                return False
+        return True
+
+    def query(self, store: UserStore, offset: int = 0, limit: int = 50, sort: str = 'username',
+              descending: bool = False, blocked: bool | None = None, status: str | None = None,
+              expiring_within_days: int | None = None, prefix: str | None = None,
+              now: float | None = None) -> tuple[int, list[tuple[str, dict[str, Any]]]]:
+        """
+        Returns the number of matching users and the requested page of (username, record) pairs.
+
+        status is one of STATUS_FILTERS ('inactive' means neither online nor
+        offline); expiring_within_days keeps users whose plan ends between now
+        and that many days from now; prefix matches usernames case-insensitively.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{sort}'. Expected one of: {', '.join(SORT_KEYS)}")
+        if status is not None and status not in STATUS_FILTERS:
+            raise ValueError(f"Unknown status filter '{status}'. Expected one of: {', '.join(STATUS_FILTERS)}")
+        if offset < 0 or limit < 0:
+            raise ValueError("offset and limit must not be negative.")
+        now = time.time() if now is None else now
+        expires_before = now + expiring_within_days * 86400 if expiring_within_days is not None else None
+
+        with self._lock:
+            if self._stamp is None or self._stamp != store.change_stamp():
+                self._rebuild(store)
+
+            order = self._orders[sort]
+            if prefix:
+                prefix = prefix.lower()
+                start = bisect.bisect_left(self._folded, prefix)
+                end = bisect.bisect_right(self._folded, prefix + '\uffff')
+                named = set(self._orders['username'][start:end])
+                order = [username for username in order if username in named] if sort != 'username' \
+                    else self._orders['username'][start:end]
+            if descending:
+                order = order[::-1]
+
+            if blocked is None and status is None and expires_before is None:
+                matching = order
+            else:
+                matching = [username for username in order
+                            if self._matches(username, blocked, status, expires_before, now)]
+
+            page = [(username, dict(self._records[username])) for username in matching[offset:offset + limit]]
+            return len(matching), page
@@ -0,0 +1,50 @@
+import os
+import json
+from typing import Any
+
+from .base import UserStore, UserStoreError
+
+
+def load_users_json(path: str) -> dict[str, dict[str, Any]]:
+    """Reads a users.json file, returning an empty dict if it does not exist."""
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise UserStoreError(f"{path} contains invalid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise UserStoreError(f"{path} does not contain a JSON object of users.")
+    return data
+
+
+def import_json(store: UserStore, path: str, replace: bool = False) -> int:
+    """
+    Loads every user from a users.json file into the store in one transaction.
+
+    With replace=True users that are missing from the file are removed, which
+    is what a restore from backup expects.
+    """
+    users = load_users_json(path)
+    with store.transaction():
+        if replace:
+            for username in [name for name, _ in store.iterate() if name not in users]:
+                store.delete(username)
+        for username, record in users.items():
+            store.put(username, record)
+    return len(users)
+
+
+def migrate_json_to_store(json_path: str, store: UserStore) -> int:
+    """
+    One-shot migration of the legacy users.json into a fresh store.
+
+    The JSON file is renamed to users.json.migrated afterwards so nothing keeps
+    reading stale data from it; use export_json() to get a JSON copy back.
+    """
+    if not os.path.isfile(json_path):
+        return 0
+    count = import_json(store, json_path)
+    os.replace(json_path, f"{json_path}.migrated")
+    return count
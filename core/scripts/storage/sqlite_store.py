@@ -0,0 +1,232 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from .base import USER_FIELDS, UserStore, UserStoreError
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT,
+    max_download_bytes INTEGER,
+    expiration_days INTEGER,
+    account_creation_date TEXT,
+    blocked INTEGER,
+    upload_bytes INTEGER,
+    download_bytes INTEGER,
+    status TEXT
+)
+'''
+
+META_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+)
+'''
+
+# Bumped by triggers whenever a field that decides expiry, quota or the subscription token
+# changes, including writes made outside Python (user.sh blocks users with the sqlite3 CLI)
+PROFILE_REVISION_KEY = 'profile_revision'
+_BUMP_PROFILE_REVISION = f'''
+    INSERT INTO meta (key, value) VALUES ('{PROFILE_REVISION_KEY}', 1)
+    ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+'''
+PROFILE_TRIGGERS = (
+    f'CREATE TRIGGER IF NOT EXISTS users_profile_insert AFTER INSERT ON users BEGIN {_BUMP_PROFILE_REVISION} END',
+    f'CREATE TRIGGER IF NOT EXISTS users_profile_delete AFTER DELETE ON users BEGIN {_BUMP_PROFILE_REVISION} END',
+    'CREATE TRIGGER IF NOT EXISTS users_profile_update_v2 AFTER UPDATE OF '
+    'username, password, max_download_bytes, expiration_days, account_creation_date, blocked '
+    f'ON users BEGIN {_BUMP_PROFILE_REVISION} END',
+    # Replaced by users_profile_update_v2, which also watches the password
+    'DROP TRIGGER IF EXISTS users_profile_update',
+)
+
+# Keeps the users the traffic tick has to look at (see users_not_offline) small to find
+NOT_OFFLINE_INDEX = "CREATE INDEX IF NOT EXISTS users_not_offline ON users(username) WHERE status IS NOT 'Offline'"
+
+BUSY_TIMEOUT_MS = 5000
+
+
+def _to_row(record: dict[str, Any]) -> list[Any]:
+    row = []
+    for field in USER_FIELDS:
+        value = record.get(field)
+        if field == 'blocked' and value is not None:
+            value = int(bool(value))
+        row.append(value)
+    return row
+
+
+def _from_row(row: sqlite3.Row) -> dict[str, Any]:
+    record = {}
+    for field in USER_FIELDS:
+        value = row[field]
+        if value is None:
+            continue
+        if field == 'blocked':
+            value = bool(value)
+        record[field] = value
+    return record
+
+
+class SqliteUserStore(UserStore):
+    """
+    User store backed by a single SQLite database in WAL mode.
+
+    Every mutation touches only the affected row, and readers never block the
+    writer (the scheduler, the panel and the auth hook can all work at once).
+    Connections are kept per thread because sqlite3 objects must not be shared.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+            conn.execute(META_SCHEMA)
+            for trigger in PROFILE_TRIGGERS:
+                conn.execute(trigger)
+            conn.execute(NOT_OFFLINE_INDEX)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+                conn.row_factory = sqlite3.Row
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+                conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+            except sqlite3.Error as e:
+                raise UserStoreError(f"Could not open user database {self.path}: {e}") from e
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    def _execute(self, sql: str, params: tuple | list = ()) -> sqlite3.Cursor:
+        try:
+            return self._connect().execute(sql, params)
+        except sqlite3.Error as e:
+            raise UserStoreError(f"User database error: {e}") from e
+
+    @contextmanager
+    def transaction(self) -> Iterator['SqliteUserStore']:
+        self._connect()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield self
+            finally:
+                self._local.depth -= 1
+            return
+
+        self._execute('BEGIN IMMEDIATE')
+        self._local.depth = 1
+        try:
+            yield self
+        except BaseException:
+            self._local.depth = 0
+            self._execute('ROLLBACK')
+            raise
+        self._local.depth = 0
+        self._execute('COMMIT')
+
+    def get(self, username: str) -> dict[str, Any] | None:
+        row = self._execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+        return _from_row(row) if row else None
+
+    def put(self, username: str, record: dict[str, Any]) -> None:
+        # Upsert rather than REPLACE so an existing user keeps its position in listings
+        columns = ', '.join(('username',) + USER_FIELDS)
+        placeholders = ', '.join('?' * (len(USER_FIELDS) + 1))
+        updates = ', '.join(f'{field} = excluded.{field}' for field in USER_FIELDS)
+        self._execute(f'INSERT INTO users ({columns}) VALUES ({placeholders}) '
+                      f'ON CONFLICT(username) DO UPDATE SET {updates}',
+                      [username] + _to_row(record))
+
+    def patch(self, username: str, fields: dict[str, Any]) -> bool:
+        fields = {key: value for key, value in fields.items() if key in USER_FIELDS}
+        if not fields:
+            return self.get(username) is not None
+        if 'blocked' in fields and fields['blocked'] is not None:
+            fields['blocked'] = int(bool(fields['blocked']))
+        assignments = ', '.join(f'{key} = ?' for key in fields)
+        cursor = self._execute(f'UPDATE users SET {assignments} WHERE username = ?',
+                               list(fields.values()) + [username])
+        return cursor.rowcount > 0
+
+    def add_usage(self, username: str, upload_bytes: int, download_bytes: int) -> bool:
+        cursor = self._execute('UPDATE users SET upload_bytes = COALESCE(upload_bytes, 0) + ?, '
+                               'download_bytes = COALESCE(download_bytes, 0) + ? WHERE username = ?',
+                               (upload_bytes, download_bytes, username))
+        return cursor.rowcount > 0
+
+    def delete(self, username: str) -> bool:
+        return self._execute('DELETE FROM users WHERE username = ?', (username,)).rowcount > 0
+
+    def rename(self, username: str, new_username: str) -> bool:
+        if username == new_username:
+            return self.get(username) is not None
+        with self.transaction():
+            if self.get(username) is None:
+                return False
+            self._execute('DELETE FROM users WHERE username = ?', (new_username,))
+            self._execute('UPDATE users SET username = ? WHERE username = ?', (new_username, username))
+            return True
+
+    def iterate(self) -> Iterator[tuple[str, dict[str, Any]]]:
+        for row in self._execute('SELECT * FROM users ORDER BY rowid'):
+            yield row['username'], _from_row(row)
+
+    def iter_batches(self, size: int = 500) -> Iterator[list[tuple[str, dict[str, Any]]]]:
+        # One query per batch, continuing after the last rowid, so no cursor stays open between batches
+        last_rowid = 0
+        while True:
+            rows = self._execute('SELECT rowid, * FROM users WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                                 (last_rowid, size)).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1]['rowid']
+            yield [(row['username'], _from_row(row)) for row in rows]
+
+    def users_not_offline(self) -> set[str]:
+        rows = self._execute("SELECT username FROM users WHERE status IS NOT 'Offline'")
+        return {row['username'] for row in rows}
+
+    def exists(self, username: str, ignore_case: bool = False) -> bool:
+        if ignore_case:
+            sql = 'SELECT 1 FROM users WHERE lower(username) = lower(?)'
+        else:
+            sql = 'SELECT 1 FROM users WHERE username = ?'
+        return self._execute(sql, (username,)).fetchone() is not None
+
+    def get_meta(self, key: str) -> str | None:
+        row = self._execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self._execute('INSERT INTO meta (key, value) VALUES (?, ?) '
+                      'ON CONFLICT(key) DO UPDATE SET value = excluded.value', (key, value))
+
+    def profile_revision(self) -> str | None:
+        return self.get_meta(PROFILE_REVISION_KEY)
+
+    def watched_paths(self) -> tuple[str, ...]:
+        # Commits land in the WAL first and reach the main file on checkpoint
+        return (self.path, f"{self.path}-wal")
+
+    def count(self) -> int:
+        return self._execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def traffic_totals(self) -> tuple[int, int]:
+        row = self._execute('SELECT COALESCE(SUM(upload_bytes), 0), COALESCE(SUM(download_bytes), 0) '
+                            'FROM users').fetchone()
+        return row[0], row[1]
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
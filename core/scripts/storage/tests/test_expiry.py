@@ -0,0 +1,73 @@
+import datetime
+
+from storage import APPLIED_SEQ_KEY, ExpiryIndex, should_block
+
+GB = 1024 ** 3
+CREATED = '2024-01-01'
+EXPIRES_AT = datetime.datetime(2024, 1, 31).timestamp()
+
+
+def user(**fields):
+    return dict({'password': 'secret', 'max_download_bytes': GB, 'expiration_days': 30,
+                 'account_creation_date': CREATED, 'blocked': False}, **fields)
+
+
+def test_should_block():
+    assert not should_block(user(), EXPIRES_AT - 1)
+    assert should_block(user(), EXPIRES_AT)
+    assert should_block(user(upload_bytes=GB // 2, download_bytes=GB // 2), EXPIRES_AT - 1)
+    assert not should_block(user(blocked=True), EXPIRES_AT)
+    assert not should_block(user(expiration_days=0), EXPIRES_AT + 86400 * 365)
+    assert not should_block(user(max_download_bytes=0, download_bytes=GB), EXPIRES_AT - 1)
+    assert not should_block(None, EXPIRES_AT)
+
+
+def test_candidates(store):
+    store.put_many({
+        'fresh': user(),
+        'used_up': user(download_bytes=GB),
+        'never_expires': user(expiration_days=0),
+        'late': user(expiration_days=60),
+    })
+    index = ExpiryIndex()
+    with store.transaction():
+        index.rebuild(store)
+
+    assert index.candidates(EXPIRES_AT - 1) == {'used_up'}
+    assert index.candidates(EXPIRES_AT) == {'used_up', 'fresh'}
+
+
+def test_record_usage_tracks_remaining_quota(store):
+    store.put('alice', user())
+    store.set_meta(APPLIED_SEQ_KEY, '1')
+    index = ExpiryIndex()
+    with store.transaction():
+        index.rebuild(store)
+
+    index.record_usage({'alice': [GB // 2, 0]}, '1', '2')
+    assert index.candidates(0) == set()
+    index.record_usage({'alice': [0, GB // 2]}, '2', '3')
+    assert index.candidates(0) == {'alice'}
+
+
+def test_missed_traffic_invalidates(store):
+    store.put('alice', user())
+    store.set_meta(APPLIED_SEQ_KEY, '1')
+    index = ExpiryIndex()
+    with store.transaction():
+        index.rebuild(store)
+
+    store.set_meta(APPLIED_SEQ_KEY, '3')
+    index.record_usage({'alice': [1, 1]}, '2', '3')
+    assert not index.is_current(store)
+
+
+def test_profile_change_makes_index_stale(store):
+    store.put('alice', user())
+    index = ExpiryIndex()
+    with store.transaction():
+        index.rebuild(store)
+    assert index.is_current(store)
+
+    store.patch('alice', {'expiration_days': 90})
+    assert not index.is_current(store)
@@ -0,0 +1,43 @@
+import json
+import datetime
+
+import pytest
+
+from storage import EXPORT_FIELDS, export_chunks, parse_export_fields
+
+
+@pytest.fixture
+def users(store):
+    store.put_many({f'user{i}': {'password': str(i), 'max_download_bytes': 100, 'expiration_days': 30,
+                                 'account_creation_date': '2024-01-01', 'upload_bytes': i, 'download_bytes': i}
+                    for i in range(5)})
+    return store
+
+
+def test_ndjson_one_user_per_line(users):
+    lines = b''.join(export_chunks(users, 'ndjson', batch_size=2)).decode().splitlines()
+
+    records = [json.loads(line) for line in lines]
+    assert [record['username'] for record in records] == [f'user{i}' for i in range(5)]
+    assert set(records[0]) == set(EXPORT_FIELDS)
+
+
+def test_json_array_with_projection(users):
+    fields = parse_export_fields('username, usage_bytes,expires_at')
+    records = json.loads(b''.join(export_chunks(users, 'json', fields, batch_size=2)))
+
+    assert records[3] == {'username': 'user3', 'usage_bytes': 6,
+                          'expires_at': int(datetime.datetime(2024, 1, 31).timestamp())}
+
+
+def test_empty_store_is_an_empty_array(store):
+    assert json.loads(b''.join(export_chunks(store, 'json'))) == []
+    assert b''.join(export_chunks(store, 'ndjson')) == b''
+
+
+def test_bad_fields_and_format():
+    assert parse_export_fields(None) == EXPORT_FIELDS
+    with pytest.raises(ValueError):
+        parse_export_fields('username,nope')
+    with pytest.raises(ValueError):
+        export_chunks(None, 'csv')
@@ -0,0 +1,48 @@
+from storage import APPLIED_SEQ_KEY, TrafficJournal
+
+
+def test_compact_applies_pending_entries_once(store, tmp_path):
+    store.put('alice', {'password': 'secret', 'upload_bytes': 1, 'download_bytes': 1})
+    journal = TrafficJournal(str(tmp_path / 'traffic.journal'), store)
+
+    with journal.locked():
+        journal.append({'alice': (10, 20), 'bob': (1, 2)})
+        journal.append({'alice': (5, 5)})
+        assert journal.compact() == {'alice': [15, 25], 'bob': [1, 2]}
+
+    assert (store.get('alice')['upload_bytes'], store.get('alice')['download_bytes']) == (16, 26)
+    assert store.get('bob')['download_bytes'] == 2
+    assert store.get_meta(APPLIED_SEQ_KEY) == '2'
+    assert journal.entries() == []
+
+    with journal.locked():
+        assert journal.compact() == {}
+    assert store.get('alice')['upload_bytes'] == 16
+
+
+def test_entries_already_applied_are_skipped(store, tmp_path):
+    store.put('alice', {'password': 'secret'})
+    journal = TrafficJournal(str(tmp_path / 'traffic.journal'), store)
+
+    with journal.locked():
+        journal.append({'alice': (10, 20)})
+        store.add_usage('alice', 10, 20)
+        store.set_meta(APPLIED_SEQ_KEY, '1')
+        # As if the store write committed but the journal was not truncated
+        assert journal.compact() == {}
+        assert journal.append({'alice': (1, 1)}) == 2
+
+    assert store.get('alice')['upload_bytes'] == 10
+
+
+def test_torn_line_is_ignored(store, tmp_path):
+    path = tmp_path / 'traffic.journal'
+    journal = TrafficJournal(str(path), store)
+
+    with journal.locked():
+        journal.append({'alice': (1, 1)})
+        with open(path, 'a') as f:
+            f.write('{"seq": 2, "users": {"alice"')
+        journal.append({'alice': (2, 2)})
+
+    assert [entry['seq'] for entry in journal.entries()] == [1, 2]
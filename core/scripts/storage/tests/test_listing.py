@@ -0,0 +1,33 @@
+from storage import UserListIndex
+
+
+def names(page):
+    return [username for username, _ in page]
+
+
+def test_sorting_filtering_and_refresh(store):
+    store.put_many({
+        'carol': {'password': '1', 'expiration_days': 10, 'account_creation_date': '2024-01-01',
+                  'upload_bytes': 5, 'status': 'Offline'},
+        'alice': {'password': '2', 'expiration_days': 0, 'account_creation_date': '2024-01-01',
+                  'upload_bytes': 1, 'status': 'Online'},
+        'bob': {'password': '3', 'expiration_days': 5, 'account_creation_date': '2024-01-01',
+                'upload_bytes': 3, 'blocked': True},
+    })
+    index = UserListIndex()
+
+    assert names(index.query(store)[1]) == ['alice', 'bob', 'carol']
+    assert names(index.query(store, sort='usage', descending=True)[1]) == ['carol', 'bob', 'alice']
+    assert names(index.query(store, sort='expiry')[1]) == ['bob', 'carol', 'alice']
+    assert names(index.query(store, sort='status')[1]) == ['alice', 'carol', 'bob']
+    assert index.query(store, blocked=True, limit=0) == (1, [])
+    assert names(index.query(store, prefix='CA')[1]) == ['carol']
+
+    # A traffic tick changes usage and status only
+    store.add_usage('alice', 100, 0)
+    store.patch('carol', {'status': 'Online'})
+    assert names(index.query(store, sort='usage')[1]) == ['bob', 'carol', 'alice']
+    assert names(index.query(store, status='online')[1]) == ['alice', 'carol']
+
+    store.rename('alice', 'dave')
+    assert names(index.query(store)[1]) == ['bob', 'carol', 'dave']
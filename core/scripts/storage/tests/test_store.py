@@ -0,0 +1,97 @@
+import pytest
+
+from storage import JsonUserStore, UserStoreError, MAX_USERNAME_BYTES
+
+ALICE = {'password': 'secret', 'max_download_bytes': 1024, 'expiration_days': 30,
+         'account_creation_date': '2024-01-01', 'blocked': False}
+
+
+def test_put_get_patch_delete(store):
+    store.put('alice', ALICE)
+    assert store.get('alice') == ALICE
+
+    assert store.patch('alice', {'blocked': True, 'upload_bytes': 5})
+    assert store.get('alice')['blocked'] is True
+    assert store.get('alice')['upload_bytes'] == 5
+
+    assert store.delete('alice')
+    assert store.get('alice') is None
+    assert not store.patch('alice', {'blocked': False})
+    assert not store.delete('alice')
+
+
+def test_rename_keeps_counters(store):
+    store.put('alice', dict(ALICE, upload_bytes=7, download_bytes=9))
+
+    assert store.rename('alice', 'bob')
+    assert store.get('alice') is None
+    assert store.get('bob')['upload_bytes'] == 7
+    assert store.get('bob')['download_bytes'] == 9
+
+
+def test_failed_transaction_changes_nothing(store):
+    store.put('alice', ALICE)
+
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.patch('alice', {'blocked': True})
+            store.add_usage('alice', 10, 20)
+            store.put('bob', ALICE)
+            raise RuntimeError
+
+    assert store.get('alice') == ALICE
+    assert store.get('bob') is None
+
+
+def test_add_usage(store):
+    store.put('alice', ALICE)
+
+    assert store.add_usage('alice', 10, 20)
+    assert store.add_usage('alice', 1, 2)
+    assert not store.add_usage('missing', 1, 2)
+    record = store.get('alice')
+    assert (record['upload_bytes'], record['download_bytes']) == (11, 22)
+
+
+def test_profile_revision_ignores_traffic(store):
+    store.put('alice', ALICE)
+    revision = store.profile_revision()
+
+    store.add_usage('alice', 10, 20)
+    store.patch('alice', {'status': 'Online'})
+    assert store.profile_revision() == revision
+
+    store.patch('alice', {'password': 'renewed'})
+    assert store.profile_revision() != revision
+
+
+def test_users_not_offline(store):
+    store.put_many({
+        'online': dict(ALICE, status='Online'),
+        'offline': dict(ALICE, status='Offline'),
+        'new': ALICE,
+    })
+
+    assert store.users_not_offline() == {'new', 'online'}
+
+
+def test_json_long_names_keep_counters_in_users_json(tmp_path):
+    store = JsonUserStore(str(tmp_path / 'users.json'))
+    long_name = 'a' * (MAX_USERNAME_BYTES + 1)
+
+    store.put(long_name, dict(ALICE, upload_bytes=3))
+    store.add_usage(long_name, 1, 1)
+
+    assert store.get(long_name)['upload_bytes'] == 4
+    assert store.counters.read(long_name) is None
+
+
+def test_json_rejected_counter_update_writes_nothing(tmp_path):
+    store = JsonUserStore(str(tmp_path / 'users.json'))
+    store.put('alice', ALICE)
+
+    with pytest.raises(UserStoreError):
+        store.put('bob', dict(ALICE, status='x' * 100))
+
+    assert store.get('bob') is None
+    assert store.get('alice') == ALICE
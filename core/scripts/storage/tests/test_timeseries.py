@@ -0,0 +1,88 @@
+import pytest
+
+from storage import TrafficSeries, TrafficSeriesError
+from storage.timeseries import RESOLUTIONS
+
+NOW = 1_700_000_040
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'traffic_series.bin')
+
+
+def totals(series, username, start, end, step=None):
+    result = series.query(username, start, end, step)
+    return [(point['timestamp'] - NOW, point['upload_bytes'], point['download_bytes'])
+            for point in result['points'] if point['upload_bytes'] or point['download_bytes']]
+
+
+@pytest.fixture(autouse=True)
+def frozen_time(monkeypatch):
+    monkeypatch.setattr('storage.timeseries.time.time', lambda: NOW + 600)
+
+
+def test_record_and_query(path):
+    writer = TrafficSeries(path, writable=True)
+    writer.record({'alice': (1, 2), 'bob': (5, 5)}, NOW)
+    writer.record({'alice': (3, 4)}, NOW + 30)
+    writer.record({'alice': (10, 10)}, NOW + 120)
+
+    reader = TrafficSeries(path)
+    assert totals(reader, 'alice', NOW - 60, NOW + 180) == [(0, 4, 6), (120, 10, 10)]
+    assert totals(reader, 'alice', NOW - 60, NOW + 180, step=600) == [(-240, 14, 16)]
+    assert totals(reader, 'nobody', NOW - 60, NOW + 180) == []
+
+
+def test_ring_forgets_a_lap_old_bucket(path):
+    writer = TrafficSeries(path, writable=True)
+    _, step, buckets = RESOLUTIONS[0]
+    writer.record({'alice': (1, 1)}, NOW - buckets * step)
+    writer.record({'alice': (2, 2)}, NOW)
+
+    ring = writer._ring_offset(writer._slots['alice'], 0)
+    offset = writer._bucket_offset(ring, 0, NOW // step)
+    assert writer._map[offset:offset + 16] == (2).to_bytes(8, 'little') * 2
+
+
+def test_reused_slot_is_not_read_as_the_old_user(path):
+    reader = TrafficSeries(path)
+    TrafficSeries(path, writable=True).record({'alice': (1, 1)}, NOW)
+    assert totals(reader, 'alice', NOW - 60, NOW + 60) == [(0, 1, 1)]
+
+    # Another process frees alice's slot and hands it to a new user
+    other = TrafficSeries(path, writable=True)
+    other.remove('alice')
+    other.record({'mallory': (9, 9)}, NOW)
+
+    assert totals(reader, 'alice', NOW - 60, NOW + 60) == []
+    assert totals(reader, 'mallory', NOW - 60, NOW + 60) == [(0, 9, 9)]
+
+
+def test_rename_moves_history(path):
+    writer = TrafficSeries(path, writable=True)
+    writer.record({'alice': (1, 1)}, NOW)
+
+    assert TrafficSeries(path, writable=True).rename('alice', 'bob')
+    writer.record({'bob': (2, 2)}, NOW)
+
+    assert totals(writer, 'bob', NOW - 60, NOW + 60) == [(0, 3, 3)]
+    assert totals(writer, 'alice', NOW - 60, NOW + 60) == []
+
+
+def test_grows_past_initial_capacity(path):
+    writer = TrafficSeries(path, writable=True)
+    writer.record({f'user{i}': (i, i) for i in range(200)}, NOW)
+
+    reader = TrafficSeries(path)
+    assert totals(reader, 'user199', NOW - 60, NOW + 60) == [(0, 199, 199)]
+
+
+def test_bad_queries(path):
+    series = TrafficSeries(path)
+    with pytest.raises(TrafficSeriesError):
+        series.query('alice', NOW, NOW)
+    with pytest.raises(TrafficSeriesError):
+        series.query('alice', NOW - 86400 * 3000, NOW)
+    with pytest.raises(TrafficSeriesError):
+        series.record({'alice': (1, 1)})
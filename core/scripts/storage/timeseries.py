@@ -0,0 +1,317 @@
+import os
+import mmap
+import time
+import struct
+import threading
+from typing import Any
+
+from .fileio import file_lock
+
+MAGIC = b'HYTRAF02'
+# magic, slot capacity, slot generation (bumped when a slot is taken, renamed or freed),
+# then the bucket count of each resolution (must match RESOLUTIONS)
+HEADER = struct.Struct('<8sIIIII')
+HEADER_SIZE = 64
+NAME_SIZE = 64
+# Latest period number (timestamp // step) recorded in a resolution's ring; 0 if none yet
+HEAD = struct.Struct('<q')
+# upload bytes, download bytes
+BUCKET = struct.Struct('<QQ')
+
+# (name, step in seconds, buckets kept): 6 hours of minutes, 14 days of hours, ~13 months of days.
+# A user's slot is 64 + 3 * 8 + 1096 * 16 = 17,624 bytes, about 168 MiB for 10,000 users.
+RESOLUTIONS = (
+    ('minute', 60, 360),
+    ('hour', 3600, 336),
+    ('day', 86400, 400),
+)
+INITIAL_CAPACITY = 64
+MAX_POINTS = 2000
+
+
+class TrafficSeriesError(Exception):
+    """Raised for unusable time-series files or queries."""
+    pass
+
+
+class TrafficSeries:
+    """
+    Fixed-size per-user traffic history in a single memory-mapped file.
+
+    Each user owns one slot holding a ring buffer per resolution. A bucket is
+    addressed by period % buckets, and each ring remembers only the latest
+    period written to it: buckets between that head and a newer period are
+    cleared as the ring moves forward, so nothing ever has to be pruned and
+    the buckets carry no period of their own. Memory per user is fixed (see
+    RESOLUTIONS); the file only grows (by doubling) when it runs out of slots.
+
+    Readers map the file read-only and unpack just the buckets they need.
+    traffic.py records each tick; removing or renaming a user frees or
+    relabels its slot. Those run in different processes (the scheduler, the
+    panel, the CLI), so every write holds an exclusive lock on the file's
+    .lock companion as well as the in-process one. Like CounterFile, each
+    process caches the name -> slot map and rescans only when the slot
+    generation in the header moves; readers also check the name stored in a
+    slot before trusting it.
+    """
+
+    def __init__(self, path: str, writable: bool = False):
+        self.path = str(path)
+        self.writable = writable
+        self.lock_path = f"{self.path}.lock"
+        self._lock = threading.Lock()
+        self._file = None
+        self._map: mmap.mmap | None = None
+        self._capacity = 0
+        self._generation = -1
+        self._slots: dict[str, int] = {}
+        # Unused slots, lowest last, so pop() fills the file from the front
+        self._free: list[int] = []
+        self._ring_offsets = []
+        offset = NAME_SIZE
+        for _, _, buckets in RESOLUTIONS:
+            self._ring_offsets.append(offset)
+            offset += HEAD.size + buckets * BUCKET.size
+        self._slot_size = offset
+
+    def _file_size(self, capacity: int) -> int:
+        return HEADER_SIZE + capacity * self._slot_size
+
+    def _open(self) -> None:
+        if self._map is not None:
+            if os.fstat(self._file.fileno()).st_size == len(self._map):
+                return
+            # The writer grew the file; map it again
+            self.close()
+
+        if not os.path.exists(self.path):
+            if not self.writable:
+                raise FileNotFoundError(self.path)
+            with open(self.path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, INITIAL_CAPACITY, 0, *(buckets for _, _, buckets in RESOLUTIONS)))
+                f.truncate(self._file_size(INITIAL_CAPACITY))
+
+        self._file = open(self.path, 'r+b' if self.writable else 'rb')
+        access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ
+        self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+
+        magic, capacity, _, *buckets = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or tuple(buckets) != tuple(n for _, _, n in RESOLUTIONS):
+            self.close()
+            raise TrafficSeriesError(f"{self.path} is not a traffic series file of this version.")
+        if len(self._map) < self._file_size(capacity):
+            self.close()
+            raise TrafficSeriesError(f"{self.path} is truncated.")
+        self._capacity = capacity
+        self._generation = -1
+
+    def _refresh_slots(self, force: bool = False) -> None:
+        generation = HEADER.unpack_from(self._map, 0)[2]
+        if generation == self._generation and not force:
+            return
+        self._slots = {}
+        self._free = []
+        for slot in range(self._capacity - 1, -1, -1):
+            name = self._read_name(slot)
+            if name:
+                self._slots[name] = slot
+            else:
+                self._free.append(slot)
+        self._generation = generation
+
+    def _bump_generation(self) -> None:
+        magic, capacity, generation, *buckets = HEADER.unpack_from(self._map, 0)
+        self._generation = (generation + 1) & 0xFFFFFFFF
+        HEADER.pack_into(self._map, 0, magic, capacity, self._generation, *buckets)
+
+    def _grow(self) -> None:
+        old_capacity = self._capacity
+        capacity = old_capacity * 2
+        self._file.truncate(self._file_size(capacity))
+        self._map.resize(self._file_size(capacity))
+        _, _, generation, *buckets = HEADER.unpack_from(self._map, 0)
+        HEADER.pack_into(self._map, 0, MAGIC, capacity, generation, *buckets)
+        self._capacity = capacity
+        self._free.extend(range(capacity - 1, old_capacity - 1, -1))
+
+    def _allocate(self, username: str) -> int:
+        if len(username.encode()) > NAME_SIZE:
+            raise TrafficSeriesError(f"Username '{username}' is too long for the traffic series.")
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        offset = HEADER_SIZE + slot * self._slot_size
+        # Clear any history left by a previous owner of the slot
+        self._map[offset:offset + self._slot_size] = bytes(self._slot_size)
+        self._write_name(slot, username)
+        self._slots[username] = slot
+        return slot
+
+    def _ring_offset(self, slot: int, resolution: int) -> int:
+        return HEADER_SIZE + slot * self._slot_size + self._ring_offsets[resolution]
+
+    def _bucket_offset(self, ring: int, resolution: int, period: int) -> int:
+        return ring + HEAD.size + (period % RESOLUTIONS[resolution][2]) * BUCKET.size
+
+    def _add(self, slot: int, resolution: int, period: int, upload: int, download: int) -> None:
+        buckets = RESOLUTIONS[resolution][2]
+        ring = self._ring_offset(slot, resolution)
+        head = HEAD.unpack_from(self._map, ring)[0]
+        if period > head:
+            # Clear the buckets the ring moves over; they still hold a lap-old period.
+            # A new slot (head 0) is already zeroed by _allocate.
+            if head and period - head >= buckets:
+                start = ring + HEAD.size
+                self._map[start:start + buckets * BUCKET.size] = bytes(buckets * BUCKET.size)
+            elif head:
+                for skipped in range(head + 1, period + 1):
+                    BUCKET.pack_into(self._map, self._bucket_offset(ring, resolution, skipped), 0, 0)
+            HEAD.pack_into(self._map, ring, period)
+        elif period <= head - buckets:
+            # Older than the ring reaches (the clock went back); there is no bucket left for it
+            return
+        offset = self._bucket_offset(ring, resolution, period)
+        stored_upload, stored_download = BUCKET.unpack_from(self._map, offset)
+        BUCKET.pack_into(self._map, offset, stored_upload + upload, stored_download + download)
+
+    def record(self, deltas: dict[str, tuple[int, int]], timestamp: float | None = None) -> None:
+        """Adds one tick of (upload, download) deltas per user to every resolution."""
+        if not self.writable:
+            raise TrafficSeriesError("Traffic series is opened read-only.")
+        timestamp = int(timestamp if timestamp is not None else time.time())
+        with self._lock, file_lock(self.lock_path):
+            self._open()
+            # Other processes may have renamed or removed users since the last tick
+            self._refresh_slots()
+            allocated = False
+            for username, (upload, download) in deltas.items():
+                slot = self._slots.get(username)
+                if slot is None:
+                    slot = self._allocate(username)
+                    allocated = True
+                for resolution, (_, step, _) in enumerate(RESOLUTIONS):
+                    self._add(slot, resolution, timestamp // step, upload, download)
+            if allocated:
+                self._bump_generation()
+            self._map.flush()
+
+    def _read_name(self, slot: int) -> str:
+        offset = HEADER_SIZE + slot * self._slot_size
+        return self._map[offset:offset + NAME_SIZE].rstrip(b'\0').decode()
+
+    def _write_name(self, slot: int, username: str) -> None:
+        offset = HEADER_SIZE + slot * self._slot_size
+        self._map[offset:offset + NAME_SIZE] = username.encode().ljust(NAME_SIZE, b'\0')
+
+    def rename(self, username: str, new_username: str) -> bool:
+        """Moves a user's history to a new name. Returns False if the user has no history."""
+        if len(new_username.encode()) > NAME_SIZE:
+            raise TrafficSeriesError(f"Username '{new_username}' is too long for the traffic series.")
+        if not os.path.exists(self.path):
+            return False
+        with self._lock, file_lock(self.lock_path):
+            self._open()
+            self._refresh_slots()
+            slot = self._slots.pop(username, None)
+            if slot is None:
+                return False
+            stale = self._slots.pop(new_username, None)
+            if stale is not None:
+                self._write_name(stale, '')
+                self._free.append(stale)
+            self._write_name(slot, new_username)
+            self._slots[new_username] = slot
+            self._bump_generation()
+            return True
+
+    def remove(self, username: str) -> bool:
+        """Frees a user's slot. Returns False if the user has no history."""
+        if not os.path.exists(self.path):
+            return False
+        with self._lock, file_lock(self.lock_path):
+            self._open()
+            self._refresh_slots()
+            slot = self._slots.pop(username, None)
+            if slot is None:
+                return False
+            self._write_name(slot, '')
+            self._free.append(slot)
+            self._bump_generation()
+            return True
+
+    def _find_slot(self, username: str) -> int | None:
+        """The user's slot as currently named in the file, rescanning if the cached map went stale."""
+        self._refresh_slots()
+        slot = self._slots.get(username)
+        if slot is None or self._read_name(slot) == username:
+            return slot
+        # The slot was freed or handed to another user since it was cached
+        self._refresh_slots(force=True)
+        return self._slots.get(username)
+
+    @staticmethod
+    def _pick_resolution(start: int, now: int) -> int:
+        """Finest resolution whose retention still reaches back to start."""
+        for resolution, (_, res_step, buckets) in enumerate(RESOLUTIONS):
+            if start >= (now // res_step - buckets + 1) * res_step:
+                return resolution
+        return len(RESOLUTIONS) - 1
+
+    def query(self, username: str, start: int, end: int, step: int | None = None) -> dict[str, Any]:
+        """
+        Returns a user's traffic between start and end (unix seconds) in buckets of step seconds.
+
+        The step is rounded up to a multiple of the resolution the data is read
+        from; points with no traffic are included as zeros.
+        """
+        if end <= start:
+            raise TrafficSeriesError("'to' must be later than 'from'.")
+        if step is not None and step <= 0:
+            raise TrafficSeriesError("'step' must be a positive number of seconds.")
+
+        now = int(time.time())
+        resolution = self._pick_resolution(start, now)
+        name, res_step, buckets = RESOLUTIONS[resolution]
+        step = max(res_step, -(-(step or res_step) // res_step) * res_step)
+
+        first = start // step * step
+        if (end - first) // step + 1 > MAX_POINTS:
+            raise TrafficSeriesError(f"Query would return more than {MAX_POINTS} points; use a larger step.")
+
+        points = {t: [0, 0] for t in range(first, end + 1, step)}
+        with self._lock:
+            try:
+                self._open()
+            except FileNotFoundError:
+                slot = None
+            else:
+                slot = self._find_slot(username)
+
+            if slot is not None:
+                ring = self._ring_offset(slot, resolution)
+                head = HEAD.unpack_from(self._map, ring)[0]
+                oldest = max(now // res_step, head) - buckets + 1
+                for period in range(max(first // res_step, oldest), min(end // res_step, head) + 1):
+                    upload, download = BUCKET.unpack_from(self._map, self._bucket_offset(ring, resolution, period))
+                    point = points.get(period * res_step // step * step)
+                    if point is not None:
+                        point[0] += upload
+                        point[1] += download
+
+        return {
+            'username': username,
+            'resolution': name,
+            'step': step,
+            'points': [
+                {'timestamp': t, 'upload_bytes': upload, 'download_bytes': download}
+                for t, (upload, download) in points.items()
+            ],
+        }
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
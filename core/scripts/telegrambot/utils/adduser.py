@@ -34,22 +34,14 @@ def process_add_user_step1(message):
         bot.register_next_step_handler(message, process_add_user_step1)
         return
 
-    command = f"python3 {CLI_PATH} list-users"
-    result = run_cli_command(command)
-
     try:
-        users_data = json.loads(result)
-        existing_users = {user_key.lower() for user_key in users_data.keys()}
-        if username.lower() in existing_users:
+        if any(user['username'].lower() == username.lower() for user in iter_exported_users("username")):
             bot.reply_to(message, f"Username '{username}' already exists. Please choose a different username:", reply_markup=create_cancel_markup())
             bot.register_next_step_handler(message, process_add_user_step1)
             return
     except json.JSONDecodeError:
-        if "No such file or directory" in result or result.strip() == "" or "Could not find users" in result.lower():
-            pass
-        else:
-            bot.reply_to(message, "Error checking existing users. Please try again.", reply_markup=create_main_markup())
-            return
+        bot.reply_to(message, "Error checking existing users. Please try again.", reply_markup=create_main_markup())
+        return
     
     msg = bot.reply_to(message, "Enter traffic limit (GB):", reply_markup=create_cancel_markup(back_step=process_add_user_step1))
     bot.register_next_step_handler(msg, process_add_user_step2, username)
@@ -22,5 +22,20 @@ def run_cli_command(command):
     except subprocess.CalledProcessError as e:
         return f'Error: {e.output.decode("utf-8")}'
 
+def iter_exported_users(fields):
+    """
+    Yields users from `cli.py export-users` as they are read, each projected to fields (comma-separated).
+    The export is stopped as soon as the caller stops iterating, so finding a few users does not read all of them.
+    """
+    args = ['python3', CLI_PATH, 'export-users', '--format', 'ndjson', '--fields', fields]
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) as proc:
+        try:
+            for line in proc.stdout:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+
 def is_admin(user_id):
     return user_id in ADMIN_USER_IDS
\ No newline at end of file
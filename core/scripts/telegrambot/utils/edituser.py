@@ -25,12 +25,8 @@ def show_user(message):
 def process_show_user(message):
     username = message.text.strip().lower()
     bot.send_chat_action(message.chat.id, 'typing')
-    command = f"python3 {CLI_PATH} list-users"
-    result = run_cli_command(command)
-
     try:
-        users = json.loads(result)
-        existing_users = {user.lower(): user for user in users.keys()}
+        existing_users = {user['username'].lower(): user['username'] for user in iter_exported_users("username")}
 
         if username not in existing_users:
             bot.reply_to(message, f"Username '{message.text.strip()}' does not exist. Please enter a valid username.")
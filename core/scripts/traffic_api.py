@@ -0,0 +1,355 @@
+import json
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from hysteria2_api import Hysteria2Error, Hysteria2AuthError, Hysteria2ConnectionError, TrafficStats, OnlineStatus
+
+from paths import API_BASE_URL, CONFIG_FILE
+
+# Connect and read timeouts in seconds; the API is on loopback, so a slow connect means it is down
+DEFAULT_TIMEOUT = (2.0, 10.0)
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.2
+BACKOFF_MAX = 2.0
+POOL_SIZE = 4
+KICK_BATCH_SIZE = 50
+# Kick batches in flight at once
+KICK_CONCURRENCY = 4
+# Upper bounds of the latency histogram buckets, in milliseconds; anything slower lands in +Inf
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class KickError(Hysteria2Error):
+    """Raised when some kick batches failed; `failed` lists the users that may still be connected."""
+
+    def __init__(self, message: str, failed: List[str]):
+        super().__init__(message)
+        self.failed = failed
+
+
+def read_secret(config_path=CONFIG_FILE) -> str:
+    """
+    Returns trafficStats.secret from the Hysteria2 config.
+
+    Raises:
+        FileNotFoundError: If the config file does not exist.
+        ValueError: If it is not valid JSON or has no secret.
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    traffic_stats = config.get('trafficStats')
+    if not isinstance(traffic_stats, dict) or not traffic_stats.get('secret'):
+        raise ValueError(f"Value for 'trafficStats.secret' not found or is empty in {config_path}")
+    return traffic_stats['secret']
+
+
+class LatencyHistogram:
+    """Request latencies of one endpoint in fixed buckets, plus totals and failure counts."""
+
+    def __init__(self, bounds_ms: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self._lock = threading.Lock()
+        self._bounds = bounds_ms
+        self._counts = [0] * (len(bounds_ms) + 1)
+        self._sum_ms = 0.0
+        self._errors = 0
+        self._retries = 0
+
+    def observe(self, seconds: float, ok: bool = True) -> None:
+        ms = seconds * 1000
+        index = len(self._bounds)
+        for i, bound in enumerate(self._bounds):
+            if ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._sum_ms += ms
+            if not ok:
+                self._errors += 1
+
+    def retried(self) -> None:
+        with self._lock:
+            self._retries += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns cumulative bucket counts keyed by upper bound, Prometheus style."""
+        with self._lock:
+            counts = list(self._counts)
+            total, sum_ms, errors, retries = sum(counts), self._sum_ms, self._errors, self._retries
+        buckets, running = {}, 0
+        for bound, count in zip([*map(str, self._bounds), '+Inf'], counts):
+            running += count
+            buckets[bound] = running
+        return {'count': total, 'sum_ms': round(sum_ms, 3), 'errors': errors, 'retries': retries,
+                'buckets_ms': buckets}
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def _histogram(endpoint: str) -> LatencyHistogram:
+    with _histograms_lock:
+        if endpoint not in _histograms:
+            _histograms[endpoint] = LatencyHistogram()
+        return _histograms[endpoint]
+
+
+def api_metrics() -> Dict[str, Dict[str, Any]]:
+    """Returns the latency histogram of every endpoint this process has called, keyed by path."""
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    return {endpoint: histogram.snapshot() for endpoint, histogram in sorted(histograms.items())}
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Full jitter keeps the scheduler, the web panel and the bot from retrying in lockstep
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _status_error(status: int, text: str) -> Optional[Hysteria2Error]:
+    if status == 401:
+        return Hysteria2AuthError(f"Authentication failed: {text}")
+    if status >= 400:
+        return Hysteria2Error(f"Request error: HTTP {status}: {text}")
+    return None
+
+
+def _parse_json(text: str) -> Any:
+    if not text:
+        return {}
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        raise Hysteria2Error(f"Invalid JSON response: {e}")
+
+
+def _traffic_endpoint(clear: bool) -> str:
+    return '/traffic?clear=1' if clear else '/traffic'
+
+
+def _kick_batches(client_ids: List[str]) -> List[List[str]]:
+    return [client_ids[i:i + KICK_BATCH_SIZE] for i in range(0, len(client_ids), KICK_BATCH_SIZE)]
+
+
+def _kick_result(batches: List[List[str]], errors: List[Optional[Exception]]) -> None:
+    failed = [client_id for batch, error in zip(batches, errors) if error is not None for client_id in batch]
+    if failed:
+        first_error = next(error for error in errors if error is not None)
+        raise KickError(f"Failed to kick {len(failed)} of {sum(map(len, batches))} users: {first_error}", failed)
+
+
+class TrafficApiClient:
+    """
+    Client for the Hysteria2 traffic stats API that keeps its connections open.
+
+    Requests go through one requests.Session whose pool holds up to pool_size
+    keep-alive connections, so repeated calls from a long-lived process (the
+    web panel's sampler, a kick loop) skip the TCP handshake. Failed requests
+    are retried up to max_attempts times with jittered exponential backoff:
+    reads and kicks on any connection error or 5xx, and `/traffic?clear=1`,
+    which resets the counters it returns, only when the request never reached
+    the server. Every attempt is timed into the endpoint's LatencyHistogram.
+
+    Methods and return types match hysteria2_api.Hysteria2Client.
+    """
+
+    def __init__(self, secret: str, base_url: str = API_BASE_URL, timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+                 max_attempts: int = MAX_ATTEMPTS, pool_size: int = POOL_SIZE):
+        self.base_url = base_url.rstrip('/')
+        self.secret = secret
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self._session = requests.Session()
+        self._session.headers.update({'Authorization': secret})
+        # Retries are done here, where the request's idempotency is known, not by urllib3
+        self._session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+
+    @staticmethod
+    def _never_sent(error: requests.RequestException) -> bool:
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+    def _request(self, method: str, endpoint: str, payload: Any = None, idempotent: bool = True) -> Any:
+        histogram = _histogram(endpoint.split('?')[0])
+        for attempt in range(self.max_attempts):
+            started = time.perf_counter()
+            try:
+                response = self._session.request(method, self.base_url + endpoint, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                histogram.observe(time.perf_counter() - started, ok=False)
+                error = Hysteria2ConnectionError(f"Connection error: {e}")
+                retryable = idempotent or self._never_sent(e)
+            else:
+                error = _status_error(response.status_code, response.text)
+                histogram.observe(time.perf_counter() - started, ok=error is None)
+                if error is None:
+                    return _parse_json(response.text)
+                retryable = idempotent and response.status_code >= 500
+
+            if not retryable or attempt == self.max_attempts - 1:
+                raise error
+            histogram.retried()
+            time.sleep(_backoff_delay(attempt))
+
+    def get_traffic_stats(self, clear: bool = False) -> Dict[str, TrafficStats]:
+        response = self._request('GET', _traffic_endpoint(clear), idempotent=not clear)
+        return {client_id: TrafficStats.from_dict(stats) for client_id, stats in response.items()}
+
+    def get_online_clients(self) -> Dict[str, OnlineStatus]:
+        response = self._request('GET', '/online')
+        return {client_id: OnlineStatus.from_int(connections) for client_id, connections in response.items()}
+
+    def kick_clients(self, client_ids: List[str]) -> bool:
+        """
+        Kicks the given users, KICK_BATCH_SIZE per request with up to KICK_CONCURRENCY requests
+        in flight. Raises KickError naming the users of any batch that still failed after retries.
+        """
+        batches = _kick_batches(list(client_ids))
+        if not batches:
+            return True
+
+        def send(batch: List[str]) -> Optional[Exception]:
+            try:
+                self._request('POST', '/kick', payload=batch)
+            except Hysteria2Error as e:
+                return e
+            return None
+
+        if len(batches) == 1:
+            errors = [send(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(KICK_CONCURRENCY, len(batches))) as executor:
+                errors = list(executor.map(send, batches))
+        _kick_result(batches, errors)
+        return True
+
+    def close(self) -> None:
+        self._session.close()
+
+    def __enter__(self) -> 'TrafficApiClient':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class AsyncTrafficApiClient:
+    """
+    asyncio counterpart of TrafficApiClient, built on an aiohttp connection pool.
+
+    It applies the same timeouts, retry rules and histograms. Its session is
+    created on first use and belongs to the event loop that was running then;
+    call close() from that loop when done.
+    """
+
+    def __init__(self, secret: str, base_url: str = API_BASE_URL, timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+                 max_attempts: int = MAX_ATTEMPTS, pool_size: int = POOL_SIZE):
+        self.base_url = base_url.rstrip('/')
+        self.secret = secret
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.pool_size = pool_size
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            # Imported here so the CLI scripts that only use the sync client don't pay for aiohttp
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                headers={'Authorization': self.secret},
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1]),
+            )
+        return self._session
+
+    async def _request(self, method: str, endpoint: str, payload: Any = None, idempotent: bool = True) -> Any:
+        import aiohttp
+
+        session = self._get_session()
+        histogram = _histogram(endpoint.split('?')[0])
+        for attempt in range(self.max_attempts):
+            started = time.perf_counter()
+            try:
+                async with session.request(method, self.base_url + endpoint, json=payload) as response:
+                    status, text = response.status, await response.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                histogram.observe(time.perf_counter() - started, ok=False)
+                error = Hysteria2ConnectionError(f"Connection error: {e}")
+                retryable = idempotent or isinstance(e, aiohttp.ClientConnectorError)
+            else:
+                error = _status_error(status, text)
+                histogram.observe(time.perf_counter() - started, ok=error is None)
+                if error is None:
+                    return _parse_json(text)
+                retryable = idempotent and status >= 500
+
+            if not retryable or attempt == self.max_attempts - 1:
+                raise error
+            histogram.retried()
+            await asyncio.sleep(_backoff_delay(attempt))
+
+    async def get_traffic_stats(self, clear: bool = False) -> Dict[str, TrafficStats]:
+        response = await self._request('GET', _traffic_endpoint(clear), idempotent=not clear)
+        return {client_id: TrafficStats.from_dict(stats) for client_id, stats in response.items()}
+
+    async def get_online_clients(self) -> Dict[str, OnlineStatus]:
+        response = await self._request('GET', '/online')
+        return {client_id: OnlineStatus.from_int(connections) for client_id, connections in response.items()}
+
+    async def kick_clients(self, client_ids: List[str]) -> bool:
+        """Same contract as TrafficApiClient.kick_clients."""
+        batches = _kick_batches(list(client_ids))
+        semaphore = asyncio.Semaphore(KICK_CONCURRENCY)
+
+        async def send(batch: List[str]) -> Optional[Exception]:
+            async with semaphore:
+                try:
+                    await self._request('POST', '/kick', payload=batch)
+                except Hysteria2Error as e:
+                    return e
+            return None
+
+        _kick_result(batches, list(await asyncio.gather(*map(send, batches))))
+        return True
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> 'AsyncTrafficApiClient':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+_client: Optional[TrafficApiClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> TrafficApiClient:
+    """
+    Returns the process-wide client, so every caller in a process shares one connection pool.
+
+    The secret is read from config.json on every call (a small file) and the
+    client is replaced when it changed. Raises like read_secret().
+    """
+    global _client
+    secret = read_secret()
+    with _client_lock:
+        if _client is None or _client.secret != secret:
+            if _client is not None:
+                _client.close()
+            _client = TrafficApiClient(secret)
+        return _client
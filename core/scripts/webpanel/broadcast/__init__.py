@@ -0,0 +1 @@
+from .broadcast import Broadcaster, format_sse
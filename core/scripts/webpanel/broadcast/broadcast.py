@@ -0,0 +1,112 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+# Events a client may fall behind by before it is resynchronised from the latest state
+QUEUE_SIZE = 16
+KEEPALIVE_SECONDS = 15.0
+
+
+def format_sse(event: str, data: Any) -> str:
+    '''
+    Formats one server-sent event.
+    '''
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Broadcaster:
+    '''
+    Runs one producer loop and fans its events out to every subscriber.
+
+    collect() is awaited every interval seconds and returns the current state
+    as {event name: payload}; only payloads that changed since the previous
+    round are sent. Events named in `delta_sets` carry sets (of usernames, for
+    example) and are sent as {'added': [...], 'removed': [...]} differences,
+    with 'full': true when a client has to replace what it holds.
+
+    The loop runs only while someone is subscribed, so N open dashboards cost
+    one collect() per interval instead of N polling loops. New subscribers and
+    subscribers whose queue overflowed get the full latest state.
+    '''
+
+    def __init__(self, collect: Callable[[], Awaitable[dict[str, Any]]], interval: float,
+                 delta_sets: tuple[str, ...] = ()):
+        self.__collect = collect
+        self.__interval = interval
+        self.__delta_sets = delta_sets
+        self.__state: dict[str, Any] = {}
+        self.__subscribers: set[asyncio.Queue[str]] = set()
+        self.__task: asyncio.Task[None] | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self.__subscribers)
+
+    def __snapshot_events(self) -> list[str]:
+        events = []
+        for event, payload in self.__state.items():
+            if event in self.__delta_sets:
+                payload = {'added': sorted(payload), 'removed': [], 'full': True}
+            events.append(format_sse(event, payload))
+        return events
+
+    def __publish(self, events: list[str]) -> None:
+        for queue in self.__subscribers:
+            if queue.maxsize - queue.qsize() < len(events):
+                # A client this far behind gets the whole state again instead of a broken delta chain
+                while not queue.empty():
+                    queue.get_nowait()
+                events_for_queue = self.__snapshot_events()
+            else:
+                events_for_queue = events
+            for event in events_for_queue:
+                queue.put_nowait(event)
+
+    async def __run(self) -> None:
+        while True:
+            try:
+                state = await self.__collect()
+            except Exception as e:
+                print(f'Broadcast producer failed: {e}')
+                state = {}
+
+            events = []
+            for event, payload in state.items():
+                previous = self.__state.get(event)
+                if payload == previous:
+                    continue
+                if event in self.__delta_sets:
+                    previous = previous or frozenset()
+                    events.append(format_sse(event, {'added': sorted(payload - previous),
+                                                     'removed': sorted(previous - payload), 'full': False}))
+                else:
+                    events.append(format_sse(event, payload))
+                self.__state[event] = payload
+
+            if events:
+                self.__publish(events)
+            await asyncio.sleep(self.__interval)
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        '''
+        Yields formatted events for one client until it disconnects.
+        '''
+        queue: asyncio.Queue[str] = asyncio.Queue(maxsize=QUEUE_SIZE)
+        for event in self.__snapshot_events():
+            queue.put_nowait(event)
+        self.__subscribers.add(queue)
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.create_task(self.__run())
+
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line; keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+        finally:
+            self.__subscribers.discard(queue)
+            if not self.__subscribers and self.__task is not None:
+                self.__task.cancel()
+                self.__task = None
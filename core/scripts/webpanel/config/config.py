@@ -11,6 +11,10 @@ class Configs(BaseSettings):
     EXPIRATION_MINUTES: int
     ROOT_PATH: str
     DECOY_PATH: str | None = None
+    BLOCKING_WORKERS: int = 8
+    SERVER_CONCURRENCY: int = 2
+    CONFIG_CONCURRENCY: int = 2
+    STREAM_INTERVAL: float = 5.0
 
     class Config:
         env_file = '.env'
@@ -0,0 +1 @@
+from .executor import run_blocking, ConcurrencyLimit
@@ -0,0 +1,46 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from fastapi import HTTPException
+
+from config import CONFIGS
+
+T = TypeVar('T')
+
+# cli_api is synchronous (file I/O, sqlite, subprocesses); running it here keeps the event loop free
+__EXECUTOR = ThreadPoolExecutor(max_workers=CONFIGS.BLOCKING_WORKERS, thread_name_prefix='webpanel-blocking')
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    '''
+    Runs a blocking function on the shared bounded executor and awaits its result.
+    '''
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(__EXECUTOR, functools.partial(func, *args, **kwargs))
+
+
+class ConcurrencyLimit:
+    '''
+    Router dependency that caps how many requests of one group run at once.
+
+    Requests over the limit wait for a free slot; if none frees up within
+    timeout seconds they are answered with 503 instead of piling up.
+    '''
+
+    def __init__(self, name: str, limit: int, timeout: float = 10.0):
+        self.name = name
+        self.limit = limit
+        self.timeout = timeout
+        self.__semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(self) -> AsyncIterator[None]:
+        try:
+            await asyncio.wait_for(self.__semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail=f'Too many concurrent {self.name} requests, try again later.')
+        try:
+            yield
+        finally:
+            self.__semaphore.release()
@@ -1,4 +1,7 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from config import CONFIGS
+from executor import ConcurrencyLimit
 from . import user
 from . import server
 from . import config
@@ -6,5 +9,9 @@ from . import config
 api_v1_router = APIRouter()
 
 api_v1_router.include_router(user.router, prefix='/users')
-api_v1_router.include_router(server.router, prefix='/server')
-api_v1_router.include_router(config.router, prefix='/config')
+# Status polling and config changes get their own caps so they cannot take every executor worker from user management
+api_v1_router.include_router(server.router, prefix='/server',
+                             dependencies=[Depends(ConcurrencyLimit('server', CONFIGS.SERVER_CONCURRENCY))])
+api_v1_router.include_router(server.stream_router, prefix='/server')
+api_v1_router.include_router(config.router, prefix='/config',
+                             dependencies=[Depends(ConcurrencyLimit('config', CONFIGS.CONFIG_CONCURRENCY))])
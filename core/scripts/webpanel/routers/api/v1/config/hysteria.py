@@ -8,6 +8,7 @@ import tempfile
 # from ..schema.config.hysteria import InstallInputBody
 import os
 import cli_api
+from executor import run_blocking
 
 router = APIRouter()
 
@@ -23,7 +24,7 @@ async def update():
         HTTPException: if an error occurs while updating Hysteria2.
     """
     try:
-        cli_api.update_hysteria2()
+        await run_blocking(cli_api.update_hysteria2)
         return DetailResponse(detail='Hysteria2 updated successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -41,7 +42,7 @@ async def get_port_api():
         HTTPException: if an error occurs while getting the Hysteria2 port.
     """
     try:
-        if port := cli_api.get_hysteria2_port():
+        if port := await run_blocking(cli_api.get_hysteria2_port):
             return GetPortResponse(port=port)
         else:
             raise HTTPException(status_code=404, detail='Hysteria2 port not found.')
@@ -64,7 +65,7 @@ async def set_port_api(port: int):
         HTTPException: if an error occurs while changing the Hysteria2 port.
     """
     try:
-        cli_api.change_hysteria2_port(port)
+        await run_blocking(cli_api.change_hysteria2_port, port)
         return DetailResponse(detail=f'Hysteria2 port changed to {port} successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -82,7 +83,7 @@ async def get_sni_api():
         HTTPException: if an error occurs while getting the Hysteria2 SNI.
     '''
     try:
-        if sni := cli_api.get_hysteria2_sni():
+        if sni := await run_blocking(cli_api.get_hysteria2_sni):
             return GetSniResponse(sni=sni)
         else:
             raise HTTPException(status_code=404, detail='Hysteria2 SNI not found.')
@@ -105,7 +106,7 @@ async def set_sni_api(sni: str):
         HTTPException: if an error occurs while changing the Hysteria2 SNI.
     """
     try:
-        cli_api.change_hysteria2_sni(sni)
+        await run_blocking(cli_api.change_hysteria2_sni, sni)
         return DetailResponse(detail=f'Hysteria2 SNI changed to {sni} successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -117,7 +118,7 @@ async def backup_api():
     Backups the Hysteria2 configuration and sends the backup ZIP file.
     """
     try:
-        cli_api.backup_hysteria2()
+        await run_blocking(cli_api.backup_hysteria2)
         backup_dir = "/opt/hysbackup/"  # TODO: get this path from .env
 
         if not os.path.isdir(backup_dir):
@@ -173,7 +174,7 @@ async def restore_api(file: UploadFile = File(...)):
         
         dst_path = os.path.join(dst_dir_path, file.filename)  # type: ignore
         shutil.move(temp_path, dst_path)
-        cli_api.restore_hysteria2(dst_path)
+        await run_blocking(cli_api.restore_hysteria2, dst_path)
         return DetailResponse(detail='Hysteria2 restored successfully.')
 
     except HTTPException as e:
@@ -199,7 +200,7 @@ async def enable_obfs():
         HTTPException: if an error occurs while enabling Hysteria2 obfs.
     """
     try:
-        cli_api.enable_hysteria2_obfs()
+        await run_blocking(cli_api.enable_hysteria2_obfs)
         return DetailResponse(detail='Hysteria2 obfs enabled successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -217,7 +218,7 @@ async def disable_obfs():
         HTTPException: if an error occurs while disabling Hysteria2 obfs.
     """
     try:
-        cli_api.disable_hysteria2_obfs()
+        await run_blocking(cli_api.disable_hysteria2_obfs)
         return DetailResponse(detail='Hysteria2 obfs disabled successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -235,7 +236,7 @@ async def check_obfs():
         HTTPException: if an error occurs while checking the Hysteria2 OBFS status.
     """
     try:
-        obfs_status_message = cli_api.check_hysteria2_obfs()
+        obfs_status_message = await run_blocking(cli_api.check_hysteria2_obfs)
         return GetObfsResponse(obfs=obfs_status_message)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error checking OBFS status: {str(e)}')
@@ -255,7 +256,7 @@ async def enable_masquerade(domain: str):
         HTTPException: if an error occurs while enabling Hysteria2 masquerade.
     """
     try:
-        cli_api.enable_hysteria2_masquerade(domain)
+        await run_blocking(cli_api.enable_hysteria2_masquerade, domain)
         return DetailResponse(detail='Hysteria2 masquerade enabled successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -273,7 +274,7 @@ async def disable_masquerade():
         HTTPException: if an error occurs while disabling Hysteria2 masquerade.
     """
     try:
-        cli_api.disable_hysteria2_masquerade()
+        await run_blocking(cli_api.disable_hysteria2_masquerade)
         return DetailResponse(detail='Hysteria2 masquerade disabled successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -291,7 +292,7 @@ async def get_file():
         HTTPException: if an error occurs while getting the Hysteria2 configuration file.
     """
     try:
-        if config_file := cli_api.get_hysteria2_config_file():
+        if config_file := await run_blocking(cli_api.get_hysteria2_config_file):
             return ConfigFile(root=config_file)
         else:
             raise HTTPException(status_code=404, detail='Hysteria2 configuration file not found.')
@@ -314,8 +315,8 @@ async def set_file(body: ConfigFile):
         HTTPException: if an error occurs while updating the Hysteria2 configuration file.
     """
     try:
-        cli_api.set_hysteria2_config_file(body.root)
-        cli_api.restart_hysteria2()
+        await run_blocking(cli_api.set_hysteria2_config_file, body.root)
+        await run_blocking(cli_api.restart_hysteria2)
         return DetailResponse(detail='Hysteria2 configuration file updated successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -324,7 +325,7 @@ async def set_file(body: ConfigFile):
 async def start_ip_limit_api():
     """Starts the IP Limiter service."""
     try:
-        cli_api.start_ip_limiter()
+        await run_blocking(cli_api.start_ip_limiter)
         return DetailResponse(detail='IP Limiter service started successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error starting IP Limiter: {str(e)}')
@@ -333,7 +334,7 @@ async def start_ip_limit_api():
 async def stop_ip_limit_api():
     """Stops the IP Limiter service."""
     try:
-        cli_api.stop_ip_limiter()
+        await run_blocking(cli_api.stop_ip_limiter)
         return DetailResponse(detail='IP Limiter service stopped successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error stopping IP Limiter: {str(e)}')
@@ -342,7 +343,7 @@ async def stop_ip_limit_api():
 async def config_ip_limit_api(config: IPLimitConfig):
     """Configures the IP Limiter service parameters."""
     try:
-        cli_api.config_ip_limiter(config.block_duration, config.max_ips)
+        await run_blocking(cli_api.config_ip_limiter, config.block_duration, config.max_ips)
         details = 'IP Limiter configuration updated successfully.'
         if config.block_duration is not None:
             details += f' Block Duration: {config.block_duration} seconds.'
@@ -356,7 +357,7 @@ async def config_ip_limit_api(config: IPLimitConfig):
 async def get_ip_limit_config_api():
     """Retrieves the current IP Limiter configuration."""
     try:
-        config = cli_api.get_ip_limiter_config()
+        config = await run_blocking(cli_api.get_ip_limiter_config)
         return IPLimitConfigResponse(**config)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error retrieving IP Limiter configuration: {str(e)}')
@@ -406,7 +407,7 @@ async def get_decoy_status_api():
     Checks if the decoy site is currently configured and active.
     """
     try:
-        status = cli_api.get_webpanel_decoy_status()
+        status = await run_blocking(cli_api.get_webpanel_decoy_status)
         return DecoyStatusResponse(**status)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error retrieving decoy status: {str(e)}')
\ No newline at end of file
@@ -4,6 +4,7 @@ from ..schema.response import DetailResponse
 
 from ..schema.config.ip import EditInputBody, StatusResponse
 import cli_api
+from executor import run_blocking
 
 router = APIRouter()
 
@@ -21,7 +22,7 @@ async def get_ip_api():
     """
     try:
 
-        ipv4, ipv6 = cli_api.get_ip_address()
+        ipv4, ipv6 = await run_blocking(cli_api.get_ip_address)
         if ipv4 or ipv6:
             return StatusResponse(ipv4=ipv4, ipv6=ipv6)  # type: ignore
         raise HTTPException(status_code=404, detail='IP status not available.')
@@ -41,7 +42,7 @@ async def add_ip_api():
         HTTPException: if an error occurs while adding the IP addresses.
     """
     try:
-        cli_api.add_ip_address()
+        await run_blocking(cli_api.add_ip_address)
         return DetailResponse(detail='IP addresses added successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -65,7 +66,7 @@ async def edit_ip_api(body: EditInputBody):
         if not body.ipv4 and not body.ipv6:
             raise HTTPException(status_code=400, detail='Error: You must specify either ipv4 or ipv6')
 
-        cli_api.edit_ip_address(str(body.ipv4), str(body.ipv6))
+        await run_blocking(cli_api.edit_ip_address, str(body.ipv4), str(body.ipv6))
         return DetailResponse(detail='IP address edited successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
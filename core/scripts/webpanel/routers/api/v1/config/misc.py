@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from ..schema.response import DetailResponse
 import cli_api
+from executor import run_blocking
 
 router = APIRouter()
 
@@ -18,7 +19,7 @@ async def install_tcp_brutal():
         HTTPException: If an error occurs during the installation, an HTTP 400 error is raised with the error details.
     """
     try:
-        cli_api.install_tcp_brutal()
+        await run_blocking(cli_api.install_tcp_brutal)
         return DetailResponse(detail='TCP Brutal installed successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -41,7 +42,7 @@ async def update_geo(country: str):
     """
 
     try:
-        cli_api.update_geo(country)
+        await run_blocking(cli_api.update_geo, country)
         return DetailResponse(detail='Geo updated successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
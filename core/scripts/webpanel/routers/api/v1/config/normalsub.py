@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from ..schema.response import DetailResponse
 from ..schema.config.normalsub import StartInputBody, EditSubPathInputBody, GetSubPathResponse
 import cli_api
+from executor import run_blocking
 
 router = APIRouter()
 
@@ -25,7 +26,7 @@ async def normal_sub_start_api(body: StartInputBody):
     """
     try:
 
-        cli_api.start_normalsub(body.domain, body.port)
+        await run_blocking(cli_api.start_normalsub, body.domain, body.port)
         return DetailResponse(detail='Normalsub started successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -46,7 +47,7 @@ async def normal_sub_stop_api():
     """
 
     try:
-        cli_api.stop_normalsub()
+        await run_blocking(cli_api.stop_normalsub)
         return DetailResponse(detail='Normalsub stopped successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -69,7 +70,7 @@ async def normal_sub_edit_subpath_api(body: EditSubPathInputBody):
         HTTPException with status code 400 and error details will be raised.
     """
     try:
-        cli_api.edit_normalsub_subpath(body.subpath)
+        await run_blocking(cli_api.edit_normalsub_subpath, body.subpath)
         return DetailResponse(detail=f'Normalsub subpath updated to {body.subpath} successfully.')
     except cli_api.InvalidInputError as e:
         raise HTTPException(status_code=422, detail=f'Validation Error: {str(e)}')
@@ -82,7 +83,7 @@ async def normal_sub_get_subpath_api():
     Retrieves the current subpath for the NormalSub service.
     """
     try:
-        current_subpath = cli_api.get_normalsub_subpath()
+        current_subpath = await run_blocking(cli_api.get_normalsub_subpath)
         return GetSubPathResponse(subpath=current_subpath)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error retrieving subpath: {str(e)}')
\ No newline at end of file
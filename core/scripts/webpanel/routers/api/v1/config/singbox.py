@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from ..schema.response import DetailResponse
 from ..schema.config.singbox import StartInputBody
 import cli_api
+from executor import run_blocking
 
 router = APIRouter()
 
@@ -20,7 +21,7 @@ async def singbox_start_api(body: StartInputBody):
         DetailResponse: The response with the result of the command.
     """
     try:
-        cli_api.start_singbox(body.domain, body.port)
+        await run_blocking(cli_api.start_singbox, body.domain, body.port)
         return DetailResponse(detail='Singbox started successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -41,7 +42,7 @@ async def singbox_stop_api():
     """
 
     try:
-        cli_api.stop_singbox()
+        await run_blocking(cli_api.stop_singbox)
         return DetailResponse(detail='Singbox stopped successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from ..schema.response import DetailResponse
 from ..schema.config.telegram import StartInputBody
 import cli_api
+from executor import run_blocking
 
 router = APIRouter()
 
@@ -18,7 +19,7 @@ async def telegram_start_api(body: StartInputBody):
         DetailResponse: The response containing the result of the action.
     """
     try:
-        cli_api.start_telegram_bot(body.token, body.admin_id)
+        await run_blocking(cli_api.start_telegram_bot, body.token, body.admin_id)
         return DetailResponse(detail='Telegram bot started successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -34,7 +35,7 @@ async def telegram_stop_api():
     """
 
     try:
-        cli_api.stop_telegram_bot()
+        await run_blocking(cli_api.stop_telegram_bot)
         return DetailResponse(detail='Telegram bot stopped successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -4,6 +4,7 @@ from ..schema.response import DetailResponse
 from ..schema.config.warp import ConfigureInputBody, StatusResponse
 
 import cli_api
+from executor import run_blocking
 
 router = APIRouter()
 
@@ -21,7 +22,7 @@ async def install():
         HTTPException: If an error occurs during installation, an HTTP 400 error is raised with the error details.
     """
     try:
-        cli_api.install_warp()
+        await run_blocking(cli_api.install_warp)
         return DetailResponse(detail='WARP installed successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -39,7 +40,7 @@ async def uninstall():
         HTTPException: If an error occurs during uninstallation, an HTTP 400 error is raised with the error details.
     """
     try:
-        cli_api.uninstall_warp()
+        await run_blocking(cli_api.uninstall_warp)
         return DetailResponse(detail='WARP uninstalled successfully.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
@@ -65,7 +66,8 @@ async def configure(body: ConfigureInputBody):
         dom_sites_st = 'on' if body.domestic_sites else 'off'
         block_adult_st = 'on' if body.block_adult_sites else 'off'
         
-        cli_api.configure_warp(
+        await run_blocking(
+            cli_api.configure_warp,
             all_state=all_st,
             popular_sites_state=pop_sites_st,
             domestic_sites_state=dom_sites_st,
@@ -79,7 +81,7 @@ async def configure(body: ConfigureInputBody):
 @router.get('/status', response_model=StatusResponse, summary='Get WARP Status', name="status_warp")
 async def status():
     try:
-        status_json_str = cli_api.warp_status()
+        status_json_str = await run_blocking(cli_api.warp_status)
         if not status_json_str:
             raise HTTPException(status_code=404, detail='WARP status not available.')
 
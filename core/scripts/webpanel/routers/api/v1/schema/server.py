@@ -1,19 +1,25 @@
 from pydantic import BaseModel
 
 
-# We can't return bytes because the underlying script is returning human readable values which are hard to parse it
-# It's better to chnage the underlying script to return bytes instead of changing it here
-# Because of this problem we use str type instead of int as type
 class ServerStatusResponse(BaseModel):
     # disk_usage: int
-    cpu_usage: str
-    total_ram: str
-    ram_usage: str
+    cpu_usage: float  # percent
+    total_ram: int  # MB
+    ram_usage: int  # MB
     online_users: int
 
-    uploaded_traffic: str
-    downloaded_traffic: str
-    total_traffic: str
+    uploaded_traffic: int  # bytes
+    downloaded_traffic: int  # bytes
+    total_traffic: int  # bytes
+    sampled_at: float  # unix time of the sample
+
+
+class TrafficApiEndpointMetrics(BaseModel):
+    count: int
+    sum_ms: float
+    errors: int
+    retries: int
+    buckets_ms: dict[str, int]  # cumulative request counts by latency upper bound
 
 
 class ServerServicesStatusResponse(BaseModel):
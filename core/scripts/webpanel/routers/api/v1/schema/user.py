@@ -1,5 +1,5 @@
-from typing import Optional
-from pydantic import BaseModel, RootModel
+from typing import Literal, Optional
+from pydantic import BaseModel, RootModel, Field
 
 
 # WE CAN'T USE SHARED SCHEMA BECAUSE THE CLI IS RETURNING SAME FIELD IN DIFFERENT NAMES SOMETIMES
@@ -21,6 +21,17 @@ class UserListResponse(RootModel):  # type: ignore
     root: dict[str, UserInfoResponse]
 
 
+class UserPageItem(UserInfoResponse):
+    username: str
+
+
+class UserPageResponse(BaseModel):
+    total: int
+    offset: int
+    limit: int
+    users: list[UserPageItem]
+
+
 class AddUserInputBody(BaseModel):
     username: str
     traffic_limit: int
@@ -29,6 +40,62 @@ class AddUserInputBody(BaseModel):
     creation_date: str | None = None
 
 
+class BulkAddUserInputBody(BaseModel):
+    users: list[AddUserInputBody] = Field(min_length=1, max_length=5000)
+    atomic: bool = False
+
+
+class BulkAddUserResult(BaseModel):
+    row: int
+    username: str
+    added: bool
+    error: str | None = None
+
+
+class BulkAddUserResponse(BaseModel):
+    added: int
+    failed: int
+    results: list[BulkAddUserResult]
+
+
+class UserSelector(BaseModel):
+    usernames: list[str] | None = Field(default=None, max_length=10000)
+    all: bool = False
+    blocked: bool | None = None
+    status: Literal['online', 'offline', 'inactive'] | None = None
+    expiring_within_days: int | None = Field(default=None, ge=0)
+    prefix: str | None = None
+
+
+class BulkEditUserInputBody(BaseModel):
+    selector: UserSelector
+    reset_traffic: bool = False
+    renew_creation_date: bool = False
+    extend_days: int | None = Field(default=None, gt=0)
+    new_traffic_limit: int | None = Field(default=None, gt=0)
+    new_expiration_days: int | None = Field(default=None, gt=0)
+    blocked: bool | None = None
+
+
+class BulkDeleteUserInputBody(BaseModel):
+    selector: UserSelector
+
+
+class BulkUserOperationResult(BaseModel):
+    username: str
+    applied: bool
+    error: str | None = None
+    warning: str | None = None
+
+
+class BulkUserOperationResponse(BaseModel):
+    matched: int
+    applied: int
+    failed: int
+    kick_failed: list[str]
+    results: list[BulkUserOperationResult]
+
+
 class EditUserInputBody(BaseModel):
     # username: str
     new_username: str | None = None
@@ -42,4 +109,17 @@ class UserUriResponse(BaseModel):
     username: str
     ipv4: str | None = None
     ipv6: str | None = None
-    normal_sub: str | None = None
\ No newline at end of file
+    normal_sub: str | None = None
+    error: str | None = None
+
+class TrafficPoint(BaseModel):
+    timestamp: int
+    upload_bytes: int
+    download_bytes: int
+
+
+class UserTrafficResponse(BaseModel):
+    username: str
+    resolution: str
+    step: int
+    points: list[TrafficPoint]
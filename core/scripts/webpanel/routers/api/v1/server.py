@@ -1,8 +1,14 @@
+from typing import Any
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 import cli_api
-from .schema.server import ServerStatusResponse, ServerServicesStatusResponse, VersionCheckResponse, VersionInfoResponse
+from broadcast import Broadcaster
+from config import CONFIGS
+from executor import run_blocking
+from .schema.server import ServerStatusResponse, ServerServicesStatusResponse, TrafficApiEndpointMetrics, VersionCheckResponse, VersionInfoResponse
 
 router = APIRouter()
+stream_router = APIRouter()
 
 
 @router.get('/status', response_model=ServerStatusResponse)
@@ -12,92 +18,32 @@ async def server_status_api():
 
     This endpoint provides information about the current server status,
     including CPU usage, RAM usage, online users, and traffic statistics.
+    The figures come from a background sampler, so they can be a few seconds old.
 
     Returns:
         ServerStatusResponse: A response model containing server status details.
 
     Raises:
-        HTTPException: If the server information is not available (404) or
-                       if there is an error processing the request (400).
+        HTTPException: If there is an error processing the request (400).
     """
 
     try:
-        if res := cli_api.server_info():
-            return __parse_server_status(res)
-        raise HTTPException(status_code=404, detail='Server information not available.')
+        return ServerStatusResponse(**await run_blocking(cli_api.server_metrics))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
 
 
-def __parse_server_status(server_info: str) -> ServerStatusResponse:
-    # Initial data with default values
+@router.get('/traffic-api/metrics', response_model=dict[str, TrafficApiEndpointMetrics])
+async def traffic_api_metrics_api():
     """
-    Parse the server information provided by cli_api.server_info()
-    and return a ServerStatusResponse instance.
-
-    Args:
-        server_info (str): The output of cli_api.server_info() as a string.
+    Retrieve latency histograms of the web panel's calls to the Hysteria2 traffic stats API.
 
     Returns:
-        ServerStatusResponse: A response model containing server status details.
-
-    Raises:
-        ValueError: If the server information is invalid or incomplete.
+        dict[str, TrafficApiEndpointMetrics]: Request counts, failures, retries and
+        cumulative latency buckets, keyed by API endpoint.
     """
-    data = {
-        'cpu_usage': '0%',
-        'total_ram': '0MB',
-        'ram_usage': '0MB',
-        'online_users': 0,
-        'uploaded_traffic': '0KB',
-        'downloaded_traffic': '0KB',
-        'total_traffic': '0KB'
-    }
 
-    # Example output(server_info) from cli_api.server_info():
-    # 📈 CPU Usage: 9.4%
-    # 📋 Total RAM: 3815MB
-    # 💻 Used RAM: 2007MB
-    # 👥 Online Users: 0
-    #
-    # 🔼 Uploaded Traffic: 0 KB
-    # 🔽 Downloaded Traffic: 0 KB
-    # 📊 Total Traffic: 0 KB
-
-    for line in server_info.splitlines():
-        key, _, value = line.partition(":")
-        key = key.strip().lower()
-        value = value.strip()
-
-        if not key or not value:
-            continue  # Skip empty or malformed lines
-
-        try:
-            if 'cpu usage' in key:
-                data['cpu_usage'] = value
-            elif 'total ram' in key:
-                data['total_ram'] = value
-            elif 'used ram' in key:
-                data['ram_usage'] = value
-            elif 'online users' in key:
-                data['online_users'] = int(value)
-            elif 'uploaded traffic' in key:
-                value = value.replace(' ', '')
-                data['uploaded_traffic'] = value
-            elif "downloaded traffic" in key:
-                value = value.replace(' ', '')
-                data['downloaded_traffic'] = value
-            elif 'total traffic' in key:
-                value = value.replace(' ', '')
-                data["total_traffic"] = value
-        except ValueError as e:
-            raise ValueError(f'Error parsing line \'{line}\': {e}')
-
-    # Validate required fields
-    try:
-        return ServerStatusResponse(**data)  # type: ignore
-    except Exception as e:
-        raise ValueError(f'Invalid or incomplete server info: {e}')
+    return cli_api.traffic_api_metrics()
 
 
 @router.get('/services/status', response_model=ServerServicesStatusResponse)
@@ -117,7 +63,7 @@ async def server_services_status_api():
     """
 
     try:
-        if res := cli_api.get_services_status():
+        if res := await run_blocking(cli_api.get_services_status):
             return __parse_services_status(res)
         raise HTTPException(status_code=404, detail='Services status not available.')
     except Exception as e:
@@ -147,11 +93,44 @@ def __parse_services_status(services_status: dict[str, bool]) -> ServerServicesS
             parsed_services_status['hysteria_warp'] = status
     return ServerServicesStatusResponse(**parsed_services_status)
 
+
+async def __collect_dashboard_state() -> dict[str, Any]:
+    '''
+    Gathers what the dashboard shows: server status, service states and online users.
+    '''
+    services_status = await run_blocking(cli_api.get_services_status)
+    return {
+        'status': ServerStatusResponse(**await run_blocking(cli_api.server_metrics)).model_dump(),
+        'services': __parse_services_status(services_status or {}).model_dump(),
+        'online': frozenset(await run_blocking(cli_api.get_online_usernames)),
+    }
+
+
+__dashboard_broadcaster = Broadcaster(__collect_dashboard_state, CONFIGS.STREAM_INTERVAL, delta_sets=('online',))
+
+
+# Registered without the server concurrency limit: a stream holds its connection open for as long as the page is
+@stream_router.get('/stream')
+async def server_stream_api():
+    """
+    Stream live server updates as server-sent events.
+
+    Events:
+        status: Same payload as /server/status, sent on every sample.
+        services: Same payload as /server/services/status, sent when a service changes state.
+        online: {"added": [...], "removed": [...], "full": bool} usernames; when full is true
+                the list replaces what the client holds.
+
+    All connected clients share one sampling loop.
+    """
+    return StreamingResponse(__dashboard_broadcaster.subscribe(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @router.get('/version', response_model=VersionInfoResponse)
 async def get_version_info():
     """Retrieves the current version of the panel."""
     try:
-        version_output = cli_api.show_version()
+        version_output = await run_blocking(cli_api.show_version)
         if version_output:
             current_version = version_output.split(": ")[1].strip()
             return VersionInfoResponse(current_version=current_version)
@@ -164,7 +143,7 @@ async def get_version_info():
 async def check_version_info():
     """Checks for updates and retrieves version information."""
     try:
-        check_output = cli_api.check_version()
+        check_output = await run_blocking(cli_api.check_version)
         if check_output:
             lines = check_output.splitlines()
             current_version = lines[0].split(": ")[1].strip()
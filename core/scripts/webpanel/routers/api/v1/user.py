@@ -1,35 +1,96 @@
 import json
-from fastapi import APIRouter, HTTPException
-
-from .schema.user import UserListResponse, UserInfoResponse, AddUserInputBody, EditUserInputBody, UserUriResponse
+import time
+from typing import Literal
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from .schema.user import (
+    UserListResponse, UserPageResponse, UserInfoResponse, AddUserInputBody, BulkAddUserInputBody, BulkAddUserResponse,
+    BulkEditUserInputBody, BulkDeleteUserInputBody, BulkUserOperationResponse, UserSelector, EditUserInputBody,
+    UserUriResponse, UserTrafficResponse
+)
 from .schema.response import DetailResponse
 import cli_api
+from executor import run_blocking
 
 router = APIRouter()
 
 
-@router.get('/', response_model=UserListResponse)
-async def list_users_api():
+@router.get('/', response_model=UserListResponse | UserPageResponse)
+async def list_users_api(limit: int | None = Query(None, ge=1, le=1000, description='Page size; when set, a page is returned instead of every user'),
+                         offset: int = Query(0, ge=0, description='Number of matching users to skip'),
+                         sort: Literal['username', 'usage', 'expiry', 'status'] = Query('username'),
+                         order: Literal['asc', 'desc'] = Query('asc'),
+                         blocked: bool | None = Query(None),
+                         status: Literal['online', 'offline', 'inactive'] | None = Query(None, description='inactive: neither online nor offline'),
+                         expiring_within: int | None = Query(None, ge=0, description='Only users whose plan ends within this many days'),
+                         prefix: str | None = Query(None, description='Case-insensitive username prefix')):
     """
-    Get a list of all users.
+    Get a list of all users, or one page of them.
+
+    Without limit every user is returned as a dict keyed by username. With
+    limit, the users matching the filters are sorted and paged, and the
+    response also carries the total number of matches.
 
     Returns:
-        List of user dictionaries.
+        Dict of user dictionaries, or UserPageResponse when limit is set.
     Raises:
         HTTPException: if no users are found, or if an error occurs.
     """
+    if limit is not None:
+        try:
+            return await run_blocking(cli_api.list_users_page, offset=offset, limit=limit, sort=sort,
+                                      descending=order == 'desc', blocked=blocked, status=status,
+                                      expiring_within_days=expiring_within, prefix=prefix)
+        except cli_api.InvalidInputError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
+
     try:
-        if res := cli_api.list_users():
+        if res := await run_blocking(cli_api.list_users):
             return res
         raise HTTPException(status_code=404, detail='No users found.')
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
 
 
+@router.get('/export', response_class=StreamingResponse)
+async def export_users_api(format: Literal['ndjson', 'json'] = Query('ndjson', description='ndjson: one user per line; json: one array'),
+                           fields: str | None = Query(None, description='Comma-separated fields, e.g. username,usage_bytes,expires_at')):
+    """
+    Stream every user, optionally projected to a few fields.
+
+    Users are read from the store and sent a few hundred at a time, so the
+    response starts right away and memory use does not grow with the number
+    of users. Besides the stored fields, usage_bytes (upload + download) and
+    expires_at (unix time the plan ends) can be requested.
+
+    Returns:
+        StreamingResponse: application/x-ndjson or application/json.
+    Raises:
+        HTTPException: 422 for an unknown field, 400 if the store cannot be read.
+    """
+    try:
+        chunks = await run_blocking(cli_api.export_users, format, fields)
+    except cli_api.InvalidInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
+
+    async def stream():
+        # Each batch is read on the executor; the store allows consecutive batches on different threads
+        while (chunk := await run_blocking(next, chunks, None)) is not None:
+            yield chunk
+
+    media_type = 'application/x-ndjson' if format == 'ndjson' else 'application/json'
+    return StreamingResponse(stream(), media_type=media_type)
+
+
 @router.post('/', response_model=DetailResponse, status_code=201)
 async def add_user_api(body: AddUserInputBody):
     try:
-        cli_api.get_user(body.username)
+        await run_blocking(cli_api.get_user, body.username)
         raise HTTPException(status_code=409,
                             detail=f"User '{body.username}' already exists.")
     except cli_api.CommandExecutionError:
@@ -39,7 +100,7 @@ async def add_user_api(body: AddUserInputBody):
                             detail=f"{str(e)}")
 
     try:
-        cli_api.add_user(body.username, body.traffic_limit, body.expiration_days, body.password, body.creation_date)
+        await run_blocking(cli_api.add_user, body.username, body.traffic_limit, body.expiration_days, body.password, body.creation_date)
         return DetailResponse(detail=f'User {body.username} has been added.')
     except cli_api.CommandExecutionError as e:
         if "User already exists" in str(e):
@@ -57,6 +118,122 @@ async def add_user_api(body: AddUserInputBody):
                             detail=f"An unexpected error occurred while adding user '{body.username}': {str(e)}")
 
 
+@router.post('/bulk', response_model=BulkAddUserResponse)
+async def add_users_bulk_api(body: BulkAddUserInputBody):
+    """
+    Add many users in one request.
+
+    Every row is validated (format, duplicates within the batch and against existing users)
+    before anything is written, and the valid rows are added in a single store transaction.
+
+    Args:
+        body: The users to add; with atomic set, one invalid row means no user is added.
+
+    Returns:
+        BulkAddUserResponse: Counts plus one result per row, in request order.
+
+    Raises:
+        HTTPException: 400 if the user store could not be updated.
+    """
+    try:
+        results = await run_blocking(cli_api.add_users, [user.model_dump() for user in body.users], body.atomic)
+    except (cli_api.CommandExecutionError, cli_api.InvalidInputError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'An unexpected error occurred while adding users: {str(e)}')
+
+    added = sum(1 for result in results if result['added'])
+    return BulkAddUserResponse(added=added, failed=len(results) - added, results=results)
+
+
+def _selector_args(selector: UserSelector) -> dict:
+    return {
+        'usernames': selector.usernames,
+        'all_users': selector.all,
+        'blocked': selector.blocked,
+        'status': selector.status,
+        'expiring_within_days': selector.expiring_within_days,
+        'prefix': selector.prefix,
+    }
+
+
+@router.post('/bulk/edit', response_model=BulkUserOperationResponse)
+async def edit_users_bulk_api(body: BulkEditUserInputBody):
+    """
+    Apply one edit to every user matched by a selector.
+
+    The selector takes explicit usernames and/or the filters of the user list (all=true selects
+    every user before filtering). Traffic is collected once, the edit is one store write and newly
+    blocked users are kicked in one batched call.
+
+    Args:
+        body: The selector and the changes to apply.
+
+    Returns:
+        BulkUserOperationResponse: Counts, users that could not be kicked, and one result per matched user.
+
+    Raises:
+        HTTPException: 400 for an empty selector or no changes, or if the store could not be updated.
+    """
+    try:
+        res = await run_blocking(cli_api.edit_users, _selector_args(body.selector), body.reset_traffic,
+                                 body.renew_creation_date, body.extend_days, body.new_traffic_limit,
+                                 body.new_expiration_days, body.blocked)
+    except (cli_api.CommandExecutionError, cli_api.InvalidInputError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'An unexpected error occurred while editing users: {str(e)}')
+    return BulkUserOperationResponse(**res)
+
+
+@router.post('/bulk/delete', response_model=BulkUserOperationResponse)
+async def delete_users_bulk_api(body: BulkDeleteUserInputBody):
+    """
+    Delete every user matched by a selector.
+
+    Traffic is collected once, the users are removed in one store write and then kicked in one batched call.
+
+    Args:
+        body: The selector of the users to delete.
+
+    Returns:
+        BulkUserOperationResponse: Counts, users that could not be kicked, and one result per matched user.
+
+    Raises:
+        HTTPException: 400 for an empty selector or if the store could not be updated.
+    """
+    try:
+        res = await run_blocking(cli_api.remove_users, _selector_args(body.selector))
+    except (cli_api.CommandExecutionError, cli_api.InvalidInputError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'An unexpected error occurred while deleting users: {str(e)}')
+    return BulkUserOperationResponse(**res)
+
+
+@router.get('/uri', response_model=list[UserUriResponse])
+async def show_users_uri_api(usernames: str | None = Query(None, description='Comma-separated usernames, defaults to all users')):
+    """
+    Get the URI information of many users in one request.
+
+    Args:
+        usernames: Comma-separated usernames; all users when omitted.
+
+    Returns:
+        list[UserUriResponse]: One entry per user, in request order; unknown users carry an error instead of URIs.
+
+    Raises:
+        HTTPException: 400 if the URIs could not be generated.
+    """
+    names = [name.strip() for name in usernames.split(',') if name.strip()] if usernames else None
+    try:
+        return await run_blocking(cli_api.show_user_uri_json, names)
+    except cli_api.CommandExecutionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f'Unexpected error: {str(e)}')
+
+
 @router.get('/{username}', response_model=UserInfoResponse)
 async def get_user_api(username: str):
     """
@@ -72,7 +249,7 @@ async def get_user_api(username: str):
         HTTPException: if the user is not found, or if an error occurs.
     """
     try:
-        if res := cli_api.get_user(username):
+        if res := await run_blocking(cli_api.get_user, username):
             return res
         raise HTTPException(status_code=404, detail=f'User {username} not found.')
     except Exception as e:
@@ -95,9 +272,9 @@ async def edit_user_api(username: str, body: EditUserInputBody):
         HTTPException: if an error occurs while editing the user.
     """
     try:
-        cli_api.kick_user_by_name(username)
-        cli_api.traffic_status(display_output=False)
-        cli_api.edit_user(username, body.new_username, body.new_traffic_limit, body.new_expiration_days,
+        await run_blocking(cli_api.kick_user_by_name, username)
+        await run_blocking(cli_api.traffic_status, display_output=False)
+        await run_blocking(cli_api.edit_user, username, body.new_username, body.new_traffic_limit, body.new_expiration_days,
                           body.renew_password, body.renew_creation_date, body.blocked)
         return DetailResponse(detail=f'User {username} has been edited.')
     except Exception as e:
@@ -119,13 +296,13 @@ async def remove_user_api(username: str):
         HTTPException: 404 if the user is not found, 400 if another error occurs.
     """
     try:
-        user = cli_api.get_user(username)
+        user = await run_blocking(cli_api.get_user, username)
         if not user:
             raise HTTPException(status_code=404, detail=f'User {username} not found.')
         
-        cli_api.kick_user_by_name(username)
-        cli_api.traffic_status(display_output=False)
-        cli_api.remove_user(username)
+        await run_blocking(cli_api.kick_user_by_name, username)
+        await run_blocking(cli_api.traffic_status, display_output=False)
+        await run_blocking(cli_api.remove_user, username)
         return DetailResponse(detail=f'User {username} has been removed.')
     except HTTPException:
 
@@ -149,17 +326,49 @@ async def reset_user_api(username: str):
         HTTPException: if an error occurs while resetting the user.
     """
     try:
-        user = cli_api.get_user(username)
+        user = await run_blocking(cli_api.get_user, username)
         if not user:
             raise HTTPException(status_code=404, detail=f'User {username} not found.')
         
-        cli_api.reset_user(username)
+        await run_blocking(cli_api.reset_user, username)
         return DetailResponse(detail=f'User {username} has been reset.')
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
 
+@router.get('/{username}/traffic', response_model=UserTrafficResponse)
+async def get_user_traffic_api(username: str,
+                               start: int | None = Query(None, alias='from', description='Unix timestamp, defaults to one hour before to'),
+                               end: int | None = Query(None, alias='to', description='Unix timestamp, defaults to now'),
+                               step: int | None = Query(None, description='Bucket size in seconds, rounded up to the stored resolution')):
+    """
+    Get a user's upload/download history.
+
+    Args:
+        username: The username of the user.
+        start: Start of the range (query parameter 'from').
+        end: End of the range (query parameter 'to').
+        step: Bucket size in seconds.
+
+    Returns:
+        UserTrafficResponse: One point per step, including empty ones.
+
+    Raises:
+        HTTPException: 404 if the user is not found, 422 for an invalid range, 400 if another error occurs.
+    """
+    end = end if end is not None else int(time.time())
+    start = start if start is not None else end - 3600
+    try:
+        return await run_blocking(cli_api.get_user_traffic, username, start, end, step)
+    except cli_api.InvalidInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except cli_api.CommandExecutionError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
+
+
 @router.get('/{username}/uri', response_model=UserUriResponse)
 async def show_user_uri_api(username: str):
     """
@@ -175,15 +384,13 @@ async def show_user_uri_api(username: str):
         HTTPException: 404 if the user is not found, 400 if another error occurs.
     """
     try:
-        uri_data_list = cli_api.show_user_uri_json([username])
+        uri_data_list = await run_blocking(cli_api.show_user_uri_json, [username])
         if not uri_data_list:
             raise HTTPException(status_code=404, detail=f'URI for user {username} not found.')
         uri_data = uri_data_list[0]
         if uri_data.get('error'):
             raise HTTPException(status_code=404, detail=f"{uri_data['error']}")
         return uri_data
-    except cli_api.ScriptNotFoundError as e:
-        raise HTTPException(status_code=500, detail=f'Server script error: {str(e)}')
     except cli_api.CommandExecutionError as e:
         raise HTTPException(status_code=400, detail=f'Error executing script: {str(e)}')
     except HTTPException:
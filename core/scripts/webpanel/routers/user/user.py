@@ -1,10 +1,11 @@
 
-from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
 from fastapi.templating import Jinja2Templates
 
 from dependency import get_templates
 from .viewmodel import User
 import cli_api
+from executor import run_blocking
 
 
 router = APIRouter()
@@ -12,12 +13,29 @@ router = APIRouter()
 
 @router.get('/')
 async def users(request: Request, templates: Jinja2Templates = Depends(get_templates)):
-    try:
-        dict_users = cli_api.list_users()  # type: ignore
-        users: list[User] = []
-        if dict_users:
-            users: list[User] = [User.from_dict(key, value) for key, value in dict_users.items()]  # type: ignore
+    # The table is filled page by page from users_rows
+    return templates.TemplateResponse('users.html', {'request': request})
+
 
-        return templates.TemplateResponse('users.html', {'users': users, 'request': request})
+@router.get('/rows')
+async def users_rows(request: Request, templates: Jinja2Templates = Depends(get_templates),
+                     offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500),
+                     sort: str = 'username', order: str = 'asc', blocked: bool | None = None,
+                     status: str | None = None, expiring_within: int | None = Query(None, ge=0),
+                     prefix: str | None = None):
+    '''
+    Renders one page of user table rows; the number of matching users is sent in X-Total-Count.
+    '''
+    try:
+        page = await run_blocking(cli_api.list_users_page, offset=offset, limit=limit, sort=sort,
+                                  descending=order == 'desc', blocked=blocked, status=status,
+                                  expiring_within_days=expiring_within, prefix=prefix)
+    except cli_api.InvalidInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Error: {str(e)}')
+
+    users: list[User] = [User.from_dict(user['username'], user) for user in page['users']]
+    response = templates.TemplateResponse('users_rows.html', {'users': users, 'offset': offset, 'request': request})
+    response.headers['X-Total-Count'] = str(page['total'])
+    return response
@@ -1,20 +1,21 @@
 #!/usr/bin/env python3
-import json
 import os
 import sys
 import time
 import fcntl
-import shutil
-import datetime
-from concurrent.futures import ThreadPoolExecutor
-from hysteria2_api import Hysteria2Client
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts')
+if SCRIPTS_DIR not in sys.path:
+    sys.path.append(SCRIPTS_DIR)
+
+from storage import (  # noqa: E402
+    APPLIED_SEQ_KEY, get_user_store, get_traffic_journal, get_traffic_series, get_expiry_index,
+    should_block, UserStoreError, TrafficSeriesError,
+)
+from traffic_api import get_client, Hysteria2Error  # noqa: E402
 
 CONFIG_FILE = '/etc/hysteria/config.json'
-USERS_FILE = '/etc/hysteria/users.json'
-API_BASE_URL = 'http://127.0.0.1:25413'
 LOCKFILE = "/tmp/kick.lock"
-BACKUP_FILE = f"{USERS_FILE}.bak"
-MAX_WORKERS = 8
 
 # import logging
 # logging.basicConfig(
@@ -42,28 +43,21 @@ def traffic_status(no_gui=False):
         no_gui (bool): If True, suppresses output to console
         
     Returns:
-        dict: User data including upload/download bytes and status
+        dict: Every user's data when it is displayed; with no_gui only the users
+        whose online status changed, since reading every user each tick is what
+        this avoids. None on error.
     """
     green = '\033[0;32m'
     cyan = '\033[0;36m'
     NC = '\033[0m'
 
     try:
-        with open(CONFIG_FILE, 'r') as config_file:
-            config = json.load(config_file)
-            secret = config.get('trafficStats', {}).get('secret')
-    except (json.JSONDecodeError, FileNotFoundError) as e:
+        client = get_client()
+    except (OSError, ValueError) as e:
         if not no_gui:
             print(f"Error: Failed to read secret from {CONFIG_FILE}. Details: {e}")
         return None
 
-    if not secret:
-        if not no_gui:
-            print("Error: Secret not found in config.json")
-        return None
-
-    client = Hysteria2Client(base_url=API_BASE_URL, secret=secret)
-
     try:
         traffic_stats = client.get_traffic_stats(clear=True)
         online_status = client.get_online_clients()
@@ -72,47 +66,68 @@ def traffic_status(no_gui=False):
             print(f"Error communicating with Hysteria2 API: {e}")
         return None
 
-    users_data = {}
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, 'r') as users_file:
-                users_data = json.load(users_file)
-        except json.JSONDecodeError:
-            if not no_gui:
-                print("Error: Failed to parse existing users data JSON file.")
-            return None
+    store = get_user_store()
+    journal = get_traffic_journal(store)
+    deltas = {
+        user_id: (stats.upload_bytes, stats.download_bytes)
+        for user_id, stats in traffic_stats.items()
+        if stats.upload_bytes or stats.download_bytes
+    }
 
-    for user in users_data:
-        users_data[user]["status"] = "Offline"
-
-    for user_id, status in online_status.items():
-        if user_id in users_data:
-            users_data[user_id]["status"] = "Online" if status.is_online else "Offline"
-        else:
-            users_data[user_id] = {
-                "upload_bytes": 0,
-                "download_bytes": 0,
-                "status": "Online" if status.is_online else "Offline"
-            }
+    try:
+        with journal.locked():
+            if deltas:
+                # The API counters were cleared by the read above; the journal is now their only copy
+                journal.append(deltas)
+                try:
+                    get_traffic_series(writable=True).record(deltas)
+                except (OSError, TrafficSeriesError) as e:
+                    # History is best effort; the counters themselves are safe in the journal
+                    if not no_gui:
+                        print(f"Warning: Failed to record traffic history: {e}")
+            # Also applies entries left behind by an earlier tick whose store write failed
+            previous_seq = store.get_meta(APPLIED_SEQ_KEY)
+            totals = journal.compact()
+            get_expiry_index().record_usage(totals, previous_seq, store.get_meta(APPLIED_SEQ_KEY))
+    except OSError as e:
+        if not no_gui:
+            print(f"Error: Failed to write the traffic journal: {e}")
+        return None
+    except UserStoreError as e:
+        if not no_gui:
+            print(f"Error: Failed to update the user store, traffic is kept in the journal: {e}")
+        return None
 
-    for user_id, stats in traffic_stats.items():
-        if user_id in users_data:
-            users_data[user_id]["upload_bytes"] = users_data[user_id].get("upload_bytes", 0) + stats.upload_bytes
-            users_data[user_id]["download_bytes"] = users_data[user_id].get("download_bytes", 0) + stats.download_bytes
-        else:
-            online = user_id in online_status and online_status[user_id].is_online
-            users_data[user_id] = {
-                "upload_bytes": stats.upload_bytes,
-                "download_bytes": stats.download_bytes,
-                "status": "Online" if online else "Offline"
-            }
+    changed = {}
+    try:
+        with store.transaction():
+            for user_id in online_status:
+                if store.get(user_id) is None:
+                    store.put(user_id, {"upload_bytes": 0, "download_bytes": 0})
+
+            # Only users the API reports or whose stored status is not already Offline can flip,
+            # so the rest of the users are not read
+            for user_id in store.users_not_offline() | set(online_status):
+                online = user_id in online_status and online_status[user_id].is_online
+                status = "Online" if online else "Offline"
+                record = store.get(user_id)
+                if record is not None and record.get("status") != status:
+                    store.patch(user_id, {"status": status})
+                    changed[user_id] = {**record, "status": status}
+    except UserStoreError as e:
+        if not no_gui:
+            print(f"Error: Failed to update the user store: {e}")
+        return None
 
-    with open(USERS_FILE, 'w') as users_file:
-        json.dump(users_data, users_file, indent=4)
+    if no_gui:
+        return changed
 
-    if not no_gui:
-        display_traffic_data(users_data, green, cyan, NC)
-    
+    try:
+        users_data = store.all()
+    except UserStoreError as e:
+        print(f"Error: Failed to read the user store: {e}")
+        return None
+    display_traffic_data(users_data, green, cyan, NC)
     return users_data
 
 def display_traffic_data(data, green, cyan, NC):
@@ -150,115 +165,52 @@ def format_bytes(bytes):
     else:
         return f"{bytes / 1099511627776:.2f}TB"
 
-def kick_users(usernames, secret):
-    """Kicks specified users from the server"""
+def kick_users(usernames):
+    """Kicks specified users from the server; failures are reported on stderr"""
     try:
-        client = Hysteria2Client(
-            base_url=API_BASE_URL,
-            secret=secret
-        )
-        
-        client.kick_clients(usernames)
+        get_client().kick_clients(usernames)
         return True
-    except Exception:
+    except (OSError, ValueError, Hysteria2Error) as e:
+        print(f"Error: Failed to kick users: {e}", file=sys.stderr)
         return False
 
-def process_user(username, user_data, config_secret, users_data):
-    """Process a single user to check if they should be kicked"""
-    blocked = user_data.get('blocked', False)
-    
-    if blocked:
-        return None
-    
-    max_download_bytes = user_data.get('max_download_bytes', 0)
-    expiration_days = user_data.get('expiration_days', 0)
-    account_creation_date = user_data.get('account_creation_date')
-    current_download_bytes = user_data.get('download_bytes', 0)
-    current_upload_bytes = user_data.get('upload_bytes', 0)
-    
-    total_bytes = current_download_bytes + current_upload_bytes
-    
-    if not account_creation_date:
-        return None
-    
-    try:
-        current_date = datetime.datetime.now().timestamp()
-        creation_date = datetime.datetime.fromisoformat(account_creation_date.replace('Z', '+00:00'))
-        expiration_date = (creation_date + datetime.timedelta(days=expiration_days)).timestamp()
-        
-        should_block = False
-        
-        if max_download_bytes > 0 and total_bytes >= 0 and expiration_days > 0:
-            if total_bytes >= max_download_bytes or current_date >= expiration_date:
-                should_block = True
-                
-            if should_block:
-                users_data[username]['blocked'] = True
-                return username
-        
-    except Exception:
-        return None
-    
-    return None
-
 def kick_expired_users():
     """Kicks users who have exceeded their data limits or whose accounts have expired"""
     lock_file = acquire_lock()
     
     try:
-        shutil.copy2(USERS_FILE, BACKUP_FILE)
-        
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                secret = config.get('trafficStats', {}).get('secret', '')
-                if not secret:
-                    sys.exit(1)
-        except Exception:
-            shutil.copy2(BACKUP_FILE, USERS_FILE)
-            sys.exit(1)
-            
         try:
-            with open(USERS_FILE, 'r') as f:
-                users_data = json.load(f)
-        except json.JSONDecodeError:
-            shutil.copy2(BACKUP_FILE, USERS_FILE)
+            get_client()
+        except (OSError, ValueError):
             sys.exit(1)
-        except Exception:
-            shutil.copy2(BACKUP_FILE, USERS_FILE)
-            sys.exit(1)
-            
+
+        store = get_user_store()
+        index = get_expiry_index()
+        now = time.time()
         users_to_kick = []
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_user = {
-                executor.submit(process_user, username, user_data, secret, users_data): username
-                for username, user_data in users_data.items()
-            }
-            
-            for future in future_to_user:
-                username = future.result()
-                if username:
-                    users_to_kick.append(username)
-        
-        if users_to_kick:
-            for retry in range(3):
-                try:
-                    with open(USERS_FILE, 'w') as f:
-                        json.dump(users_data, f, indent=2)
-                    break 
-                except Exception:
-                    time.sleep(1)
-                    if retry == 2: 
-                        raise
-        
+        try:
+            with store.transaction():
+                if not index.is_current(store):
+                    index.rebuild(store)
+
+                # Only users that expired or ran out of quota since the last check are looked at
+                for username in index.candidates(now):
+                    user_data = store.get(username)
+                    if should_block(user_data, now):
+                        user_data['blocked'] = True
+                        store.patch(username, {'blocked': True})
+                        users_to_kick.append(username)
+                    index.refresh(username, user_data)
+                index.mark_synced(store)
+        except BaseException:
+            # The blocks were rolled back, so the index no longer matches the store
+            index.invalidate()
+            raise
+
         if users_to_kick:
-            batch_size = 50 
-            for i in range(0, len(users_to_kick), batch_size):
-                batch = users_to_kick[i:i+batch_size]
-                kick_users(batch, secret)
-                        
-    except Exception:
-        shutil.copy2(BACKUP_FILE, USERS_FILE)
+            kick_users(users_to_kick)
+
+    except UserStoreError:
         sys.exit(1)
     finally:
         fcntl.flock(lock_file, fcntl.LOCK_UN)
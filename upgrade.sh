@@ -30,6 +30,7 @@ FILES=(
     "$HYSTERIA_INSTALL_DIR/ca.key"
     "$HYSTERIA_INSTALL_DIR/ca.crt"
     "$HYSTERIA_INSTALL_DIR/users.json"
+    "$HYSTERIA_INSTALL_DIR/users.db"
     "$HYSTERIA_INSTALL_DIR/config.json"
     "$HYSTERIA_INSTALL_DIR/.configs.env"
     "$HYSTERIA_INSTALL_DIR/core/scripts/telegrambot/.env"
@@ -41,6 +42,10 @@ FILES=(
 )
 
 info "Backing up configuration files to: $TEMP_DIR"
+if [[ -f "$HYSTERIA_INSTALL_DIR/users.db" ]] && command -v sqlite3 &>/dev/null; then
+    # Fold the WAL into users.db so the single file copy is complete
+    sqlite3 "$HYSTERIA_INSTALL_DIR/users.db" "PRAGMA wal_checkpoint(TRUNCATE);" >/dev/null
+fi
 for FILE in "${FILES[@]}"; do
     if [[ -f "$FILE" ]]; then
         mkdir -p "$TEMP_DIR/$(dirname "$FILE")"
@@ -87,6 +92,16 @@ chown -R hysteria:hysteria "$HYSTERIA_INSTALL_DIR/core/scripts/telegrambot"
 chmod +x "$HYSTERIA_INSTALL_DIR/core/scripts/hysteria2/user.sh"
 chmod +x "$HYSTERIA_INSTALL_DIR/core/scripts/hysteria2/kick.py"
 
+# ========== System Packages ==========
+if ! command -v sqlite3 &>/dev/null; then
+    info "Installing sqlite3 for the user store..."
+    apt-get install -y -qq sqlite3 >/dev/null && success "sqlite3 installed." || warn "Failed to install sqlite3."
+fi
+if ! command -v ipset &>/dev/null; then
+    info "Installing ipset for the IP limiter..."
+    apt-get install -y -qq ipset >/dev/null && success "ipset installed." || warn "Failed to install ipset, the IP limiter will use nftables."
+fi
+
 # ========== Virtual Environment ==========
 info "Setting up virtual environment and installing dependencies..."
 cd "$HYSTERIA_INSTALL_DIR"
@@ -112,6 +127,12 @@ else
     warn "Failed to source scheduler.sh, continuing without scheduler setup..."
 fi
 
+# ========== IP Limiter ==========
+if [ -f /etc/systemd/system/hysteria-ip-limit.service ] && grep -q "limit.sh" /etc/systemd/system/hysteria-ip-limit.service; then
+    info "Moving the IP limiter service to the Python daemon..."
+    python3 "$HYSTERIA_INSTALL_DIR/core/scripts/hysteria2/limit.py" start >/dev/null && success "IP limiter service updated." || warn "Failed to update the IP limiter service."
+fi
+
 # ========== Restart Services ==========
 SERVICES=(
     hysteria-caddy.service